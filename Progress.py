@@ -1,33 +1,40 @@
-import time 
+import time
 import sys
-from multiprocessing import Manager
-from ctypes import c_int
+import threading
+from collections import deque
+from multiprocessing import Value
+from ctypes import c_longlong
 
 class Counter(object):
     """
-    A class for a counter that can be shared between processes.
+    A class for a counter in shared memory that can be shared between threads, and with processes forked after it is created.
     """
-    def __init__(self, manager: Manager, initval=0):
+    def __init__(self, initval=0):
         """
         Initializes the counter.
         """
-        self.val = manager.Value(c_int, initval)
-        self.lock = manager.Lock()
-        
-    def increment(self):
+        self.val = Value(c_longlong, initval)
+
+    def increment(self, amount: int = 1):
         """
-        Increments the counter by 1.
+        Increments the counter.
+
+        Args:
+            amount (int): The amount to increment by. Defaults to 1.
         """
-        with self.lock:
-            self.val.value += 1
-            
-    def decrement(self):
+        with self.val.get_lock():
+            self.val.value += amount
+
+    def decrement(self, amount: int = 1):
         """
-        Decrements the counter by 1.
+        Decrements the counter.
+
+        Args:
+            amount (int): The amount to decrement by. Defaults to 1.
         """
-        with self.lock:
-            self.val.value -= 1
-            
+        with self.val.get_lock():
+            self.val.value -= amount
+
     @property
     def value(self):
         """
@@ -37,53 +44,123 @@ class Counter(object):
 
 class Progress(object):
     """
-    A class for tracking progress accross processes.
+    A class for tracking progress. Incrementing only updates a counter, while a single renderer thread redraws
+    the progress bar at a fixed rate, so tracking progress costs next to nothing where the work is done.
+    Used as a context manager, which starts the renderer and draws the final state on exit.
     """
     start_time: float
     amount_completed: Counter
     total_amount: int
-    
-    def __init__(self, start_time: float, total_amount: int, manager: Manager):
+    render_interval: float
+
+    def __init__(self, start_time: float, total_amount: int, render_interval: float = 0.2):
         """
         Initializes the progress tracker.
-        
+
         Args:
             start_time (float): The time the progress tracker was started.
-            total_amount (int): The total amount of tasks to be completed.
-            manager (Manager): The multiprocessing manager used to share the counter accross processes.
+            total_amount (int): The total amount of tasks to be completed. May be raised while tasks are being completed.
+            render_interval (float): The seconds between redraws of the progress bar. Defaults to 0.2.
         """
         self.start_time = start_time
         self.total_amount = total_amount
-        self.amount_completed = Counter(manager, 0)
-        
-    def increment_amount_completed(self) -> None:
+        self.amount_completed = Counter(0)
+        self.render_interval = render_interval
+        # (time, amount completed) samples over the last few seconds, to measure the current throughput
+        self.samples: deque[tuple[float, int]] = deque(maxlen=max(int(5.0/render_interval), 2))
+        self.stopped: threading.Event = threading.Event()
+        self.renderer: threading.Thread = None
+
+    def increment_amount_completed(self, amount: int = 1) -> None:
         """
-        Increments the amount of completed tasks by 1. Shadows the Counter classes increment method.
+        Increments the amount of completed tasks. Shadows the Counter classes increment method.
+
+        Args:
+            amount (int): The amount of tasks completed. Defaults to 1.
         """
-        self.amount_completed.increment()
-    
-    def calculate_percentage_complete(self, decimal_places: int = 1) -> float:
+        self.amount_completed.increment(amount)
+
+    def calculate_percentage_complete(self, decimal_places: int = 1, amount_completed: int = None) -> float:
         """
         Calculates the percentage of tasks completed
 
         Args:
             decimal_places (int): Number of decimal places the percentage should be calculated to. Defaults to 1.
-            
+            amount_completed (int): The amount of completed tasks to use instead of reading the counter. Defaults to None.
+
         Returns:
             float: The percentage of tasks completed.
         """
-        return round((float(self.amount_completed.value)/float(self.total_amount))*100.0, decimal_places)
-    
+        if amount_completed is None:
+            amount_completed = self.amount_completed.value
+        if not self.total_amount:
+            return 100.0
+        return round((float(amount_completed)/float(self.total_amount))*100.0, decimal_places)
+
+    def calculate_throughput(self) -> float:
+        """
+        Calculates the tasks completed per second over the last few seconds, or since the start if it has only just started.
+
+        Returns:
+            float: The tasks completed per second.
+        """
+        if len(self.samples) < 2:
+            # too early for a recent figure, so fall back to the average since the start
+            elapsed: float = time.time()-self.start_time
+            return self.amount_completed.value/elapsed if elapsed > 0 else 0.0
+        (first_time, first_amount), (last_time, last_amount) = self.samples[0], self.samples[-1]
+        return (last_amount-first_amount)/(last_time-first_time) if last_time > first_time else 0.0
+
     def display_progress(self) -> None:
         """
-        Displays the progress of the tasks in the console in the format: [##########..........] 5/10 - (50.0% 00:06)
+        Displays the progress of the tasks in the console in the format: [##########..........] 5/10 - (50.0% 00:06) 0.8/s ETA 00:06
         """
+        # read the counter once so that every figure on the line agrees
+        amount_completed: int = self.amount_completed.value
+        now: float = time.time()
+        self.samples.append((now, amount_completed))
         # get the time elapsed since the progress tracker was started
-        sec: float = time.time()-self.start_time
-        percentage: float = self.calculate_percentage_complete()
-        stat_string: str = f'{self.amount_completed.value}/{self.total_amount} - ({percentage}% {sec//60:02.0f}:{sec%60:02.0f}) '
+        sec: float = now-self.start_time
+        percentage: float = self.calculate_percentage_complete(amount_completed=amount_completed)
+        throughput: float = self.calculate_throughput()
+        eta: str = "--:--"
+        if throughput > 0:
+            remaining: float = max(self.total_amount-amount_completed, 0)/throughput
+            eta = f"{remaining//60:02.0f}:{remaining%60:02.0f}"
+        stat_string: str = (f'{amount_completed}/{self.total_amount} - ({percentage}% {sec//60:02.0f}:{sec%60:02.0f}) '
+                            f'{throughput:.1f}/s ETA {eta} ')
         bar_width: int = 20
-        full_width: int = int(bar_width*percentage/100.0)
+        full_width: int = min(int(bar_width*percentage/100.0), bar_width)
         empty_width: int = bar_width - full_width
         sys.stdout.write('\r'+'['+full_width*'#'+empty_width*'.'+'] '+stat_string)
-        sys.stdout.flush()   
+        sys.stdout.flush()
+
+    def render(self) -> None:
+        """
+        The renderer thread: redraws the progress bar every render_interval seconds until stopped.
+        """
+        while not self.stopped.wait(self.render_interval):
+            self.display_progress()
+
+    def start(self) -> None:
+        """
+        Starts the renderer thread.
+        """
+        self.renderer = threading.Thread(target=self.render, daemon=True)
+        self.renderer.start()
+
+    def stop(self) -> None:
+        """
+        Stops the renderer thread and draws the final progress.
+        """
+        self.stopped.set()
+        if self.renderer:
+            self.renderer.join()
+        self.display_progress()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
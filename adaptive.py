@@ -0,0 +1,152 @@
+from multiprocessing import Array, Condition
+from ctypes import c_double
+import threading
+import time
+
+class ConcurrencyController(object):
+    """
+    An AIMD (additive increase, multiplicative decrease) limit on the requests in flight across every process, thread
+    and task using it, kept in shared memory. Every request waits for a slot before it is sent and reports how it went:
+    while responses come back healthy and about as fast as the fastest seen, the limit grows by one per limit's worth
+    of responses, about one more request per round trip. A timeout, 5xx or 429 halves it, and a response that is much
+    slower than usual shrinks it gently. Decreases are applied at most once per round trip, so a burst of failures
+    from requests that were all in flight together only counts once.
+    Must be created before the worker processes and handed to them through the pool initializer.
+    """
+    minimum: float
+    maximum: float
+    latency_tolerance: float
+    state: Array
+    condition: Condition
+
+    def __init__(self, initial: float = 4.0, minimum: float = 1.0, maximum: float = 128.0, latency_tolerance: float = 2.0,
+                 error_backoff: float = 0.5, latency_backoff: float = 0.9):
+        """
+        Initializes the limit.
+
+        Args:
+            initial (float, optional): The limit to start from. Defaults to 4.
+            minimum (float, optional): The lowest the limit goes. Defaults to 1.
+            maximum (float, optional): The highest the limit goes, e.g. the amount of workers of the backend. Defaults to 128.
+            latency_tolerance (float, optional): How many times slower than the fastest response seen a response may be
+                before it counts as a sign of congestion. Defaults to 2.
+            error_backoff (float, optional): The factor the limit is multiplied by on an error. Defaults to 0.5.
+            latency_backoff (float, optional): The factor the limit is multiplied by on a slow response. Defaults to 0.9.
+        """
+        self.minimum = max(minimum, 1.0)
+        self.maximum = max(maximum, self.minimum)
+        self.latency_tolerance = latency_tolerance
+        self.error_backoff = error_backoff
+        self.latency_backoff = latency_backoff
+        # [limit, requests in flight, smoothed latency, baseline latency, time of the last decrease]
+        self.state = Array(c_double, [min(max(initial, self.minimum), self.maximum), 0.0, 0.0, 0.0, 0.0], lock=False)
+        self.condition = Condition()
+        self.history: list[tuple[float, float, float]] = []
+        self.sampler: threading.Thread = None
+        self.sampling: threading.Event = threading.Event()
+
+    def __getstate__(self) -> dict:
+        # the sampler thread and its history stay with the process that created the controller
+        state: dict = self.__dict__.copy()
+        state.update(history=[], sampler=None, sampling=None)
+        return state
+
+    @property
+    def limit(self) -> float:
+        """
+        Returns the current limit on requests in flight.
+        """
+        return self.state[0]
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Returns the amount of requests in flight.
+        """
+        return int(self.state[1])
+
+    def acquire(self) -> float:
+        """
+        Blocks until the amount of requests in flight is below the limit and takes a slot.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        start: float = time.perf_counter()
+        with self.condition:
+            while self.state[1] >= int(self.state[0]):
+                self.condition.wait(0.1)
+            self.state[1] += 1
+        return time.perf_counter()-start
+
+    def release(self, healthy: bool, latency: float) -> None:
+        """
+        Gives back a slot and adjusts the limit by how the request went.
+
+        Args:
+            healthy (bool): False if the request timed out, failed to connect, or was answered with a 5xx or 429.
+            latency (float): The seconds the request took.
+        """
+        with self.condition:
+            limit, in_flight, smoothed, baseline, last_decrease = self.state[:]
+            now: float = time.monotonic()
+            self.state[1] = max(in_flight-1, 0.0)
+            if healthy:
+                smoothed = latency if not smoothed else smoothed*0.9+latency*0.1
+                # the baseline follows the fastest responses, drifting up slowly so it can recover from one lucky sample
+                baseline = latency if not baseline or latency < baseline else baseline+(latency-baseline)*0.01
+                self.state[2], self.state[3] = smoothed, baseline
+            # decrease at most once per round trip
+            can_decrease: bool = now-last_decrease >= max(smoothed, 0.05)
+            if not healthy:
+                if can_decrease:
+                    self.state[0], self.state[4] = max(limit*self.error_backoff, self.minimum), now
+            elif latency > baseline*self.latency_tolerance:
+                if can_decrease:
+                    self.state[0], self.state[4] = max(limit*self.latency_backoff, self.minimum), now
+            else:
+                self.state[0] = min(limit+1.0/limit, self.maximum)
+            self.condition.notify_all()
+
+    def sample(self, interval: float) -> None:
+        """
+        The sampler thread: records (seconds since start, limit, requests in flight) every interval seconds until stopped.
+        """
+        start: float = time.monotonic()
+        while not self.sampling.wait(interval):
+            self.history.append((round(time.monotonic()-start, 3), round(self.limit, 2), self.in_flight))
+
+    def start_sampling(self, interval: float = 0.5) -> None:
+        """
+        Starts recording the limit over time in a background thread of this process.
+
+        Args:
+            interval (float, optional): The seconds between samples. Defaults to 0.5.
+        """
+        self.sampler = threading.Thread(target=self.sample, args=(interval,), daemon=True)
+        self.sampler.start()
+
+    def stop_sampling(self) -> list[tuple[float, float, int]]:
+        """
+        Stops recording the limit.
+
+        Returns:
+            list[tuple[float, float, int]]: The (seconds since start, limit, requests in flight) samples.
+        """
+        self.sampling.set()
+        if self.sampler:
+            self.sampler.join()
+        return self.history
+
+# the concurrency controller of this process, or None if requests in flight are not adapted
+CONTROLLER: ConcurrencyController = None
+
+def configure_controller(controller: ConcurrencyController) -> None:
+    """
+    Sets the concurrency controller consulted by requests sent from this process.
+
+    Args:
+        controller (ConcurrencyController): The controller shared by all workers, or None to not adapt concurrency.
+    """
+    global CONTROLLER
+    CONTROLLER = controller
@@ -0,0 +1,211 @@
+from database import Database
+
+class Aggregate(object):
+    """
+    A count kept in a summary table: for each key, the amount of distinct values paired with it, selected as
+    "SELECT key, value FROM source". Only keys counting at least minimum are kept. An additive aggregate pairs each
+    key with each value in one row of the source at most, as the link tables' primary keys ensure, so every inserted
+    or deleted row changes its key's count by exactly one.
+    """
+    name: str
+    key: str
+    value: str
+    source: str
+    key_column: str
+    count_column: str
+    minimum: int
+    additive: bool
+    def __init__(self, name: str, key: str, value: str, source: str, key_column: str, count_column: str, minimum: int = 1,
+                 additive: bool = False):
+        self.name = name
+        self.key = key
+        self.value = value
+        self.source = source
+        self.key_column = key_column
+        self.count_column = count_column
+        self.minimum = minimum
+        self.additive = additive
+    def __str__(self):
+        return self.name
+    def __repr__(self):
+        return Aggregate.__str__(self)
+    @property
+    def table(self) -> str:
+        """
+        Returns the name of the summary table.
+        """
+        return f"summary_{self.name}"
+    def query(self, where: str = "1") -> str:
+        """
+        Returns the query selecting the (key, value) pairs that match the condition.
+        """
+        return f"SELECT {self.key}, {self.value} FROM {self.source} WHERE {self.key} IS NOT NULL AND {where}"
+    def count_query(self, where: str = "1") -> str:
+        """
+        Returns the query counting the distinct values of each key that matches the condition, keeping the counts that
+        reach the minimum.
+        """
+        return (f"SELECT {self.key}, COUNT(DISTINCT {self.value}) FROM {self.source} WHERE {self.key} IS NOT NULL AND {where} "
+                f"GROUP BY {self.key} HAVING COUNT(DISTINCT {self.value}) >= {self.minimum}")
+
+# the aggregates the dashboards read, keyed by name. A breeder with two breeds of the same FCI group counts once
+# towards the group, and a last litter of NULL falls in the year ""
+AGGREGATES: dict[str, Aggregate] = {aggregate.name: aggregate for aggregate in [
+    Aggregate("region_breeders", "area_region", "breeder_id", "areas_breeders", "region", "breeders", additive=True),
+    Aggregate("breed_breeders", "breed_code", "breeder_id", "breeders_breeds", "breed_code", "breeders", additive=True),
+    Aggregate("group_breeders", "b.group_code", "bb.breeder_id", "breeders_breeds bb JOIN breeds b ON b.code=bb.breed_code",
+              "group_code", "breeders"),
+    Aggregate("breeder_members", "breeder_id", "member_id", "breeders_members", "breeder_id", "members", additive=True),
+    Aggregate("multi_breeder_members", "member_id", "breeder_id", "breeders_members", "member_id", "breeders", minimum=2),
+    Aggregate("litter_years", "substr(COALESCE(last_litter, ''), 1, 4)", "code", "breeds", "year", "breeds"),
+]}
+
+# the aggregates a changed row of each table affects, with the key it affects, taken from the row as ROW, which is
+# NEW or OLD in the triggers
+CHANGED_KEYS: dict[str, list[tuple[str, str]]] = {
+    "areas_breeders": [("region_breeders", "ROW.area_region")],
+    "breeders_breeds": [("breed_breeders", "ROW.breed_code"),
+                        ("group_breeders", "(SELECT group_code FROM breeds WHERE code=ROW.breed_code)")],
+    "breeders_members": [("breeder_members", "ROW.breeder_id"), ("multi_breeder_members", "ROW.member_id")],
+    "breeds": [("group_breeders", "ROW.group_code"), ("litter_years", "substr(COALESCE(ROW.last_litter, ''), 1, 4)")],
+}
+# the updates that change an aggregate. Upserts overwrite every breed of a fetched breeder, mostly with the same values
+UPDATE_CONDITIONS: dict[str, str] = {
+    "breeds": "OLD.group_code IS NOT NEW.group_code OR OLD.last_litter IS NOT NEW.last_litter",
+}
+
+class Aggregates(object):
+    """
+    The summary tables of AGGREGATES in storage.db, so that the dashboards read a count with a primary key lookup
+    instead of joining the link tables. compute builds every table from scratch after a full load with NumPy, and
+    installs triggers that log the keys changed rows affect in summary_changes, along with the rows inserted less those
+    deleted. refresh then adds that difference to the counts of additive aggregates, and counts the logged keys of the
+    others again in SQL, which the indexes keep to the rows of those keys.
+    """
+    db: Database
+
+    def __init__(self, db: Database):
+        """
+        Initializes the summary tables and the log of changed keys, creating them if needed.
+
+        Args:
+            db (Database): The database to summarize.
+        """
+        self.db = db
+        for aggregate in AGGREGATES.values():
+            self.db.cursor.execute(f"CREATE TABLE IF NOT EXISTS {aggregate.table} ({aggregate.key_column} TEXT PRIMARY KEY, "
+                                   f"{aggregate.count_column} INTEGER) WITHOUT ROWID")
+        self.db.cursor.execute("CREATE TABLE IF NOT EXISTS summary_changes (aggregate TEXT, key TEXT, delta INTEGER, PRIMARY KEY(aggregate, key)) WITHOUT ROWID")
+        self.db.connection.commit()
+
+    def is_tracking(self) -> bool:
+        """
+        Returns whether the triggers logging changed keys are installed, which they are once compute has run.
+        """
+        return self.db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name LIKE 'summary_%'").fetchone()[0] > 0
+
+    def create_triggers(self) -> None:
+        """
+        Installs the triggers that log the keys a changed row affects, replacing any installed before.
+        """
+        self.drop_triggers()
+        for table, changed_keys in CHANGED_KEYS.items():
+            for event, rows in (("INSERT", [("NEW", 1)]), ("UPDATE", [("OLD", -1), ("NEW", 1)]), ("DELETE", [("OLD", -1)])):
+                inserts: str = " ".join(f"INSERT INTO summary_changes SELECT '{name}', {key}, {delta} WHERE {key} IS NOT NULL "
+                                        "ON CONFLICT(aggregate, key) DO UPDATE SET delta=delta+excluded.delta;"
+                                        for row, delta in rows for name, key in changed_keys
+                                        for key in [key.replace("ROW.", f"{row}.")])
+                condition: str = f"WHEN {UPDATE_CONDITIONS[table]} " if event == "UPDATE" and table in UPDATE_CONDITIONS else ""
+                self.db.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS summary_{table}_{event.lower()} AFTER {event} ON {table} "
+                                       f"{condition}BEGIN {inserts} END")
+        self.db.connection.commit()
+
+    def drop_triggers(self) -> None:
+        """
+        Drops the triggers, so that a large load does not log every key it touches. Run compute afterwards.
+        """
+        for table in CHANGED_KEYS:
+            for event in ("insert", "update", "delete"):
+                self.db.cursor.execute(f"DROP TRIGGER IF EXISTS summary_{table}_{event}")
+        self.db.connection.commit()
+
+    def compute(self) -> None:
+        """
+        Recomputes every summary table from the whole database and installs the triggers.
+        """
+        # numpy is imported only here, so that runs which only refresh a few keys start without it
+        import columnar
+        self.db.cursor.execute("BEGIN")
+        try:
+            for aggregate in AGGREGATES.values():
+                self.db.cursor.execute(f"DELETE FROM {aggregate.table}")
+                self.db.cursor.executemany(f"INSERT INTO {aggregate.table} VALUES (?,?)",
+                                           columnar.count_distinct_pairs(self.db, aggregate.query(), aggregate.minimum))
+            self.db.cursor.execute("DELETE FROM summary_changes")
+            self.db.connection.commit()
+        except BaseException:
+            self.db.connection.rollback()
+            raise
+        self.create_triggers()
+
+    def refresh(self) -> int:
+        """
+        Brings every summary table up to date with the changes logged since the last compute or refresh, or computes
+        every summary table if compute has never run.
+
+        Returns:
+            int: The amount of changed keys, or of keys stored if every table was computed.
+        """
+        if not self.is_tracking():
+            self.compute()
+            return sum(len(self.counts(name)) for name in AGGREGATES)
+        changed: int = self.db.cursor.execute("SELECT COUNT(*) FROM summary_changes").fetchone()[0]
+        self.db.cursor.execute("BEGIN")
+        try:
+            for aggregate in AGGREGATES.values():
+                if aggregate.additive:
+                    self.db.cursor.execute(f"INSERT INTO {aggregate.table} SELECT key, delta FROM summary_changes "
+                                           f"WHERE aggregate=? AND delta != 0 ON CONFLICT({aggregate.key_column}) DO UPDATE SET "
+                                           f"{aggregate.count_column}={aggregate.count_column}+excluded.{aggregate.count_column}",
+                                           (aggregate.name,))
+                    self.db.cursor.execute(f"DELETE FROM {aggregate.table} WHERE {aggregate.count_column} < ? AND {aggregate.key_column} "
+                                           "IN (SELECT key FROM summary_changes WHERE aggregate=?)", (aggregate.minimum, aggregate.name))
+                    continue
+                keys: str = f"(SELECT key FROM summary_changes WHERE aggregate='{aggregate.name}')"
+                self.db.cursor.execute(f"DELETE FROM {aggregate.table} WHERE {aggregate.key_column} IN {keys}")
+                self.db.cursor.execute(f"INSERT INTO {aggregate.table} {aggregate.count_query(f'{aggregate.key} IN {keys}')}")
+            self.db.cursor.execute("DELETE FROM summary_changes")
+            self.db.connection.commit()
+        except BaseException:
+            self.db.connection.rollback()
+            raise
+        return changed
+
+    def lookup(self, name: str, key: str) -> int:
+        """
+        Returns one count of an aggregate.
+
+        Args:
+            name (str): The name of the aggregate, one of AGGREGATES.
+            key (str): The key, e.g. the region for "region_breeders".
+
+        Returns:
+            int: The count, or 0 if the key has none (or fewer than the aggregate's minimum).
+        """
+        aggregate: Aggregate = AGGREGATES[name]
+        row: tuple = self.db.cursor.execute(f"SELECT {aggregate.count_column} FROM {aggregate.table} "
+                                            f"WHERE {aggregate.key_column}=?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def counts(self, name: str) -> dict[str, int]:
+        """
+        Returns every count of an aggregate.
+
+        Args:
+            name (str): The name of the aggregate, one of AGGREGATES.
+
+        Returns:
+            dict[str, int]: The counts, keyed as the aggregate is.
+        """
+        aggregate: Aggregate = AGGREGATES[name]
+        return dict(self.db.cursor.execute(f"SELECT {aggregate.key_column}, {aggregate.count_column} FROM {aggregate.table}"))
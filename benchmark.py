@@ -0,0 +1,865 @@
+import argparse
+import json
+import os
+import time
+from fake_server import FakeEnciServer
+
+def point_scraper_at(base_url: str) -> None:
+    """
+    Points the scraper, and any worker processes it spawns, at the given base url.
+
+    Args:
+        base_url (str): The base url of the stand-in server.
+    """
+    import scraper
+    os.environ["ENCI_BASE_URL"] = base_url
+    scraper.BASE_URL = base_url
+
+def benchmark_backends(arguments: argparse.Namespace) -> None:
+    """
+    Measures breeders/sec of the pool and thread backends against a local stub server.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    from main import pooled_breeder_retrieval, pooled_breed_members_retrieval
+    from scraper import get_areas
+    from engine import create_backend
+    from scraper import init_worker
+    fake: FakeEnciServer = FakeEnciServer(regions=arguments.regions,
+                                          breeders_per_region=arguments.breeders_per_region,
+                                          latency=arguments.latency)
+    with fake:
+        point_scraper_at(fake.base_url)
+        areas = get_areas()
+        results: list[tuple[str, float, float]] = []
+        for name, concurrency in (("pool", arguments.pool_concurrency), ("thread", arguments.thread_concurrency)):
+            with create_backend(name, concurrency, initializer=init_worker, initargs=((concurrency,), {})) as backend:
+                start: float = time.perf_counter()
+                breeders = pooled_breeder_retrieval(areas, backend)
+                pooled_breed_members_retrieval(breeders, backend)
+                elapsed: float = time.perf_counter()-start
+            results.append((f"{name} ({backend.concurrency})", elapsed, len(breeders)/elapsed))
+    print("\n")
+    print(f"{'backend':<16}{'seconds':>10}{'breeders/sec':>15}")
+    for name, elapsed, rate in results:
+        print(f"{name:<16}{elapsed:>10.2f}{rate:>15.1f}")
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Returns the sample below which the given fraction of the sorted samples lie.
+    """
+    return sorted(samples)[min(len(samples)-1, int(len(samples)*fraction))]
+
+def benchmark_latency(arguments: argparse.Namespace) -> None:
+    """
+    Measures per-request latency of TakeAllevatore calls made with a new connection every time (before)
+    against calls made through the keep-alive session layer (after).
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import requests
+    from session import create_session, TIMEOUT
+    fake: FakeEnciServer = FakeEnciServer(regions=1, breeders_per_region=arguments.requests)
+    fake.start()
+    base_url: str = arguments.url or fake.base_url
+    urls: list[str] = [f"{base_url}/umbraco/enci/AllevatoriApi/TakeAllevatore?idAffisso={breeder_id}"
+                       for breeder_id in range(1, arguments.requests+1)]
+    session: requests.Session = create_session()
+    paths: dict[str, callable] = {
+        "new connection": lambda url: requests.request("GET", url, timeout=TIMEOUT),
+        "keep-alive session": lambda url: session.get(url, timeout=TIMEOUT),
+    }
+    print(f"{'path':<20}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, fetch in paths.items():
+        samples: list[float] = []
+        for url in urls:
+            start: float = time.perf_counter()
+            fetch(url).content
+            samples.append((time.perf_counter()-start)*1000.0)
+        print(f"{name:<20}{sum(samples)/len(samples):>10.2f}{percentile(samples, 0.5):>10.2f}"
+              f"{percentile(samples, 0.95):>10.2f}{percentile(samples, 0.99):>10.2f}")
+    fake.stop()
+
+def synthetic_scrape(rows: int) -> tuple[list, list, list, list]:
+    """
+    Builds scraped models that add up to roughly the given amount of database rows.
+
+    Args:
+        rows (int): The amount of rows across all tables.
+
+    Returns:
+        tuple[list, list, list, list]: The areas, breeders, members and breeds.
+    """
+    from models import Area, Breeder, Member, Breed
+    from fake_server import REGIONS, BREED_COUNT
+    # every breeder contributes a breeders, areas_breeders, 2 breeders_breeds, a members and 2 breeders_members rows
+    breeder_count: int = max(rows//7, 1)
+    areas: list[Area] = [Area(title, region) for title, region in REGIONS]
+    breeds: list[Breed] = [Breed(f"{code:03d}", str(1000+code), "2020-01-01T00:00:00", f"Razza {code}", 
+                                 str(code % 10 + 1), f"Gruppo {code % 10 + 1}") for code in range(BREED_COUNT)]
+    breeders: list[Breeder] = [Breeder(f"Allevamento {index}", f"Proprietario {index}", str(index), 
+                                       REGIONS[index % len(REGIONS)][1], 
+                                       [f"{index % BREED_COUNT:03d}", f"{(index+1) % BREED_COUNT:03d}"], []) 
+                               for index in range(breeder_count)]
+    members: list[Member] = [Member(f"Socio {index}", str(index), index % 2 == 0, f"Via Roma {index}", 
+                                    f"Comune {index % 500}", [str(index), str((index+1) % breeder_count)]) 
+                             for index in range(breeder_count)]
+    return areas, breeders, members, breeds
+
+def legacy_add_to_database(db, areas: list, breeders: list, members: list, breeds: list, progress) -> None:
+    """
+    The per-row loader add_to_database used before the bulk load, kept as the benchmark baseline.
+    """
+    for area in areas:
+        db.query_no_response("INSERT OR IGNORE INTO areas VALUES (?,?)", (area.title, area.region), progress)
+    for breeder in breeders:
+        db.query_no_response("INSERT OR IGNORE INTO breeders VALUES (?,?,?)", (breeder.title, breeder.owner, breeder.id), progress)
+    for breed in breeds:
+        db.query_no_response("INSERT OR IGNORE INTO breeds VALUES (?,?,?,?,?,?)", 
+                             (breed.code, breed.id, breed.last_litter, breed.description, breed.group_code, 
+                              breed.group_description), progress)
+    for member in members:
+        db.query_no_response("INSERT OR IGNORE INTO members VALUES (?,?,?,?,?)", 
+                             (member.description, member.id, member.signatory, member.address, member.town), progress)
+    for breeder in breeders:
+        db.query_no_response("INSERT OR IGNORE INTO areas_breeders VALUES (?,?)", (breeder.area_region, breeder.id), progress)
+        for breed_code in breeder.breeds:
+            db.query_no_response("INSERT OR IGNORE INTO breeders_breeds VALUES (?,?)", (breeder.id, breed_code), progress)
+    for member in members:
+        for breeder_id in member.breeder_ids:
+            db.query_no_response("INSERT OR IGNORE INTO breeders_members VALUES (?,?)", (breeder_id, member.id), progress)
+    db.commit_to_database()
+
+def benchmark_load(arguments: argparse.Namespace) -> None:
+    """
+    Measures the per-row loader against the bulk loader at several synthetic scrape sizes.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import tempfile
+    import sys
+    from database import Database
+    from main import add_to_database
+    from Progress import Progress
+    loaders: dict[str, callable] = {"per-row": legacy_add_to_database, "bulk": add_to_database}
+    results: list[tuple[int, str, float]] = []
+    for rows in arguments.rows:
+        areas, breeders, members, breeds = synthetic_scrape(rows)
+        total: int = (len(areas)+len(breeds)+2*len(breeders)+len(members)+sum(len(breeder.breeds) for breeder in breeders)
+                      +sum(len(member.breeder_ids) for member in members))
+        for name, loader in loaders.items():
+            if name == "per-row" and rows > arguments.per_row_max:
+                results.append((total, name, None))
+                continue
+            with tempfile.TemporaryDirectory() as directory:
+                db: Database = Database(os.path.join(directory, "storage.db"))
+                start: float = time.perf_counter()
+                with Progress(start_time=time.time(), total_amount=total) as progress:
+                    loader(db, areas, breeders, members, breeds, progress)
+                results.append((total, name, time.perf_counter()-start))
+                db.connection.close()
+        sys.stdout.write("\n")
+    print(f"{'rows':>10}  {'loader':<10}{'seconds':>10}{'rows/sec':>14}")
+    for total, name, elapsed in results:
+        if elapsed is None:
+            print(f"{total:>10}  {name:<10}{'skipped':>10}{'-':>14}")
+        else:
+            print(f"{total:>10}  {name:<10}{elapsed:>10.2f}{total/elapsed:>14.0f}")
+
+def benchmark_query(arguments: argparse.Namespace) -> None:
+    """
+    Measures the latency of the typed read queries on a synthetic database, with only the primary keys and LIKE scans
+    for search, as before the read indexes existed, against the secondary and FTS5 indexes.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import random
+    import tempfile
+    from database import Database, TABLES
+    from main import add_to_database
+    from fake_server import REGIONS, BREED_COUNT
+    areas, breeders, members, breeds = synthetic_scrape(arguments.rows)
+    generator: random.Random = random.Random(0)
+    queries: dict[str, callable] = {
+        "breeders_with_breed": lambda db: db.breeders_with_breed(f"{generator.randrange(BREED_COUNT):03d}"),
+        "members_in_town": lambda db: db.members_in_town(f"comune {generator.randrange(500)}"),
+        "breeders_in_region": lambda db: db.breeders_in_region(generator.choice(REGIONS)[1]),
+        "members_of_breeder": lambda db: db.members_of_breeder(str(generator.randrange(len(breeders)))),
+        "search_breeders": lambda db: db.search_breeders(f"allevamento {generator.randrange(len(breeders))}"),
+        "search_members": lambda db: db.search_members(f"roma {generator.randrange(len(members))}"),
+    }
+    def measure(db: Database, samples: int) -> dict[str, float]:
+        latencies: dict[str, float] = {}
+        for name, query in queries.items():
+            seconds: list[float] = []
+            for _ in range(samples):
+                start: float = time.perf_counter()
+                query(db)
+                seconds.append(time.perf_counter()-start)
+            latencies[name] = percentile(seconds, 0.5)
+        return latencies
+    with tempfile.TemporaryDirectory() as directory:
+        db: Database = Database(os.path.join(directory, "storage.db"))
+        add_to_database(db, areas, breeders, members, breeds, None)
+        rows: int = sum(db.cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES)
+        baseline: dict[str, float] = {}
+        if arguments.baseline_samples:
+            db.has_fts = False
+            baseline = measure(db, arguments.baseline_samples)
+            db.has_fts = Database(os.path.join(directory, "storage.db")).has_fts
+        start: float = time.perf_counter()
+        db.create_indexes()
+        index_seconds: float = time.perf_counter()-start
+        indexed: dict[str, float] = measure(db, arguments.samples)
+        db.connection.close()
+    print(f"{rows} rows, indexes built in {index_seconds:.2f} s, median of {arguments.baseline_samples} unindexed "
+          f"and {arguments.samples} indexed queries\n")
+    print(f"{'query':<22}{'unindexed ms':>14}{'indexed ms':>12}{'speed-up':>10}")
+    for name, seconds in indexed.items():
+        if name in baseline:
+            print(f"{name:<22}{baseline[name]*1000:>14.1f}{seconds*1000:>12.2f}{baseline[name]/seconds:>9.0f}x")
+        else:
+            print(f"{name:<22}{'skipped':>14}{seconds*1000:>12.2f}{'-':>10}")
+
+def benchmark_export(arguments: argparse.Namespace) -> None:
+    """
+    Measures the time and peak memory of exporting a synthetic database with fetchall, as a one-off script would,
+    against the chunked Exporter in every format, then the time of an incremental export after a few breeders change.
+    Peak memory is that of the Python allocations, traced on a separate run from the timed one.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import csv
+    import tempfile
+    import tracemalloc
+    from database import Database
+    from exporter import EXPORTS, WRITERS, Exporter
+    from main import add_to_database
+    areas, breeders, members, breeds = synthetic_scrape(arguments.rows)
+    def fetchall_csv(db: Database, directory: str) -> int:
+        rows: int = 0
+        for name in arguments.exports:
+            cursor = db.connection.execute(EXPORTS[name].query())
+            with open(os.path.join(directory, f"{name}.csv"), "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow([description[0] for description in cursor.description])
+                table: list[tuple] = cursor.fetchall()
+                writer.writerows(table)
+                rows += len(table)
+        return rows
+    def export_all(exporter: Exporter, format: str, incremental: bool = False) -> int:
+        return sum(exporter.export(name, format, incremental)[1] for name in arguments.exports)
+    def measure(export) -> tuple[float, float, int]:
+        start: float = time.perf_counter()
+        rows: int = export()
+        seconds: float = time.perf_counter()-start
+        tracemalloc.start()
+        export()
+        peak: int = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return seconds, peak, rows
+    with tempfile.TemporaryDirectory() as directory:
+        db: Database = Database(os.path.join(directory, "storage.db"))
+        add_to_database(db, areas, breeders, members, breeds, None)
+        db.create_indexes()
+        output: str = os.path.join(directory, "exports")
+        exporter: Exporter = Exporter(db, output, arguments.chunk_size)
+        results: dict[str, tuple[float, float, int]] = {"fetchall csv": measure(lambda: fetchall_csv(db, output))}
+        for format in WRITERS:
+            results[f"chunked {format}"] = measure(lambda: export_all(exporter, format))
+        sizes: dict[str, float] = {format: sum(os.path.getsize(os.path.join(output, f"{name}.{format}")) for name in arguments.exports)/1024/1024
+                                   for format in WRITERS}
+        # the first incremental export installs the change triggers and is a full one
+        export_all(exporter, "csv", True)
+        changed: int = max(len(breeders)*arguments.changed//100, 1)
+        db.cursor.execute("UPDATE breeders SET title=title||' *' WHERE rowid <= ?", (changed,))
+        db.connection.commit()
+        start: float = time.perf_counter()
+        incremental_rows: int = export_all(exporter, "csv", True)
+        incremental_seconds: float = time.perf_counter()-start
+        db.connection.close()
+    print(f"{arguments.rows} scraped rows, exporting {', '.join(arguments.exports)} in chunks of {arguments.chunk_size}\n")
+    print(f"{'export':<16}{'rows':>10}{'seconds':>9}{'peak MiB':>10}{'file MiB':>10}")
+    for name, (seconds, peak, rows) in results.items():
+        size: str = f"{sizes[name.split()[1]]:>10.1f}" if name.startswith("chunked") else f"{'':>10}"
+        print(f"{name:<16}{rows:>10}{seconds:>9.2f}{peak/1024/1024:>10.1f}{size}")
+    print(f"\nincremental csv after {changed} breeders changed: {incremental_rows} rows in {incremental_seconds:.3f} s")
+
+def benchmark_aggregates(arguments: argparse.Namespace) -> None:
+    """
+    Measures the dashboard aggregates on a synthetic database: computing each one at read time over the link tables,
+    whole with a GROUP BY and for one key, against reading its summary table, then the time of computing every
+    summary table and of refreshing them after some breeders' links change.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import tempfile
+    from database import Database
+    from aggregates import AGGREGATES, Aggregates
+    from main import add_to_database
+    from fake_server import BREED_COUNT
+    areas, breeders, members, breeds = synthetic_scrape(arguments.rows)
+    def best_of(function, repeat: int) -> float:
+        seconds: float = float("inf")
+        for _ in range(repeat):
+            start: float = time.perf_counter()
+            function()
+            seconds = min(seconds, time.perf_counter()-start)
+        return seconds
+    with tempfile.TemporaryDirectory() as directory:
+        db: Database = Database(os.path.join(directory, "storage.db"))
+        add_to_database(db, areas, breeders, members, breeds, None)
+        db.create_indexes()
+        aggregates: Aggregates = Aggregates(db)
+        compute_seconds: float = best_of(aggregates.compute, 1)
+        reads: dict[str, tuple[float, float, float, float]] = {}
+        for name, aggregate in AGGREGATES.items():
+            having: str = f" HAVING COUNT(DISTINCT {aggregate.value}) >= {aggregate.minimum}" if aggregate.minimum > 1 else ""
+            query: str = (f"SELECT {aggregate.key}, COUNT(DISTINCT {aggregate.value}) FROM {aggregate.source} "
+                          f"GROUP BY {aggregate.key}{having}")
+            key: str = next(iter(aggregates.counts(name)))
+            key_query: str = f"SELECT COUNT(DISTINCT {aggregate.value}) FROM {aggregate.source} WHERE {aggregate.key}=?"
+            reads[name] = (best_of(lambda: db.cursor.execute(query).fetchall(), arguments.repeat),
+                           best_of(lambda: aggregates.counts(name), arguments.repeat),
+                           best_of(lambda: db.cursor.execute(key_query, (key,)).fetchone(), arguments.repeat),
+                           best_of(lambda: aggregates.lookup(name, key), arguments.repeat))
+        changed: list = breeders[:max(len(breeders)*arguments.changed//100, 1)]
+        # the changed breeders each move to another region and breed, as a sync replacing their links would
+        db.cursor.executemany("UPDATE areas_breeders SET area_region=? WHERE breeder_id=?",
+                              ((areas[(index+1) % len(areas)].region, breeder.id) for index, breeder in enumerate(changed)))
+        db.cursor.executemany("DELETE FROM breeders_breeds WHERE breeder_id=?", ((breeder.id,) for breeder in changed))
+        db.cursor.executemany("INSERT INTO breeders_breeds VALUES (?,?)",
+                              ((breeder.id, f"{(index+7) % BREED_COUNT:03d}") for index, breeder in enumerate(changed)))
+        db.connection.commit()
+        start: float = time.perf_counter()
+        logged: int = aggregates.refresh()
+        refresh_seconds: float = time.perf_counter()-start
+        db.connection.close()
+    print(f"{arguments.rows} rows, every summary table computed in {compute_seconds:.2f} s\n")
+    print(f"{'aggregate':<24}{'GROUP BY ms':>13}{'summary ms':>12}{'one key ms':>12}{'lookup ms':>11}{'speed-up':>10}")
+    for name, (joined, summary, joined_key, lookup) in reads.items():
+        print(f"{name:<24}{joined*1000:>13.1f}{summary*1000:>12.2f}{joined_key*1000:>12.2f}{lookup*1000:>11.3f}{joined_key/lookup:>9.0f}x")
+    print(f"\nrefresh after {len(changed)} breeders changed: {logged} changed keys in {refresh_seconds:.3f} s")
+
+class LegacyBreed:
+    """
+    The dict-backed Breed used before the slotted models, kept as the benchmark baseline.
+    """
+    def __init__(self, code, id, last_litter, description, group_code, group_description):
+        self.code = code
+        self.id = id
+        self.last_litter = last_litter
+        self.description = description
+        self.group_code = group_code
+        self.group_description = group_description
+
+class LegacyMember:
+    """
+    The dict-backed Member used before the slotted models, kept as the benchmark baseline.
+    """
+    def __init__(self, description, id, signatory, address, town, breeder_ids=[]):
+        self.description = description
+        self.id = id
+        self.signatory = signatory
+        self.address = address
+        self.town = town
+        self.breeder_ids = breeder_ids
+
+class LegacyBreedMembers:
+    """
+    The dict-backed BreedMembers used before the slotted models, kept as the benchmark baseline.
+    """
+    def __init__(self, breeds=[], members=[]):
+        self.breeds = breeds
+        self.members = members
+
+def parse_breeder_details(document: str, breeder_id: str, breed_class: type, member_class: type, breed_members_class: type):
+    """
+    Builds a breeder's members and breeds from a TakeAllevatore document the way get_breeder_details does, with the given classes.
+    """
+    breeder_data: dict = json.loads(document)
+    return breed_members_class(
+        breeds=[breed_class(breed["CodRazza"], breed["IdUmb"], breed["UltimaCucciolata"], breed["DesRazza"], 
+                            breed["CodGruppo"], breed["DesGruppo"]) for breed in breeder_data["Razze"]],
+        members=[member_class(member["DesAssociato"], member["IdAnagrafica"], member["FlagFirmatario"] == "S", 
+                              member["DesIndirizzoSocio"], member["DesLocalitaSocio"], [breeder_id]) 
+                 for member in breeder_data["Soci"]])
+
+def benchmark_models(arguments: argparse.Namespace) -> None:
+    """
+    Measures the memory held by, and the pickled size of, the scraped details of enough breeders to make up the given
+    amount of members, with the dict-backed models against the slotted, interned models.
+    Each breeder's details are pickled separately, as they are when returned from a pool worker.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import gc
+    import pickle
+    import tracemalloc
+    from models import Breed, Member, BreedMembers
+    fake: FakeEnciServer = FakeEnciServer(members_per_breeder=arguments.members_per_breeder, 
+                                          breeds_per_breeder=arguments.breeds_per_breeder)
+    breeder_count: int = arguments.members//arguments.members_per_breeder
+    documents: list[str] = [json.dumps(fake.breeder_details(breeder_id)) for breeder_id in range(1, breeder_count+1)]
+    model_sets: dict[str, tuple[type, type, type]] = {
+        "dict-backed": (LegacyBreed, LegacyMember, LegacyBreedMembers),
+        "slotted": (Breed, Member, BreedMembers),
+    }
+    results: list[tuple[str, float, float, float, float, float]] = []
+    for name, classes in model_sets.items():
+        gc.collect()
+        tracemalloc.start()
+        # the details as built in a worker
+        details: list = [parse_breeder_details(document, str(breeder_id), *classes) 
+                         for breeder_id, document in enumerate(documents, start=1)]
+        built_mib: float = tracemalloc.get_traced_memory()[0]/1024/1024
+        tracemalloc.stop()
+        start: float = time.perf_counter()
+        payloads: list[bytes] = [pickle.dumps(breed_members, pickle.HIGHEST_PROTOCOL) for breed_members in details]
+        dump_seconds: float = time.perf_counter()-start
+        del details
+        gc.collect()
+        tracemalloc.start()
+        # the details as held by the main process once every result has arrived
+        start = time.perf_counter()
+        received: list = [pickle.loads(payload) for payload in payloads]
+        load_seconds: float = time.perf_counter()-start
+        received_mib: float = tracemalloc.get_traced_memory()[0]/1024/1024
+        tracemalloc.stop()
+        results.append((name, built_mib, received_mib, sum(len(payload) for payload in payloads)/1024/1024, 
+                        dump_seconds, load_seconds))
+        del received, payloads
+    print(f"{breeder_count} breeders, {breeder_count*arguments.members_per_breeder} members\n")
+    print(f"{'models':<14}{'built MiB':>11}{'received MiB':>14}{'pickled MiB':>13}{'dump s':>9}{'load s':>9}")
+    for name, built_mib, received_mib, pickled_mib, dump_seconds, load_seconds in results:
+        print(f"{name:<14}{built_mib:>11.1f}{received_mib:>14.1f}{pickled_mib:>13.1f}{dump_seconds:>9.2f}{load_seconds:>9.2f}")
+
+def legacy_sort_breed_members(breed_members: list) -> tuple[list, list]:
+    """
+    The sort_breed_members used before the entity registry, which merges breeder ids with a list scan, kept as the benchmark baseline.
+    """
+    members: dict = {}
+    breeds: dict = {}
+    for current_breed_members in breed_members:
+        for member in current_breed_members.members:
+            if member.id not in members:
+                members[member.id] = member
+            else:
+                for breeder_id in member.breeder_ids:
+                    if breeder_id not in members[member.id].breeder_ids:
+                        members[member.id].breeder_ids.append(breeder_id)
+        for breed in current_breed_members.breeds:
+            if breed.code not in breeds:
+                breeds[breed.code] = breed
+    return list(members.values()), list(breeds.values())
+
+def benchmark_registry(arguments: argparse.Namespace) -> None:
+    """
+    Measures merging the scraped details of many breeders into unique members and breeds: the list-scan merge
+    against the entity registry.
+    Every member belongs to --breeders-per-member breeders, so merging their breeder ids is exercised.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    from models import Breed, Member, BreedMembers
+    from main import sort_breed_members
+    breeder_count: int = arguments.members*arguments.breeders_per_member//2
+    def build_details() -> list:
+        # each breeder has two members, and each member is shared by breeders_per_member consecutive breeders
+        return [BreedMembers(breeds=[Breed(f"{breeder_id % 350:03d}", str(1000+breeder_id % 350), "2020-01-01T00:00:00", 
+                                           f"Razza {breeder_id % 350}", "1", "Gruppo 1")],
+                             members=[Member(f"Socio {member_id}", str(member_id), False, "Via Roma", "Comune", [str(breeder_id)])
+                                      for member_id in ((breeder_id*2)//arguments.breeders_per_member, 
+                                                        (breeder_id*2+1)//arguments.breeders_per_member)])
+                for breeder_id in range(breeder_count)]
+    mergers: dict[str, callable] = {
+        "list scan": legacy_sort_breed_members,
+        "registry": sort_breed_members,
+    }
+    print(f"{breeder_count} breeders, {arguments.members} members\n")
+    print(f"{'merge':<20}{'seconds':>10}")
+    for name, merger in mergers.items():
+        details: list = build_details()
+        start: float = time.perf_counter()
+        merger(details)
+        print(f"{name:<20}{time.perf_counter()-start:>10.3f}")
+
+def benchmark_parse(arguments: argparse.Namespace) -> None:
+    """
+    Measures the time and peak memory of building the Breeder objects of one large GetAllevatori listing, decoding
+    the whole document first as get_breeders used to, against decoding it one breeder at a time with iter_array.
+    The faster decoders are included when they are installed. Peak memory excludes the response body itself.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import gc
+    import tracemalloc
+    import jsonstream
+    from models import Breeder
+    fake: FakeEnciServer = FakeEnciServer(regions=1, breeders_per_region=arguments.breeders, 
+                                          breeds_per_breeder=arguments.breeds_per_breeder)
+    region: str = fake.regions[0][1]
+    content: bytes = json.dumps(fake.breeders(region)).encode("utf-8")
+    def build(breeder_data) -> list:
+        return [Breeder(title=breeder["DesAffisso"], owner=breeder["Proprietario"], id=breeder["IdAffisso"], 
+                        area_region=region, breeds=breeder["Razze"]) for breeder in breeder_data]
+    def stream(decoder) -> list:
+        # iter_array with the given streaming decoder, or None for the json module
+        installed = jsonstream.ijson
+        jsonstream.ijson = decoder
+        try:
+            return build(jsonstream.iter_array(content))
+        finally:
+            jsonstream.ijson = installed
+    parsers: dict[str, object] = {"json.loads(text)": lambda: build(json.loads(content.decode("utf-8")))}
+    if jsonstream.orjson is not None:
+        parsers["orjson.loads(bytes)"] = lambda: build(jsonstream.orjson.loads(content))
+    parsers["iter_array (json)"] = lambda: stream(None)
+    if jsonstream.ijson is not None:
+        parsers["iter_array (ijson)"] = lambda: stream(jsonstream.ijson)
+    print(f"{arguments.breeders} breeders, {len(content)/1024/1024:.1f} MiB listing, "
+          f"orjson {'installed' if jsonstream.orjson else 'not installed'}, ijson {'installed' if jsonstream.ijson else 'not installed'}\n")
+    print(f"{'parser':<22}{'seconds':>9}{'peak MiB':>10}{'kept MiB':>10}")
+    for name, parse in parsers.items():
+        # the best of a few timed runs, then one traced run for memory, as tracing slows allocation down
+        seconds: float = float("inf")
+        for _ in range(arguments.repeat):
+            gc.collect()
+            start: float = time.perf_counter()
+            breeders: list = parse()
+            seconds = min(seconds, time.perf_counter()-start)
+            del breeders
+        gc.collect()
+        tracemalloc.start()
+        breeders = parse()
+        kept, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del breeders
+        print(f"{name:<22}{seconds:>9.3f}{peak/1024/1024:>10.1f}{kept/1024/1024:>10.1f}")
+
+def stage_results(results: list, staging) -> None:
+    """
+    Writes scraped results to the worker's staging database one breeder at a time, as stage_breeder_details does.
+    """
+    from staging import listing_rows, details_rows
+    for breeder, breed_members in results:
+        staging.write({**listing_rows([breeder]), **details_rows(breed_members)})
+
+def benchmark_staging(arguments: argparse.Namespace) -> None:
+    """
+    Measures storing scraped results with the single writer, where the main process merges and bulk loads every
+    result once scraping is done, against staging, where the workers write their own staging databases while
+    scraping and the main process only merges the files with ATTACH.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import sqlite3
+    import tempfile
+    from multiprocessing import Pool
+    from models import Area, Breeder, Breed, Member, BreedMembers
+    from database import Database, TABLES
+    from main import sort_breed_members, add_to_database
+    from staging import StagingArea
+    fake: FakeEnciServer = FakeEnciServer(regions=1, breeders_per_region=arguments.breeders, 
+                                          members_per_breeder=arguments.members_per_breeder)
+    title, region = fake.regions[0]
+    areas: list[Area] = [Area(title, region)]
+    results: list[tuple[Breeder, BreedMembers]] = []
+    for listed in fake.breeders(region):
+        breeder: Breeder = Breeder(listed["DesAffisso"], listed["Proprietario"], listed["IdAffisso"], region, listed["Razze"])
+        document: dict = fake.breeder_details(int(breeder.id))
+        results.append((breeder, BreedMembers(
+            breeds=[Breed(breed["CodRazza"], breed["IdUmb"], breed["UltimaCucciolata"], breed["DesRazza"], 
+                          breed["CodGruppo"], breed["DesGruppo"]) for breed in document["Razze"]],
+            members=[Member(member["DesAssociato"], member["IdAnagrafica"], member["FlagFirmatario"] == "S", 
+                            member["DesIndirizzoSocio"], member["DesLocalitaSocio"], [breeder.id]) for member in document["Soci"]])))
+    def count_rows(path: str) -> int:
+        connection: sqlite3.Connection = sqlite3.connect(path)
+        rows: int = sum(connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES)
+        connection.close()
+        return rows
+    with tempfile.TemporaryDirectory() as directory:
+        # the single writer: every result reaches the main process, which sorts and loads them all
+        path: str = os.path.join(directory, "single.db")
+        start: float = time.perf_counter()
+        members, breeds = sort_breed_members([breed_members for _, breed_members in results])
+        add_to_database(Database(path), areas, [breeder for breeder, _ in results], members, breeds, None)
+        single_seconds: float = time.perf_counter()-start
+        single_rows: int = count_rows(path)
+        # staging: each worker writes its share as it goes, and the main process merges the files
+        staging: StagingArea = StagingArea(os.path.join(directory, "staging"))
+        staging.write({"areas": [(area.title, area.region) for area in areas]})
+        shares: list[list] = [results[index::arguments.workers] for index in range(arguments.workers)]
+        with Pool(arguments.workers) as pool:
+            start = time.perf_counter()
+            pool.starmap(stage_results, [(share, staging) for share in shares])
+            staging_seconds: float = time.perf_counter()-start
+        path = os.path.join(directory, "staged.db")
+        files: int = len(staging.paths())
+        start = time.perf_counter()
+        Database(path).merge_staging(staging.paths())
+        merge_seconds: float = time.perf_counter()-start
+        staging.remove()
+        staged_rows: int = count_rows(path)
+    print(f"{arguments.breeders} breeders, {single_rows} rows, {arguments.workers} workers, {files} staging databases\n")
+    print(f"{'writer':<10}{'worker s':>10}{'main s':>9}{'rows':>10}")
+    print(f"{'single':<10}{'-':>10}{single_seconds:>9.2f}{single_rows:>10}")
+    print(f"{'staged':<10}{staging_seconds:>10.2f}{merge_seconds:>9.2f}{staged_rows:>10}")
+    print("\nThe worker seconds overlap the scrape's network waits, while the main process seconds come after it.")
+
+def benchmark_startup(arguments: argparse.Namespace) -> None:
+    """
+    Measures what a small run pays before its first breeder request: importing main with and without numpy and bs4,
+    getting the areas from the page or from the region catalog, and creating the pool backend with its workers started
+    at once or on first use. Then times whole runs refreshing one breeder against a stand-in server, with the kept
+    areas and with --refresh-regions. Every time is the best of --repeat runs.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import subprocess
+    import sys
+    import tempfile
+    from catalog import RegionCatalog
+    from database import Database
+    from engine import PoolBackend
+    from scraper import get_areas
+    package: str = os.path.dirname(os.path.abspath(__file__))
+    def best_of(function) -> float:
+        seconds: float = float("inf")
+        for _ in range(arguments.repeat):
+            start: float = time.perf_counter()
+            function()
+            seconds = min(seconds, time.perf_counter()-start)
+        return seconds
+    def python(*args: str, **kwargs) -> None:
+        subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL, **kwargs)
+    results: dict[str, float] = {}
+    results["python -c pass"] = best_of(lambda: python("-c", "pass"))
+    results["import main, numpy, bs4"] = best_of(lambda: python("-c", "import main, numpy, bs4", cwd=package))
+    results["import main"] = best_of(lambda: python("-c", "import main", cwd=package))
+    fake: FakeEnciServer = FakeEnciServer(regions=20, breeders_per_region=10)
+    with fake, tempfile.TemporaryDirectory() as directory:
+        point_scraper_at(fake.base_url)
+        regions: str = os.path.join(directory, "regions.json")
+        results["get_areas (page)"] = best_of(get_areas)
+        RegionCatalog(regions).areas(refresh=True)
+        results["catalog (kept)"] = best_of(lambda: RegionCatalog(regions).areas())
+        results["catalog (304)"] = best_of(lambda: RegionCatalog(regions, max_age=0.0).areas())
+        results[f"pool of {arguments.workers} (eager)"] = best_of(lambda: PoolBackend(arguments.workers).pool.terminate())
+        results[f"pool of {arguments.workers} (lazy)"] = best_of(lambda: PoolBackend(arguments.workers).close())
+        path: str = os.path.join(directory, "storage.db")
+        db: Database = Database(path)
+        db.cursor.execute("INSERT INTO breeders VALUES ('Allevamento 1', 'Proprietario 1', '1')")
+        db.connection.commit()
+        db.connection.close()
+        run: list[str] = [os.path.join(package, "main.py"), "--breeder", "1", "--output", path, "--regions-file", regions]
+        results["main.py --breeder 1"] = best_of(lambda: python(*run, cwd=directory))
+        results["... --refresh-regions"] = best_of(lambda: python(*run, "--refresh-regions", cwd=directory))
+        results["... --region PIE"] = best_of(lambda: python(*run[:-4], "--region", "PIE", *run[-4:], "--details-rate", "1000",
+                                                             cwd=directory))
+    print(f"\n{'step':<28}{'ms':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<28}{seconds*1000:>10.1f}")
+
+def peak_rss_mib() -> tuple[float, float]:
+    """
+    Returns the peak resident set size of this process and of its largest finished child process, in MiB.
+    """
+    import resource
+    # ru_maxrss is in KiB on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss/1024.0)
+
+def benchmark_end_to_end(arguments: argparse.Namespace) -> None:
+    """
+    Runs the whole scrape against a local stand-in server: get_areas, pooled_breeder_retrieval,
+    pooled_breed_members_retrieval, sort_breed_members and database_integration, timing each phase.
+    Faults and latency can be injected into the server so that retries and rate limiting are exercised too.
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    import sqlite3
+    import tempfile
+    from main import pooled_breeder_retrieval, pooled_breed_members_retrieval, sort_breed_members, database_integration
+    from engine import create_backend, DEFAULT_CONCURRENCY
+    from ratelimit import create_limiters
+    from metrics import Metrics
+    from adaptive import ConcurrencyController
+    from engine import ADAPTIVE_CONCURRENCY
+    from retry import create_policies
+    import scraper
+    fake: FakeEnciServer = FakeEnciServer(regions=arguments.regions, breeders_per_region=arguments.breeders_per_region,
+                                          members_per_breeder=arguments.members_per_breeder,
+                                          breeds_per_breeder=arguments.breeds_per_breeder, latency=arguments.latency,
+                                          error_rate=arguments.error_rate, throttle_rate=arguments.throttle_rate,
+                                          retry_after=arguments.retry_after, seed=arguments.seed)
+    concurrency: int = arguments.concurrency or (ADAPTIVE_CONCURRENCY if arguments.adaptive else DEFAULT_CONCURRENCY)[arguments.backend]
+    limiters: dict = create_limiters({"TakeAllevatore": (arguments.details_rate, arguments.details_rate)})
+    run_metrics: Metrics = Metrics()
+    controller: ConcurrencyController = ConcurrencyController(maximum=concurrency) if arguments.adaptive else None
+    # failed requests are retried with a far shorter back-off than in production, so that faults cost the benchmark little time
+    retry_policies: dict = create_policies(base_delay=arguments.retry_delay)
+    initargs: tuple = ((concurrency,), limiters, None, run_metrics, controller, retry_policies)
+    working_directory: str = os.getcwd()
+    with fake, tempfile.TemporaryDirectory() as directory:
+        point_scraper_at(fake.base_url)
+        scraper.init_worker(*initargs)
+        if controller:
+            controller.start_sampling(0.25)
+        # database_integration writes storage.db to the working directory
+        os.chdir(directory)
+        try:
+            start: float = time.perf_counter()
+            with run_metrics.phase("areas"):
+                areas = scraper.get_areas()
+            with create_backend(arguments.backend, concurrency, initializer=scraper.init_worker, initargs=initargs) as backend:
+                with run_metrics.phase("breeders"):
+                    breeders = pooled_breeder_retrieval(areas, backend)
+                with run_metrics.phase("details"):
+                    breed_members = pooled_breed_members_retrieval(breeders, backend)
+            with run_metrics.phase("sort"):
+                members, breeds = sort_breed_members(breed_members)
+            with run_metrics.phase("database"):
+                database_integration(areas, breeders, members, breeds)
+            elapsed: float = time.perf_counter()-start
+            connection: sqlite3.Connection = sqlite3.connect("storage.db")
+            rows: int = sum(connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                            for table in ("areas", "breeders", "members", "breeds", "areas_breeders",
+                                          "breeders_breeds", "breeders_members"))
+            connection.close()
+        finally:
+            os.chdir(working_directory)
+    summary: dict = run_metrics.summary()
+    details: dict = summary["endpoints"]["TakeAllevatore"]
+    main_rss, worker_rss = peak_rss_mib()
+    results: dict = {
+        "backend": f"{arguments.backend} ({concurrency})",
+        "breeders": len(breeders),
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "breeders_per_second": round(len(breeders)/elapsed, 1),
+        "phases_seconds": summary["phases_seconds"],
+        "requests": sum(endpoint["requests"] for endpoint in summary["endpoints"].values()),
+        "retries": details["retries"],
+        "status_codes": details["status_codes"],
+        "details_latency_seconds": details["latency_seconds"],
+        "peak_rss_mib": {"main": round(main_rss, 1), "workers": round(worker_rss, 1)},
+    }
+    if controller:
+        results["concurrency_limit"] = controller.stop_sampling()
+    print("\n")
+    print(f"{'phase':<12}{'seconds':>10}{'share':>8}")
+    for phase, seconds in results["phases_seconds"].items():
+        print(f"{phase:<12}{seconds:>10.3f}{seconds/elapsed:>8.1%}")
+    print(f"{'total':<12}{elapsed:>10.3f}")
+    print(f"\n{results['backend']}: {len(breeders)} breeders, {rows} rows, {results['breeders_per_second']} breeders/sec")
+    print(f"requests {results['requests']}, retries {results['retries']}, detail statuses {results['status_codes']}")
+    print(f"detail latency p50/p95/p99 {details['latency_seconds']['p50']*1000:.1f}/"
+          f"{details['latency_seconds']['p95']*1000:.1f}/{details['latency_seconds']['p99']*1000:.1f} ms")
+    print(f"peak RSS {main_rss:.1f} MiB main (including the stand-in server), {worker_rss:.1f} MiB largest worker")
+    if controller and results["concurrency_limit"]:
+        print("adaptive concurrency over time: "+", ".join(f"{seconds:g}s {limit:g}" for seconds, limit, _ in results["concurrency_limit"][::4]))
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command line arguments.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Benchmarks the scraper against a local stand-in server.")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+    backends: argparse.ArgumentParser = benchmarks.add_parser("backends", help="Compares the pool and thread fetch backends.")
+    backends.add_argument("--regions", type=int, default=20)
+    backends.add_argument("--breeders-per-region", type=int, default=100)
+    backends.add_argument("--latency", type=float, default=0.05, help="Seconds the stub server delays every response by.")
+    backends.add_argument("--pool-concurrency", type=int, default=None)
+    backends.add_argument("--thread-concurrency", type=int, default=128)
+    backends.set_defaults(run=benchmark_backends)
+    latency: argparse.ArgumentParser = benchmarks.add_parser("latency", help="Compares per-request latency with and without keep-alive sessions.")
+    latency.add_argument("--requests", type=int, default=500)
+    latency.add_argument("--url", default=None, help="The base url to benchmark against instead of the local stub, e.g. https://www.enci.it")
+    latency.set_defaults(run=benchmark_latency)
+    load: argparse.ArgumentParser = benchmarks.add_parser("load", help="Compares the per-row and bulk database loaders.")
+    load.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    load.add_argument("--per-row-max", type=int, default=1_000_000, 
+                      help="Skip the per-row loader above this many rows, as it takes minutes per million.")
+    load.set_defaults(run=benchmark_load)
+    query: argparse.ArgumentParser = benchmarks.add_parser("query", help="Compares the read queries with and without the secondary and full-text indexes.")
+    query.add_argument("--rows", type=int, default=1_000_000)
+    query.add_argument("--samples", type=int, default=50, help="The queries of each kind timed with the indexes.")
+    query.add_argument("--baseline-samples", type=int, default=1, 
+                       help="The queries of each kind timed without the indexes, 0 to skip, as each scans whole tables.")
+    query.set_defaults(run=benchmark_query)
+    export: argparse.ArgumentParser = benchmarks.add_parser("export", help="Compares exporting with fetchall against the chunked exporter, and times an incremental export.")
+    export.add_argument("--rows", type=int, default=1_000_000)
+    export.add_argument("--exports", nargs="+", default=["breeder_details", "member_details", "breeders_members"])
+    export.add_argument("--chunk-size", type=int, default=10_000)
+    export.add_argument("--changed", type=int, default=1, help="The percentage of breeders changed before the incremental export.")
+    export.set_defaults(run=benchmark_export)
+    aggregate: argparse.ArgumentParser = benchmarks.add_parser("aggregates", help="Compares computing the dashboard aggregates at read time with reading the summary tables.")
+    aggregate.add_argument("--rows", type=int, default=1_000_000)
+    aggregate.add_argument("--repeat", type=int, default=3)
+    aggregate.add_argument("--changed", type=int, default=1, help="The percentage of breeders changed before the refresh.")
+    aggregate.set_defaults(run=benchmark_aggregates)
+    models: argparse.ArgumentParser = benchmarks.add_parser("models", help="Compares the memory and pickled size of the dict-backed and slotted models.")
+    models.add_argument("--members", type=int, default=100_000)
+    models.add_argument("--members-per-breeder", type=int, default=4)
+    models.add_argument("--breeds-per-breeder", type=int, default=2)
+    models.set_defaults(run=benchmark_models)
+    registry: argparse.ArgumentParser = benchmarks.add_parser("registry", help="Compares the list-scan merge of members with the entity registry.")
+    registry.add_argument("--members", type=int, default=20_000)
+    registry.add_argument("--breeders-per-member", type=int, default=100)
+    registry.set_defaults(run=benchmark_registry)
+    parse: argparse.ArgumentParser = benchmarks.add_parser("parse", help="Compares decoding a whole GetAllevatori listing with decoding it one breeder at a time.")
+    parse.add_argument("--breeders", type=int, default=50_000, help="The breeders in the listing.")
+    parse.add_argument("--breeds-per-breeder", type=int, default=3)
+    parse.add_argument("--repeat", type=int, default=3)
+    parse.set_defaults(run=benchmark_parse)
+    staging: argparse.ArgumentParser = benchmarks.add_parser("staging", help="Compares the single database writer with per-worker staging databases merged with ATTACH.")
+    staging.add_argument("--breeders", type=int, default=50_000)
+    staging.add_argument("--members-per-breeder", type=int, default=2)
+    staging.add_argument("--workers", type=int, default=4)
+    staging.set_defaults(run=benchmark_staging)
+    startup: argparse.ArgumentParser = benchmarks.add_parser("startup", help="Measures imports, the region catalog, backend creation and small targeted runs.")
+    startup.add_argument("--workers", type=int, default=32, help="The worker processes of the pool backend created.")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(run=benchmark_startup)
+    end_to_end: argparse.ArgumentParser = benchmarks.add_parser("e2e", help="Runs the whole scrape and database load against a stand-in server.")
+    end_to_end.add_argument("--regions", type=int, default=20)
+    end_to_end.add_argument("--breeders-per-region", type=int, default=100)
+    end_to_end.add_argument("--members-per-breeder", type=int, default=2)
+    end_to_end.add_argument("--breeds-per-breeder", type=int, default=2)
+    end_to_end.add_argument("--latency", type=float, default=0.0, help="Seconds the stub server delays every response by.")
+    end_to_end.add_argument("--error-rate", type=float, default=0.0, help="Fraction of detail requests answered with a 503.")
+    end_to_end.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of detail requests answered with a 429.")
+    end_to_end.add_argument("--retry-after", type=float, default=0.1, help="Seconds of the Retry-After header sent with a 429.")
+    end_to_end.add_argument("--retry-delay", type=float, default=0.01, help="Seconds of the first back-off before the scraper retries a failed request.")
+    end_to_end.add_argument("--seed", type=int, default=0, help="Seed of the injected faults.")
+    end_to_end.add_argument("--backend", choices=["pool", "thread"], default="pool")
+    end_to_end.add_argument("--concurrency", type=int, default=None)
+    end_to_end.add_argument("--adaptive", action="store_true", help="Adapt the requests in flight, up to --concurrency.")
+    end_to_end.add_argument("--details-rate", type=float, default=10_000.0, 
+                            help="Detail requests per second allowed by the rate limiter, which is what honours Retry-After.")
+    end_to_end.add_argument("--output", default=None, help="Also write the results to this JSON file, to compare against later runs.")
+    end_to_end.set_defaults(run=benchmark_end_to_end)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments: argparse.Namespace = parse_arguments()
+    arguments.run(arguments)
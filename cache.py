@@ -0,0 +1,195 @@
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import requests
+import sqlite3
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+# the seconds a cached response of each endpoint is served without asking the server again
+DEFAULT_TTL: dict[str, float] = {
+    "allevatori-con-affisso": 7*24*3600.0,
+    "GetAllevatori": 24*3600.0,
+    "TakeAllevatore": 24*3600.0,
+}
+# the headers that describe the body as sent over the wire, which no longer apply once it is stored decoded
+WIRE_HEADERS: set[str] = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+class CacheMissError(Exception):
+    """
+    Raised in offline mode when a request has no cached response.
+    """
+
+class CachedResponse:
+    """
+    A response stored in the cache.
+    """
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    fetched_at: float
+    def __init__(self, status: int, headers: dict[str, str], body: bytes, fetched_at: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fetched_at = fetched_at
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time()-self.fetched_at < ttl
+    def validators(self) -> dict[str, str]:
+        """
+        Returns the headers that ask the server to answer 304 if the cached response is still current.
+        """
+        headers: dict[str, str] = {}
+        if "ETag" in self.headers:
+            headers["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+    def to_response(self, url: str) -> requests.Response:
+        """
+        Rebuilds the requests.Response the scraper functions expect.
+        """
+        response: requests.Response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = url
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+class ResponseCache:
+    """
+    An on-disk cache of HTTP responses keyed by method, url and body. Bodies are stored compressed,
+    and the least recently used responses are evicted once the cache grows past its size limit.
+    The sqlite3 connection is opened lazily in each process that uses the cache.
+    """
+    path: str
+    ttl: dict[str, float]
+    max_size: int
+    offline: bool
+
+    def __init__(self, path: str = "cache.db", ttl: dict[str, float] = None, max_size: int = 512*1024*1024,
+                 offline: bool = False):
+        """
+        Initializes the cache settings.
+
+        Args:
+            path (str, optional): The sqlite3 database the responses are stored in. Defaults to "cache.db".
+            ttl (dict[str, float], optional): The seconds responses of each endpoint stay fresh. Defaults to DEFAULT_TTL.
+            max_size (int, optional): The most compressed bytes to store before evicting. Defaults to 512MiB.
+            offline (bool, optional): Serve only from the cache, never sending a request. Defaults to False.
+        """
+        self.path = path
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.max_size = max_size
+        self.offline = offline
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def __getstate__(self) -> dict:
+        # only the settings are shipped to worker processes, which open their own connection
+        return {"path": self.path, "ttl": self.ttl, "max_size": self.max_size, "offline": self.offline}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, creating the cache table on first use.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            self._pid = os.getpid()
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT, status INTEGER, headers TEXT, body BLOB, size INTEGER, fetched_at REAL, accessed_at REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at)")
+            self._connection.commit()
+            self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self._connection
+
+    @staticmethod
+    def key(method: str, url: str, body: str | bytes = None) -> str:
+        """
+        Returns the cache key of a request.
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return hashlib.sha1(method.upper().encode("utf-8")+b" "+url.encode("utf-8")+b"\n"+(body or b"")).hexdigest()
+
+    def get(self, key: str) -> CachedResponse:
+        """
+        Returns the cached response with the given key, or None if there is none.
+        """
+        with self._lock:
+            connection: sqlite3.Connection = self.connection()
+            row: tuple = connection.execute("SELECT status, headers, body, fetched_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE responses SET accessed_at=? WHERE key=?", (time.time(), key))
+            connection.commit()
+        status, headers, body, fetched_at = row
+        return CachedResponse(status, json.loads(headers), zlib.decompress(body), fetched_at)
+
+    def put(self, key: str, endpoint: str, response: requests.Response) -> None:
+        """
+        Stores a response, evicting the least recently used responses if the cache is over its size limit.
+        """
+        headers: dict[str, str] = {name: value for name, value in response.headers.items() if name.lower() not in WIRE_HEADERS}
+        body: bytes = zlib.compress(response.content, 6)
+        now: float = time.time()
+        with self._lock:
+            connection: sqlite3.Connection = self.connection()
+            connection.execute("INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?,?)",
+                               (key, endpoint, response.status_code, json.dumps(headers), body, len(body), now, now))
+            connection.commit()
+            self._size += len(body)
+            if self._size > self.max_size:
+                self.evict()
+
+    def refresh(self, key: str) -> None:
+        """
+        Marks a cached response as fetched now, after the server confirmed it is still current.
+        """
+        with self._lock:
+            connection: sqlite3.Connection = self.connection()
+            connection.execute("UPDATE responses SET fetched_at=?, accessed_at=? WHERE key=?", (time.time(), time.time(), key))
+            connection.commit()
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used responses until the cache is back under 90% of its size limit.
+        Must be called while holding the lock.
+        """
+        connection: sqlite3.Connection = self.connection()
+        self._size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        excess: int = self._size-int(self.max_size*0.9)
+        if excess <= 0:
+            return
+        evicted: list[tuple[str]] = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            evicted.append((key,))
+            excess -= size
+            self._size -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM responses WHERE key=?", evicted)
+        connection.commit()
+
+# the response cache of this process, or None if responses are not cached
+CACHE: ResponseCache = None
+
+def configure_cache(cache: ResponseCache) -> None:
+    """
+    Sets the response cache used by requests sent from this process.
+
+    Args:
+        cache (ResponseCache): The response cache, or None to disable caching.
+    """
+    global CACHE
+    CACHE = cache
@@ -0,0 +1,92 @@
+from models import *
+from cache import CacheMissError
+from scraper import request_areas_page, parse_areas
+import requests
+import json
+import os
+import time
+
+class RegionCatalog(object):
+    """
+    The areas of Italy from the allevatori-con-affisso page, kept in a JSON file so that most runs neither request nor
+    parse the page. The copy is used as is for max_age seconds, then revalidated with the page's ETag/Last-Modified:
+    an unchanged page costs a 304 with no parsing, and a changed one is parsed again. If the revalidation fails, the
+    stale copy is used. A file that is missing, corrupt or lists no areas is replaced by requesting the page.
+    """
+    path: str
+    max_age: float
+
+    def __init__(self, path: str = "regions.json", max_age: float = 7*86400.0):
+        """
+        Initializes the catalog.
+
+        Args:
+            path (str, optional): The JSON file to keep the areas in. Defaults to "regions.json".
+            max_age (float, optional): The seconds a copy is used for before it is revalidated. Defaults to a week.
+        """
+        self.path = path
+        self.max_age = max_age
+
+    def read(self) -> dict:
+        """
+        Reads the copy, checking that it lists at least one area and that every area has a title and a region.
+
+        Returns:
+            dict: The copy, or None if there is no valid one.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                document: dict = json.load(file)
+            areas: list = document["areas"]
+            valid: bool = (isinstance(document["validated_at"], (int, float)) and len(areas) > 0 and
+                           all(isinstance(title, str) and isinstance(region, str) and title and region for title, region in areas))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return document if valid else None
+
+    def write(self, document: dict) -> None:
+        """
+        Writes the copy, replacing the file at once so that an interrupted write leaves the old copy.
+        """
+        temporary: str = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(document, file, ensure_ascii=False)
+        os.replace(temporary, self.path)
+
+    def areas(self, refresh: bool = False) -> list[Area]:
+        """
+        Returns the areas of Italy, from the copy while it is fresh, otherwise from the website.
+
+        Args:
+            refresh (bool, optional): Request and parse the page whatever the state of the copy. Defaults to False.
+
+        Returns:
+            list[Area]: A list of Area objects.
+        """
+        document: dict = None if refresh else self.read()
+        now: float = time.time()
+        if document is not None and now-document["validated_at"] <= self.max_age:
+            return [Area(title, region) for title, region in document["areas"]]
+        headers: dict[str, str] = {}
+        if document is not None and document.get("etag"):
+            headers["If-None-Match"] = document["etag"]
+        if document is not None and document.get("last_modified"):
+            headers["If-Modified-Since"] = document["last_modified"]
+        try:
+            page: requests.Response = request_areas_page(headers=headers)
+        except (requests.RequestException, CacheMissError) as error:
+            if document is None:
+                raise
+            print(f"\nCould not revalidate {self.path}, using the copy from "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(document['validated_at']))}: {error}")
+            return [Area(title, region) for title, region in document["areas"]]
+        if page.status_code == 304 and document is None:
+            # a 304 has no page to parse, so request it again unconditionally
+            page = request_areas_page()
+        if page.status_code == 304:
+            document["validated_at"] = now
+        else:
+            document = {"areas": [[area.title, area.region] for area in parse_areas(page.content)], "validated_at": now,
+                        "etag": page.headers.get("ETag"), "last_modified": page.headers.get("Last-Modified")}
+        self.write(document)
+        return [Area(title, region) for title, region in document["areas"]]
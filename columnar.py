@@ -0,0 +1,55 @@
+from database import Database
+import numpy as np
+
+def fetch_columns(db: Database, query: str, chunk_size: int = 100000) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Runs a query of two columns and returns them as string arrays, fetched a chunk at a time so the rows are never
+    all held as tuples.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The first and second column.
+    """
+    cursor = db.connection.execute(query)
+    firsts: list[np.ndarray] = []
+    seconds: list[np.ndarray] = []
+    while rows := cursor.fetchmany(chunk_size):
+        columns: np.ndarray = np.array(rows, dtype=str)
+        firsts.append(columns[:, 0])
+        seconds.append(columns[:, 1])
+    if not firsts:
+        return np.array([], dtype=str), np.array([], dtype=str)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def count_distinct(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the distinct values paired with each key. Both columns are encoded as integer codes, each (key, value)
+    pair as one int64, and the distinct pairs are counted per key with bincount.
+
+    Args:
+        keys (np.ndarray): The key of each pair.
+        values (np.ndarray): The value of each pair.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The distinct keys, sorted, and the count of each.
+    """
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    unique_values, value_codes = np.unique(values, return_inverse=True)
+    pairs: np.ndarray = np.unique(key_codes.astype(np.int64)*len(unique_values)+value_codes)
+    counts: np.ndarray = np.bincount(pairs//max(len(unique_values), 1), minlength=len(unique_keys))
+    return unique_keys, counts
+
+def count_distinct_pairs(db: Database, query: str, minimum: int = 1) -> list[tuple[str, int]]:
+    """
+    Runs a query of (key, value) pairs and counts the distinct values of each key with count_distinct.
+
+    Args:
+        db (Database): The database to query.
+        query (str): The query of the pairs.
+        minimum (int, optional): The smallest count kept. Defaults to 1.
+
+    Returns:
+        list[tuple[str, int]]: Each key whose count reaches the minimum, with its count.
+    """
+    keys, counts = count_distinct(*fetch_columns(db, query))
+    kept: np.ndarray = counts >= minimum
+    return list(zip(keys[kept].tolist(), counts[kept].tolist()))
@@ -1,5 +1,68 @@
 import sqlite3
+import itertools
+from typing import Iterable
 from Progress import *
+from models import *
+
+# the scraped tables in the order their rows are loaded
+TABLES: list[str] = ["areas", "breeders", "breeds", "members", "areas_breeders", "breeders_breeds", "breeders_members"]
+
+# the secondary indexes of the read queries, keyed by name. The primary keys of the link tables lead with the breeder id,
+# so looking up the other way round needs these. They are created after loading, as keeping them up to date row by row
+# slows the load down
+INDEXES: dict[str, str] = {
+    "breeders_breeds_by_breed": "breeders_breeds(breed_code, breeder_id)",
+    "breeders_members_by_member": "breeders_members(member_id, breeder_id)",
+    "areas_breeders_by_breeder": "areas_breeders(breeder_id, area_region)",
+    "members_by_town": "members(town COLLATE NOCASE)",
+}
+# the FTS5 full-text indexes, keyed by name, as the table they index and its indexed columns
+SEARCH_INDEXES: dict[str, tuple[str, list[str]]] = {
+    "breeders_search": ("breeders", ["title", "owner"]),
+    "members_search": ("members", ["description", "address", "town"]),
+}
+# the columns a Breeder is built from, with its area, breeds and members gathered from the link tables
+BREEDER_COLUMNS: str = ("b.title, b.owner, b.id, "
+                        "(SELECT MIN(area_region) FROM areas_breeders WHERE breeder_id=b.id), "
+                        "(SELECT GROUP_CONCAT(breed_code) FROM breeders_breeds WHERE breeder_id=b.id), "
+                        "(SELECT GROUP_CONCAT(member_id) FROM breeders_members WHERE breeder_id=b.id)")
+# the columns a Member is built from, with its breeders gathered from the link table
+MEMBER_COLUMNS: str = ("m.description, m.id, m.signatory, m.address, m.town, "
+                       "(SELECT GROUP_CONCAT(breeder_id) FROM breeders_members WHERE member_id=m.id)")
+
+def split_ids(value: str) -> list[str]:
+    """
+    Splits a GROUP_CONCAT of ids into a sorted list, which is empty for NULL.
+    """
+    return sorted(value.split(",")) if value else []
+
+def breeder_from_row(row: tuple) -> Breeder:
+    """
+    Builds a Breeder from a row of BREEDER_COLUMNS.
+    """
+    title, owner, breeder_id, area_region, breed_codes, member_ids = row
+    return Breeder(title, owner, breeder_id, area_region, split_ids(breed_codes), split_ids(member_ids))
+
+def member_from_row(row: tuple) -> Member:
+    """
+    Builds a Member from a row of MEMBER_COLUMNS.
+    """
+    description, member_id, signatory, address, town, breeder_ids = row
+    # the signatory column has text affinity, so the stored flag comes back as "1" or "0"
+    return Member(description, member_id, signatory in (1, "1"), address, town, split_ids(breeder_ids))
+
+def search_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query matching every word, so that punctuation in the text is not read as query syntax.
+    A word ending in * matches as a prefix.
+    """
+    terms: list[str] = []
+    for word in text.split():
+        prefix: bool = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"'+word.replace('"', '""')+'"'+("*" if prefix else ""))
+    return " ".join(terms)
 
 class Database:
     """
@@ -8,12 +71,21 @@ class Database:
     connection: sqlite3.Connection
     cursor = sqlite3.Cursor
     
-    def __init__(self):
+    def __init__(self, path: str = "storage.db", check_same_thread: bool = True):
         """
         Initializes the database connection and cursor.
+
+        Args:
+            path (str, optional): The sqlite3 database file. Defaults to "storage.db".
+            check_same_thread (bool, optional): Only allow the thread that opened the connection to use it. 
+                Defaults to True.
         """
-        self.connection = sqlite3.connect("storage.db")
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
         self.cursor = self.connection.cursor()
+        # the INSERT OR IGNORE statement of each table, built on first use
+        self.insert_queries: dict[str, str] = {}
+        # without FTS5, search falls back to LIKE scans
+        self.has_fts: bool = self.cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0] == 1
         self.init_db()
         
     def init_db(self):
@@ -40,7 +112,324 @@ class Database:
         self.cursor.execute(query, params)
         if progress:
             progress.increment_amount_completed()
-            progress.display_progress()
+    
+    def bulk_load(self, tables: dict[str, Iterable[tuple]], chunk_size: int = 10000, progress: Progress = None) -> None:
+        """
+        Inserts the rows of each table with executemany, in chunks, inside a single transaction. 
+        Rows that already exist are ignored. Either every row is loaded or, on error, none are.
+
+        Args:
+            tables (dict[str, Iterable[tuple]]): The rows to insert, keyed by table name. Loaded in order.
+            chunk_size (int, optional): The amount of rows per executemany call. Defaults to 10000.
+            progress (Progress, optional): Progress object, updated once per chunk. Defaults to None.
+        """
+        # the load is a single transaction, so a WAL with relaxed syncing is durable enough and far cheaper
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("PRAGMA cache_size=-65536")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        self.connection.commit()
+        self.cursor.execute("BEGIN")
+        try:
+            for table, rows in tables.items():
+                query: str = self.insert_query(table)
+                rows = iter(rows)
+                while chunk := list(itertools.islice(rows, chunk_size)):
+                    self.cursor.executemany(query, chunk)
+                    if progress:
+                        progress.increment_amount_completed(len(chunk))
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+    
+    def insert_query(self, table: str) -> str:
+        """
+        Returns the INSERT OR IGNORE statement of a table, with a placeholder for each of its columns.
+        """
+        if table not in self.insert_queries:
+            column_count: int = len(self.cursor.execute(f"PRAGMA table_info({table})").fetchall())
+            self.insert_queries[table] = f"INSERT OR IGNORE INTO {table} VALUES ({','.join('?'*column_count)})"
+        return self.insert_queries[table]
+
+    def insert_rows(self, tables: dict[str, list[tuple]]) -> None:
+        """
+        Inserts a few rows into each table in one transaction, ignoring rows that already exist. 
+        Unlike bulk_load, it sets no pragmas, so it is cheap enough to call once per scraped result.
+
+        Args:
+            tables (dict[str, list[tuple]]): The rows to insert, keyed by table name.
+        """
+        self.cursor.execute("BEGIN")
+        try:
+            for table, rows in tables.items():
+                if rows:
+                    self.cursor.executemany(self.insert_query(table), rows)
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+    def merge_staging(self, paths: list[str]) -> None:
+        """
+        Copies every row of the given staging databases, which have the same tables, into this database. Each staging
+        database is attached and its tables copied with INSERT OR IGNORE ... SELECT, so no row passes through Python,
+        and the copy into this database is a single transaction. Rows that already exist are ignored.
+        SQLite attaches at most a handful of databases at once, so beyond that many, the surplus staging databases
+        are first folded into the others.
+
+        Args:
+            paths (list[str]): The staging database files.
+        """
+        paths = list(paths)
+        limit: int = self.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        while len(paths) > limit:
+            # fold the next staging databases into the first, which is scratch space too
+            target: Database = Database(paths[0])
+            target.attach_and_copy(paths[1:limit+1])
+            target.connection.close()
+            paths = [paths[0]]+paths[limit+1:]
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.connection.commit()
+        self.attach_and_copy(paths)
+
+    def attach_and_copy(self, paths: list[str]) -> None:
+        """
+        Attaches databases, copies every row of their tables into this database in one transaction, and detaches them.
+
+        Args:
+            paths (list[str]): The database files, no more than SQLite can attach at once.
+        """
+        # databases can only be attached and detached outside of a transaction
+        self.connection.commit()
+        aliases: list[str] = [f"staging{index}" for index in range(len(paths))]
+        for alias, path in zip(aliases, paths):
+            self.cursor.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        try:
+            self.cursor.execute("BEGIN")
+            try:
+                for table in TABLES:
+                    for alias in aliases:
+                        self.cursor.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM {alias}.{table}")
+                self.connection.commit()
+            except BaseException:
+                self.connection.rollback()
+                raise
+        finally:
+            for alias in aliases:
+                self.cursor.execute(f"DETACH DATABASE {alias}")
+
+    def upsert_breeders(self, listed: list[tuple[Area, list[Breeder]]], breeders: list[tuple[Breeder, BreedMembers]]) -> None:
+        """
+        Updates breeders in place inside a single transaction: their rows are inserted or overwritten, and their
+        breed and member links are replaced. Members and breeds are inserted or overwritten too.
+        The area links of every listed area are replaced by its listing, so a breeder listed in several areas keeps
+        the links of the areas that were not listed again. Rows of breeders that are not passed are left untouched.
+
+        Args:
+            listed (list[tuple[Area, list[Breeder]]]): The areas whose listings were requested again, inserted or
+                renamed, with the breeders listed in each.
+            breeders (list[tuple[Breeder, BreedMembers]]): The breeders to update, with their members and breeds.
+        """
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.connection.commit()
+        self.cursor.execute("BEGIN")
+        try:
+            self.cursor.executemany("INSERT INTO areas VALUES (?,?) ON CONFLICT(region) DO UPDATE SET title=excluded.title",
+                                    ((area.title, area.region) for area, _ in listed))
+            self.cursor.executemany("INSERT INTO breeders VALUES (?,?,?) ON CONFLICT(id) DO UPDATE SET "
+                                    "title=excluded.title, owner=excluded.owner",
+                                    ((breeder.title, breeder.owner, breeder.id) for breeder, _ in breeders))
+            self.cursor.executemany("INSERT INTO members VALUES (?,?,?,?,?) ON CONFLICT(id) DO UPDATE SET "
+                                    "description=excluded.description, signatory=excluded.signatory, "
+                                    "address=excluded.address, town=excluded.town",
+                                    ((member.description, member.id, member.signatory, member.address, member.town)
+                                     for _, breed_members in breeders for member in breed_members.members))
+            self.cursor.executemany("INSERT INTO breeds VALUES (?,?,?,?,?,?) ON CONFLICT(code) DO UPDATE SET "
+                                    "id=excluded.id, last_litter=excluded.last_litter, description=excluded.description, "
+                                    "group_code=excluded.group_code, group_description=excluded.group_description",
+                                    ((breed.code, breed.id, breed.last_litter, breed.description, breed.group_code,
+                                      breed.group_description) for _, breed_members in breeders for breed in breed_members.breeds))
+            # the links of each breeder are replaced wholesale, so links that disappeared from the website go too
+            for table in ("breeders_breeds", "breeders_members"):
+                self.cursor.executemany(f"DELETE FROM {table} WHERE breeder_id=?", ((breeder.id,) for breeder, _ in breeders))
+            self.cursor.executemany("INSERT OR IGNORE INTO breeders_breeds VALUES (?,?)",
+                                    ((breeder.id, breed_code) for breeder, _ in breeders for breed_code in breeder.breeds))
+            self.cursor.executemany("INSERT OR IGNORE INTO breeders_members VALUES (?,?)",
+                                    ((breeder.id, member.id) for breeder, breed_members in breeders
+                                     for member in breed_members.members))
+            # a listed area loses the breeders it no longer lists, and gains those it lists that are stored
+            for area, area_breeders in listed:
+                listed_ids: set[str] = {breeder.id for breeder in area_breeders}
+                stored_ids: list[str] = [row[0] for row in self.cursor.execute(
+                    "SELECT breeder_id FROM areas_breeders WHERE area_region=?", (area.region,)).fetchall()]
+                self.cursor.executemany("DELETE FROM areas_breeders WHERE area_region=? AND breeder_id=?",
+                                        ((area.region, breeder_id) for breeder_id in stored_ids if breeder_id not in listed_ids))
+                self.cursor.executemany("INSERT OR IGNORE INTO areas_breeders SELECT ?, id FROM breeders WHERE id=?",
+                                        ((area.region, breeder_id) for breeder_id in listed_ids))
+            # a breeder updated without its area being listed again, e.g. a retried dead letter, keeps the area it was listed in
+            self.cursor.executemany("INSERT OR IGNORE INTO areas_breeders VALUES (?,?)",
+                                    ((breeder.area_region, breeder.id) for breeder, _ in breeders))
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+    def drop_indexes(self) -> None:
+        """
+        Drops the secondary indexes, so that a large load does not have to keep them up to date. 
+        Recreate them with create_indexes afterwards.
+        """
+        for name in INDEXES:
+            self.cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        self.connection.commit()
+
+    def create_indexes(self) -> None:
+        """
+        Creates the secondary indexes, rebuilds the full-text indexes from their tables, and refreshes the statistics
+        the query planner uses. Called once data has been loaded or updated.
+        """
+        for name, columns in INDEXES.items():
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+        if self.has_fts:
+            for name, (table, columns) in SEARCH_INDEXES.items():
+                # external content tables, which hold the index only and read the text from the indexed table
+                self.cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5({', '.join(columns)}, "
+                                    f"content='{table}', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')")
+                self.cursor.execute(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+        self.cursor.execute("ANALYZE")
+        self.connection.commit()
+
+    def breeders_with_breed(self, breed_code: str) -> list[Breeder]:
+        """
+        Returns the breeders of a breed.
+
+        Args:
+            breed_code (str): The code of the breed.
+
+        Returns:
+            list[Breeder]: The breeders, with their area, breed codes and member ids.
+        """
+        return [breeder_from_row(row) for row in self.cursor.execute(
+            f"SELECT {BREEDER_COLUMNS} FROM breeders b WHERE b.id IN "
+            "(SELECT breeder_id FROM breeders_breeds WHERE breed_code=?) ORDER BY b.id", (breed_code,)).fetchall()]
+
+    def breeders_in_region(self, region: str) -> list[tuple[Breeder, list[Breed]]]:
+        """
+        Returns the breeders of an area along with their breeds.
+
+        Args:
+            region (str): The region code of the area, e.g. "LOM".
+
+        Returns:
+            list[tuple[Breeder, list[Breed]]]: Each breeder, with its area, breed codes and member ids, and its breeds.
+        """
+        breeders: list[Breeder] = [breeder_from_row(row) for row in self.cursor.execute(
+            f"SELECT {BREEDER_COLUMNS} FROM breeders b WHERE b.id IN "
+            "(SELECT breeder_id FROM areas_breeders WHERE area_region=?) ORDER BY b.id", (region,)).fetchall()]
+        breeds: dict[str, Breed] = {row[0]: Breed(*row) for row in self.cursor.execute(
+            "SELECT DISTINCT br.code, br.id, br.last_litter, br.description, br.group_code, br.group_description "
+            "FROM areas_breeders ab JOIN breeders_breeds bb ON bb.breeder_id=ab.breeder_id "
+            "JOIN breeds br ON br.code=bb.breed_code WHERE ab.area_region=?", (region,))}
+        return [(breeder, [breeds[code] for code in breeder.breeds if code in breeds]) for breeder in breeders]
+
+    def breeders_by_id(self, breeder_ids: list[str]) -> list[Breeder]:
+        """
+        Returns breeders as they were last stored.
+
+        Args:
+            breeder_ids (list[str]): The ids of the breeders.
+
+        Returns:
+            list[Breeder]: The breeders that are stored, with their area, breed codes and member ids.
+        """
+        return [breeder_from_row(row) for row in self.cursor.execute(
+            f"SELECT {BREEDER_COLUMNS} FROM breeders b WHERE b.id IN ({','.join('?'*len(breeder_ids))}) ORDER BY b.id",
+            breeder_ids).fetchall()]
+
+    def members_in_town(self, town: str) -> list[Member]:
+        """
+        Returns the members living in a town, ignoring case.
+
+        Args:
+            town (str): The town.
+
+        Returns:
+            list[Member]: The members, with the ids of their breeders.
+        """
+        return [member_from_row(row) for row in self.cursor.execute(
+            f"SELECT {MEMBER_COLUMNS} FROM members m WHERE m.town=? COLLATE NOCASE ORDER BY m.id", (town,)).fetchall()]
+
+    def members_of_breeder(self, breeder_id: str) -> list[Member]:
+        """
+        Returns the members of a breeder.
+
+        Args:
+            breeder_id (str): The id of the breeder.
+
+        Returns:
+            list[Member]: The members, with the ids of their breeders.
+        """
+        return [member_from_row(row) for row in self.cursor.execute(
+            f"SELECT {MEMBER_COLUMNS} FROM members m WHERE m.id IN "
+            "(SELECT member_id FROM breeders_members WHERE breeder_id=?) ORDER BY m.id", (breeder_id,)).fetchall()]
+
+    def search_breeders(self, text: str, limit: int = 20) -> list[Breeder]:
+        """
+        Finds the breeders whose title or owner contain every word of the text, best matches first.
+
+        Args:
+            text (str): The words to search for. A word ending in * matches as a prefix.
+            limit (int, optional): The most breeders to return. Defaults to 20.
+
+        Returns:
+            list[Breeder]: The breeders, with their area, breed codes and member ids.
+        """
+        return [breeder_from_row(row) for row in self.search("breeders_search", BREEDER_COLUMNS, "b", text, limit)]
+
+    def search_members(self, text: str, limit: int = 20) -> list[Member]:
+        """
+        Finds the members whose name, address or town contain every word of the text, best matches first.
+
+        Args:
+            text (str): The words to search for. A word ending in * matches as a prefix.
+            limit (int, optional): The most members to return. Defaults to 20.
+
+        Returns:
+            list[Member]: The members, with the ids of their breeders.
+        """
+        return [member_from_row(row) for row in self.search("members_search", MEMBER_COLUMNS, "m", text, limit)]
+
+    def search(self, name: str, columns: str, alias: str, text: str, limit: int) -> list[tuple]:
+        """
+        Runs a full-text search, or, without FTS5, a LIKE scan of every indexed column for each word.
+        """
+        table, indexed_columns = SEARCH_INDEXES[name]
+        query: str = search_query(text)
+        if not query:
+            return []
+        if self.has_fts:
+            return self.cursor.execute(f"SELECT {columns} FROM {name} s JOIN {table} {alias} ON {alias}.rowid=s.rowid "
+                                       f"WHERE {name} MATCH ? ORDER BY s.rank LIMIT ?", (query, limit)).fetchall()
+        words: list[str] = [word.replace('"', "").rstrip("*") for word in text.split()]
+        words = [word for word in words if word]
+        if not words:
+            return []
+        conditions: str = " AND ".join("("+" OR ".join(f"{alias}.{column} LIKE ?" for column in indexed_columns)+")"
+                                       for _ in words)
+        return self.cursor.execute(f"SELECT {columns} FROM {table} {alias} WHERE {conditions} LIMIT ?",
+                                   [f"%{word}%" for word in words for _ in indexed_columns]+[limit]).fetchall()
+
+    def region_sizes(self) -> dict[str, int]:
+        """
+        Counts the breeders stored for each area.
+
+        Returns:
+            dict[str, int]: The amount of breeders in each area, keyed by area region.
+        """
+        return dict(self.cursor.execute("SELECT area_region, COUNT(*) FROM areas_breeders GROUP BY area_region").fetchall())
     
     def commit_to_database(self):
         """
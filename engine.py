@@ -0,0 +1,312 @@
+from multiprocessing import Pool
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+import functools
+import itertools
+import math
+import os
+import queue
+import threading
+
+# the default maximum amount of in-flight requests of each backend
+DEFAULT_CONCURRENCY: dict[str, int] = {
+    "pool": os.cpu_count(),
+    "thread": 128,
+}
+# the default ceiling on in-flight requests of each backend when the concurrency adapts, as the controller picks the level
+ADAPTIVE_CONCURRENCY: dict[str, int] = {
+    "pool": 32,
+    "thread": 128,
+}
+
+def call_indexed(task: tuple[int, Callable, tuple]) -> tuple[int, object]:
+    """
+    Runs a task shipped to a worker process and tags the result with the task's index.
+
+    Args:
+        task (tuple[int, Callable, tuple]): The index of the task, the function to run and its arguments.
+
+    Returns:
+        tuple[int, object]: The index of the task and the result of the function.
+    """
+    index, func, args = task
+    return index, func(*args)
+
+def run_task(func: Callable, args: tuple) -> object:
+    """
+    Runs a task yielded by Scheduler.tasks, which carries its own function.
+
+    Args:
+        func (Callable): The function to run.
+        args (tuple): The arguments to run func with.
+
+    Returns:
+        object: The result of the function.
+    """
+    return func(*args)
+
+class Scheduler(object):
+    """
+    A priority queue of tasks that can keep growing while earlier tasks run.
+    Its tasks generator is handed to a backend's as_completed with run_task, and blocks until a task is submitted,
+    so work discovered from one result can be scheduled straight away. At most window tasks are handed to the
+    backend ahead of their results, so that later submissions with a higher priority are not stuck behind a long backlog.
+    """
+    queue: queue.PriorityQueue
+    window: threading.Semaphore
+    dispatched: dict[int, object]
+
+    def __init__(self, window: int):
+        """
+        Initializes the empty queue.
+
+        Args:
+            window (int): The most tasks dispatched to the backend whose results have not been completed.
+        """
+        self.queue = queue.PriorityQueue()
+        self.window = threading.Semaphore(window)
+        self.dispatched = {}
+        self.order = itertools.count()
+        self.aborted = False
+
+    def submit(self, priority: float, key: object, func: Callable, args: tuple) -> None:
+        """
+        Queues a task. Tasks with a lower priority value run first, and tasks of equal priority run in submission order.
+
+        Args:
+            priority (float): The priority of the task.
+            key (object): Identifies the task when its result is completed.
+            func (Callable): The function to run. Must be picklable for a PoolBackend.
+            args (tuple): The arguments to run func with.
+        """
+        self.queue.put((priority, next(self.order), key, func, args))
+
+    def close(self) -> None:
+        """
+        Ends the tasks generator once every task submitted so far has been dispatched.
+        """
+        self.queue.put((math.inf, next(self.order), None, None, None))
+
+    def abort(self) -> None:
+        """
+        Ends the tasks generator straight away, dropping any queued tasks. Must be called if the results stop being
+        consumed early, as otherwise the generator stays blocked and the backend can not shut down.
+        """
+        self.aborted = True
+        self.queue.put((-math.inf, next(self.order), None, None, None))
+        self.window.release()
+
+    def tasks(self) -> Iterator[tuple[Callable, tuple]]:
+        """
+        Yields the most urgent queued task whenever the window allows, until closed.
+
+        Yields:
+            tuple[Callable, tuple]: The function of the task and its arguments.
+        """
+        for index in itertools.count():
+            self.window.acquire()
+            if self.aborted:
+                return
+            _, _, key, func, args = self.queue.get()
+            if func is None:
+                return
+            self.dispatched[index] = key
+            yield func, args
+
+    def complete(self, index: int) -> object:
+        """
+        Marks the task at the given position of the tasks generator as finished.
+
+        Args:
+            index (int): The index as_completed yielded with the result.
+
+        Returns:
+            object: The key the task was submitted with.
+        """
+        self.window.release()
+        return self.dispatched.pop(index)
+
+class PoolBackend(object):
+    """
+    A fetch backend that runs tasks on a multiprocessing pool, one in-flight request per process.
+    The worker processes are started when the first tasks are run, so a run that ends up sending no requests,
+    e.g. when everything is answered from the caches, never pays for them.
+    """
+    concurrency: int
+    initializer: Callable
+    initargs: tuple
+    _pool: Pool
+
+    def __init__(self, concurrency: int = None, initializer: Callable = None, initargs: tuple = ()):
+        """
+        Initializes the backend, without starting the process pool yet.
+
+        Args:
+            concurrency (int, optional): The number of worker processes. Defaults to the number of cores.
+            initializer (Callable, optional): Called with initargs in every worker process when it starts. Defaults to None.
+            initargs (tuple, optional): The arguments passed to initializer. Defaults to ().
+        """
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY["pool"]
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool = None
+
+    @property
+    def pool(self) -> Pool:
+        """
+        Returns the process pool, starting it on first use.
+        """
+        if self._pool is None:
+            self._pool = Pool(self.concurrency, initializer=self.initializer, initargs=self.initargs)
+        return self._pool
+
+    def starmap(self, func: Callable, iterable: Iterable[tuple]) -> list:
+        """
+        Runs func for every tuple of arguments in iterable and returns the results in order.
+
+        Args:
+            func (Callable): The function to run. Must be picklable.
+            iterable (Iterable[tuple]): The argument tuples to run func with.
+
+        Returns:
+            list: The results of each call, in the same order as iterable.
+        """
+        return self.pool.starmap(func, iterable)
+
+    def as_completed(self, func: Callable, iterable: Iterable[tuple]) -> Iterator[tuple[int, object]]:
+        """
+        Runs func for every tuple of arguments in iterable and yields the results as soon as each one finishes.
+
+        Args:
+            func (Callable): The function to run. Must be picklable.
+            iterable (Iterable[tuple]): The argument tuples to run func with.
+
+        Yields:
+            tuple[int, object]: The position of the arguments in iterable and the result of the call.
+        """
+        yield from self.pool.imap_unordered(call_indexed, ((index, func, args) for index, args in enumerate(iterable)))
+
+    def close(self) -> None:
+        """
+        Stops the worker processes once their outstanding tasks have finished.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class ThreadBackend(object):
+    """
+    A fetch backend that runs tasks on a pool of threads in a single process, one in-flight request per thread.
+    The scraper functions block on requests, which releases the GIL while it waits on the network, so the threads
+    overlap their requests without the memory and start-up of a process each. The threads share the process's
+    session, rate limiters, cache and metrics.
+    """
+    concurrency: int
+    executor: ThreadPoolExecutor
+
+    def __init__(self, concurrency: int = None, initializer: Callable = None, initargs: tuple = ()):
+        """
+        Initializes the executor the scraper functions run on.
+
+        Args:
+            concurrency (int, optional): The number of threads, each with one in-flight request. Defaults to 128.
+            initializer (Callable, optional): Called with initargs once, as all requests run in this process. Defaults to None.
+            initargs (tuple, optional): The arguments passed to initializer. Defaults to ().
+        """
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY["thread"]
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        if initializer:
+            initializer(*initargs)
+
+    def starmap(self, func: Callable, iterable: Iterable[tuple]) -> list:
+        """
+        Runs func for every tuple of arguments in iterable and returns the results in order.
+
+        Args:
+            func (Callable): The function to run.
+            iterable (Iterable[tuple]): The argument tuples to run func with.
+
+        Returns:
+            list: The results of each call, in the same order as iterable.
+        """
+        return list(self.executor.map(run_task, itertools.repeat(func), iterable))
+
+    def as_completed(self, func: Callable, iterable: Iterable[tuple]) -> Iterator[tuple[int, object]]:
+        """
+        Runs func for every tuple of arguments in iterable and yields the results as soon as each one finishes.
+        The arguments are pulled from iterable in a background thread, as a Scheduler's tasks block until work is
+        submitted, while the caller consumes the results. An error raised by iterable is raised here.
+
+        Args:
+            func (Callable): The function to run.
+            iterable (Iterable[tuple]): The argument tuples to run func with.
+
+        Yields:
+            tuple[int, object]: The position of the arguments in iterable and the result of the call.
+        """
+        # (index, result, error) of each call, and (None, amount submitted, error) once iterable is exhausted or fails
+        results: queue.Queue = queue.Queue()
+        def put_result(index: int, future: Future) -> None:
+            error: BaseException = future.exception()
+            results.put((index, None, error) if error else (index, future.result(), None))
+        def produce() -> None:
+            submitted: int = 0
+            try:
+                for index, args in enumerate(iterable):
+                    self.executor.submit(func, *args).add_done_callback(functools.partial(put_result, index))
+                    submitted += 1
+            except BaseException as error:
+                results.put((None, None, error))
+            else:
+                results.put((None, submitted, None))
+        threading.Thread(target=produce, daemon=True).start()
+        yielded: int = 0
+        submitted: int = None
+        while submitted is None or yielded < submitted:
+            index, result, error = results.get()
+            if error:
+                raise error
+            if index is None:
+                submitted = result
+                continue
+            yielded += 1
+            yield index, result
+
+    def close(self) -> None:
+        """
+        Stops the executor once its outstanding tasks have finished.
+        """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+BACKENDS: dict[str, type] = {
+    "pool": PoolBackend,
+    "thread": ThreadBackend,
+}
+
+def create_backend(name: str, concurrency: int = None, initializer: Callable = None, 
+                   initargs: tuple = ()) -> PoolBackend | ThreadBackend:
+    """
+    Creates the fetch backend with the given name.
+
+    Args:
+        name (str): The name of the backend, either "pool" or "thread".
+        concurrency (int, optional): The maximum amount of in-flight requests. Defaults to the backend's default.
+        initializer (Callable, optional): Called with initargs in every worker when it starts. Defaults to None.
+        initargs (tuple, optional): The arguments passed to initializer. Defaults to ().
+
+    Returns:
+        PoolBackend | ThreadBackend: The fetch backend.
+    """
+    return BACKENDS[name](concurrency, initializer, initargs)
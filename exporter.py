@@ -0,0 +1,362 @@
+from typing import Iterator
+from database import Database
+import numpy as np
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+# the primary key columns of each scraped table, which identify a changed row
+PRIMARY_KEYS: dict[str, list[str]] = {
+    "areas": ["region"],
+    "breeders": ["id"],
+    "breeds": ["code"],
+    "members": ["id"],
+    "areas_breeders": ["area_region", "breeder_id"],
+    "breeders_breeds": ["breeder_id", "breed_code"],
+    "breeders_members": ["breeder_id", "member_id"],
+}
+
+class Export(object):
+    """
+    A table or denormalized view that can be exported: the columns selected from a table, keyed by some of its
+    columns, and the tables whose changes affect a row, with the position of the row's key within their keys.
+    """
+    name: str
+    table: str
+    columns: str
+    keys: list[str]
+    sources: dict[str, list[int]]
+    def __init__(self, name: str, table: str, columns: str, keys: list[str], sources: dict[str, list[int]]):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.keys = keys
+        self.sources = sources
+    def __str__(self):
+        return self.name
+    def __repr__(self):
+        return Export.__str__(self)
+    def query(self, where: str = "1") -> str:
+        """
+        Returns the query selecting the rows of the export that match the condition, with the table aliased as t.
+        """
+        return f"SELECT {self.columns} FROM {self.table} t WHERE {where}"
+
+# every table as is, and the breeders and members with their relations gathered into one row each
+EXPORTS: dict[str, Export] = {
+    **{table: Export(table, table, "t.*", keys, {table: list(range(len(keys)))}) for table, keys in PRIMARY_KEYS.items()},
+    "breeder_details": Export("breeder_details", "breeders",
+                              "t.id, t.title, t.owner, "
+                              "(SELECT MIN(area_region) FROM areas_breeders WHERE breeder_id=t.id) AS region, "
+                              "(SELECT a.title FROM areas_breeders ab JOIN areas a ON a.region=ab.area_region "
+                              "WHERE ab.breeder_id=t.id ORDER BY a.region LIMIT 1) AS area, "
+                              "(SELECT GROUP_CONCAT(breed_code, ' ') FROM breeders_breeds WHERE breeder_id=t.id) AS breeds, "
+                              "(SELECT COUNT(*) FROM breeders_members WHERE breeder_id=t.id) AS members",
+                              ["id"], {"breeders": [0], "areas_breeders": [1], "breeders_breeds": [0], "breeders_members": [0]}),
+    "member_details": Export("member_details", "members",
+                             "t.id, t.description, t.signatory, t.address, t.town, "
+                             "(SELECT GROUP_CONCAT(breeder_id, ' ') FROM breeders_members WHERE member_id=t.id) AS breeders",
+                             ["id"], {"members": [0], "breeders_members": [1]}),
+}
+
+class CsvWriter(object):
+    """
+    Writes rows to a CSV file with a header row.
+    """
+    def __init__(self, path: str, columns: list[str]):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+    def write(self, rows: list[tuple]) -> None:
+        self.writer.writerows(rows)
+    def close(self) -> None:
+        self.file.close()
+
+class JsonlWriter(object):
+    """
+    Writes rows to a JSON Lines file, one object per row.
+    """
+    def __init__(self, path: str, columns: list[str]):
+        self.file = open(path, "w", encoding="utf-8")
+        self.columns = columns
+    def write(self, rows: list[tuple]) -> None:
+        self.file.writelines(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False)+"\n" for row in rows)
+    def close(self) -> None:
+        self.file.close()
+
+class NpzWriter(object):
+    """
+    Writes rows to a compressed NumPy .npz archive holding one array per column. Integer columns, the counts and
+    flags, are stored as int64. Every other column is dictionary-encoded: the array holds int32 codes into a
+    "<column>_dictionary" array of its distinct values. NULL is stored as -1 in both. The arrays are spooled to a
+    temporary file per column as chunks arrive, so only the dictionaries are held in memory. read_npz_column decodes
+    a column.
+    """
+    def __init__(self, path: str, columns: list[str]):
+        self.path = path
+        self.columns = columns
+        self.files: list = [tempfile.TemporaryFile() for _ in columns]
+        self.dictionaries: list[dict[object, int]] = [{} for _ in columns]
+        # "int" or "dictionary", decided by the first chunk
+        self.kinds: list[str] = [None]*len(columns)
+        self.count: int = 0
+    def write(self, rows: list[tuple]) -> None:
+        if not rows:
+            return
+        for index, values in enumerate(zip(*rows)):
+            if self.kinds[index] is None:
+                self.kinds[index] = "int" if all(type(value) is int for value in values) else "dictionary"
+            if self.kinds[index] == "int":
+                array: np.ndarray = np.array([-1 if value is None else value for value in values], dtype=np.int64)
+            else:
+                dictionary: dict[object, int] = self.dictionaries[index]
+                array = np.fromiter((-1 if value is None else dictionary.setdefault(value, len(dictionary)) for value in values),
+                                    dtype=np.int32, count=len(values))
+            self.files[index].write(array.tobytes())
+        self.count += len(rows)
+    def close(self) -> None:
+        with zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for column, file, dictionary, kind in zip(self.columns, self.files, self.dictionaries, self.kinds):
+                dtype: np.dtype = np.dtype(np.int64 if kind == "int" else np.int32)
+                # the .npy header is written for the final length, then the spooled values are copied in after it
+                with archive.open(f"{column}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                                  "fortran_order": False, "shape": (self.count,)})
+                    file.seek(0)
+                    shutil.copyfileobj(file, member, 1024*1024)
+                file.close()
+                if kind != "int":
+                    with archive.open(f"{column}_dictionary.npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array(member, np.array([str(value) for value in dictionary], dtype=str))
+
+def read_npz_column(path: str, column: str) -> np.ndarray:
+    """
+    Reads a column of an exported .npz archive, decoding a dictionary-encoded column into its strings, with NULL as "".
+
+    Args:
+        path (str): The archive.
+        column (str): The name of the column.
+
+    Returns:
+        np.ndarray: The values of the column.
+    """
+    with np.load(path) as archive:
+        values: np.ndarray = archive[column]
+        if f"{column}_dictionary" not in archive:
+            return values
+        dictionary: np.ndarray = np.append(archive[f"{column}_dictionary"], "")
+        return dictionary[values]
+
+def stop_tracking(db: Database) -> None:
+    """
+    Drops the triggers recording changes for incremental exports, the changes recorded and the state of earlier
+    exports, so that a large load does not record every row it inserts. The next incremental export of each view and
+    format is then a full one, and installs the triggers again.
+
+    Args:
+        db (Database): The database about to be loaded.
+    """
+    for table in PRIMARY_KEYS:
+        for event in ("insert", "update", "delete"):
+            db.cursor.execute(f"DROP TRIGGER IF EXISTS export_{table}_{event}")
+    db.cursor.execute("DROP TABLE IF EXISTS export_changes")
+    if db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='export_state'").fetchone()[0]:
+        db.cursor.execute("DELETE FROM export_state")
+    db.connection.commit()
+
+# the writer of each export format
+WRITERS: dict[str, type] = {"csv": CsvWriter, "jsonl": JsonlWriter, "npz": NpzWriter}
+
+class Exporter(object):
+    """
+    Exports the tables and denormalized views of a scraped database to CSV, JSON Lines or NumPy files, a chunk of rows
+    at a time, so memory stays constant however large the database is.
+    An incremental export writes only the rows that changed since the last export of the same view and format, with a
+    "deleted" column marking the keys whose rows are gone. The changes are recorded by triggers, which are installed by
+    the first incremental export, so that export is a full one, and so is the first incremental export of every view
+    and format that was last exported without them. A full load drops them with stop_tracking.
+    """
+    db: Database
+    directory: str
+    chunk_size: int
+
+    def __init__(self, db: Database, directory: str = "exports", chunk_size: int = 10000):
+        """
+        Initializes the exporter and creates the table keeping the state of each export.
+
+        Args:
+            db (Database): The database to export.
+            directory (str, optional): The directory to write the files to, created if missing. Defaults to "exports".
+            chunk_size (int, optional): The rows fetched and written at a time. Defaults to 10000.
+        """
+        self.db = db
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.db.cursor.execute("CREATE TABLE IF NOT EXISTS export_state (name TEXT, format TEXT, last_seq INTEGER, exported_at REAL, rows INTEGER, PRIMARY KEY(name, format))")
+        self.db.connection.commit()
+
+    def is_tracking(self) -> bool:
+        """
+        Returns whether changes are being recorded for incremental exports.
+        """
+        return self.db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='export_changes'").fetchone()[0] == 1
+
+    def track_changes(self) -> None:
+        """
+        Installs the triggers that record the key of every row inserted, updated or deleted in the scraped tables.
+        The state of earlier exports is dropped, as the changes made since them were not recorded.
+        """
+        self.db.cursor.execute("CREATE TABLE IF NOT EXISTS export_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT, key TEXT)")
+        for table, keys in PRIMARY_KEYS.items():
+            for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+                inserts: str = " ".join(f"INSERT INTO export_changes (table_name, key) VALUES "
+                                        f"('{table}', json_array({', '.join(f'{row}.{key}' for key in keys)}));" for row in rows)
+                self.db.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS export_{table}_{event.lower()} AFTER {event} ON {table} "
+                                       f"BEGIN {inserts} END")
+        self.db.cursor.execute("DELETE FROM export_state")
+        self.db.connection.commit()
+
+    def iter_chunks(self, query: str, params: tuple = ()) -> Iterator[tuple[list[str], list[tuple]]]:
+        """
+        Runs a query and yields its rows a chunk at a time.
+
+        Yields:
+            tuple[list[str], list[tuple]]: The column names and the next chunk of rows.
+        """
+        cursor = self.db.connection.execute(query, params)
+        columns: list[str] = [description[0] for description in cursor.description]
+        while rows := cursor.fetchmany(self.chunk_size):
+            yield columns, rows
+
+    def columns(self, query: str) -> list[str]:
+        """
+        Returns the column names of a query without running it.
+        """
+        return [description[0] for description in self.db.connection.execute(f"SELECT * FROM ({query}) LIMIT 0").description]
+
+    def export(self, name: str, format: str = "csv", incremental: bool = False) -> tuple[str, int]:
+        """
+        Exports a table or view.
+
+        Args:
+            name (str): The name of the table or view, one of EXPORTS.
+            format (str, optional): "csv", "jsonl" or "npz". Defaults to "csv".
+            incremental (bool, optional): Write only the rows changed since the last export of this view and format.
+                Falls back to a full export if there is none. Defaults to False.
+
+        Returns:
+            tuple[str, int]: The path of the file written and the amount of rows in it.
+        """
+        export: Export = EXPORTS[name]
+        if incremental and not self.is_tracking():
+            self.track_changes()
+        tracking: bool = self.is_tracking()
+        # there is only a state to follow the changes from if the last export ran while they were recorded
+        state: tuple = self.db.cursor.execute("SELECT last_seq FROM export_state WHERE name=? AND format=?", (name, format)).fetchone()
+        # the rows are read from one snapshot, so changes made during the export are left for the next one
+        self.db.cursor.execute("BEGIN")
+        try:
+            last_seq: int = self.db.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM export_changes").fetchone()[0] if tracking else 0
+            if incremental and state is not None:
+                path: str = os.path.join(self.directory, f"{name}.changes-{last_seq}.{format}")
+                rows: int = self.write(path, format, self.iter_changes(export, state[0], last_seq),
+                                       self.columns(export.query("0"))+["deleted"])
+            else:
+                path = os.path.join(self.directory, f"{name}.{format}")
+                rows = self.write(path, format, self.iter_chunks(export.query()), self.columns(export.query("0")))
+            self.db.connection.commit()
+        except BaseException:
+            self.db.connection.rollback()
+            raise
+        if tracking:
+            self.db.cursor.execute("INSERT OR REPLACE INTO export_state VALUES (?,?,?,?,?)", (name, format, last_seq, time.time(), rows))
+            # changes every export has already written are no longer needed
+            self.db.cursor.execute("DELETE FROM export_changes WHERE seq <= (SELECT MIN(last_seq) FROM export_state)")
+        self.db.connection.commit()
+        return path, rows
+
+    def iter_changes(self, export: Export, after_seq: int, until_seq: int) -> Iterator[tuple[list[str], list[tuple]]]:
+        """
+        Yields the current rows whose keys changed between two change sequence numbers, then the keys whose rows were
+        deleted, each with a "deleted" column.
+        """
+        key_columns: str = ", ".join(f"k{index}" for index in range(len(export.keys)))
+        self.db.cursor.execute("DROP TABLE IF EXISTS temp.export_keys")
+        self.db.cursor.execute(f"CREATE TEMP TABLE export_keys ({key_columns}, PRIMARY KEY({key_columns}))")
+        for table, positions in export.sources.items():
+            extracts: str = ", ".join(f"json_extract(key, '$[{position}]')" for position in positions)
+            self.db.cursor.execute(f"INSERT OR IGNORE INTO temp.export_keys SELECT {extracts} FROM export_changes "
+                                   "WHERE table_name=? AND seq>? AND seq<=?", (table, after_seq, until_seq))
+        keys: str = ", ".join(f"t.{key}" for key in export.keys)
+        columns: list[str] = None
+        for columns, rows in self.iter_chunks(export.query(f"({keys}) IN (SELECT {key_columns} FROM temp.export_keys)")):
+            yield columns+["deleted"], [row+(0,) for row in rows]
+        if columns is None:
+            columns = self.columns(export.query("0"))
+        # a deleted row is written as its key, with the other columns empty
+        key_positions: list[int] = [columns.index(key) for key in export.keys]
+        matches: str = " AND ".join(f"t.{key}=k.k{index}" for index, key in enumerate(export.keys))
+        for _, keys_rows in self.iter_chunks(f"SELECT {key_columns} FROM temp.export_keys k "
+                                             f"WHERE NOT EXISTS (SELECT 1 FROM {export.table} t WHERE {matches})"):
+            rows: list[tuple] = []
+            for key_row in keys_rows:
+                row: list = [None]*len(columns)
+                for position, value in zip(key_positions, key_row):
+                    row[position] = value
+                rows.append(tuple(row)+(1,))
+            yield columns+["deleted"], rows
+
+    def write(self, path: str, format: str, chunks: Iterator[tuple[list[str], list[tuple]]], columns: list[str]) -> int:
+        """
+        Writes chunks of rows to a file in the given format, with the given columns if there are no rows.
+
+        Returns:
+            int: The amount of rows written.
+        """
+        writer = None
+        rows: int = 0
+        try:
+            for columns, chunk in chunks:
+                if writer is None:
+                    writer = WRITERS[format](path, columns)
+                writer.write(chunk)
+                rows += len(chunk)
+            if writer is None:
+                # no rows, but the file is still written with its columns
+                writer = WRITERS[format](path, columns)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command line arguments.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Exports the scraped database to CSV, JSON Lines or NumPy files.")
+    parser.add_argument("--database", default="storage.db", help="The sqlite3 database to export. Defaults to storage.db.")
+    parser.add_argument("--output-dir", default="exports", help="The directory to write the files to. Defaults to exports.")
+    parser.add_argument("--format", choices=list(WRITERS), default="csv", help="The file format. Defaults to csv.")
+    parser.add_argument("--exports", nargs="+", choices=list(EXPORTS), default=list(EXPORTS),
+                        help="The tables and views to export. Defaults to all of them.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Write only the rows changed since the last export of each table or view in this format.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="The rows fetched and written at a time. Defaults to 10000.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments: argparse.Namespace = parse_arguments()
+    exporter: Exporter = Exporter(Database(arguments.database), arguments.output_dir, arguments.chunk_size)
+    for name in arguments.exports:
+        start: float = time.perf_counter()
+        path, rows = exporter.export(name, arguments.format, arguments.incremental)
+        print(f"{path}: {rows} rows in {time.perf_counter()-start:.2f} s")
@@ -0,0 +1,238 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+
+# the regions of Italy as (title, region code), in the order they appear on the ENCI area map
+REGIONS: list[tuple[str, str]] = [
+    ("Piemonte", "PIE"), ("Valle d'Aosta", "VDA"), ("Lombardia", "LOM"), ("Trentino-Alto Adige", "TAA"),
+    ("Veneto", "VEN"), ("Friuli-Venezia Giulia", "FVG"), ("Liguria", "LIG"), ("Emilia-Romagna", "EMR"),
+    ("Toscana", "TOS"), ("Umbria", "UMB"), ("Marche", "MAR"), ("Lazio", "LAZ"), ("Abruzzo", "ABR"),
+    ("Molise", "MOL"), ("Campania", "CAM"), ("Puglia", "PUG"), ("Basilicata", "BAS"), ("Calabria", "CAL"),
+    ("Sicilia", "SIC"), ("Sardegna", "SAR"),
+]
+# the amount of distinct breeds the synthetic breeders are drawn from
+BREED_COUNT: int = 350
+
+class FakeEnciServer(object):
+    """
+    A local stand-in for the ENCI website serving deterministic synthetic breeders.
+    """
+    regions: list[tuple[str, str]]
+    breeders_per_region: int
+    members_per_breeder: int
+    breeds_per_breeder: int
+    latency: float
+    error_rate: float
+    throttle_rate: float
+    retry_after: float
+    server: ThreadingHTTPServer
+    thread: threading.Thread
+
+    def __init__(self, regions: int = 20, breeders_per_region: int = 100, members_per_breeder: int = 2,
+                 breeds_per_breeder: int = 2, latency: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 0.1, seed: int = 0):
+        """
+        Initializes the synthetic data set the server answers with.
+
+        Args:
+            regions (int, optional): The amount of regions on the area map. Defaults to 20.
+            breeders_per_region (int, optional): The amount of breeders listed per region. Defaults to 100.
+            members_per_breeder (int, optional): The amount of members per breeder. Defaults to 2.
+            breeds_per_breeder (int, optional): The amount of breeds per breeder. Defaults to 2.
+            latency (float, optional): The seconds every response is delayed by. Defaults to 0.0.
+            error_rate (float, optional): The fraction of TakeAllevatore requests answered with a 503. Defaults to 0.0.
+            throttle_rate (float, optional): The fraction of TakeAllevatore requests answered with a 429. Defaults to 0.0.
+            retry_after (float, optional): The seconds of the Retry-After header sent with a 429. Defaults to 0.1.
+            seed (int, optional): The seed of the random faults, so that runs are repeatable. Defaults to 0.
+        """
+        self.regions = REGIONS[:regions]
+        self.breeders_per_region = breeders_per_region
+        self.members_per_breeder = members_per_breeder
+        self.breeds_per_breeder = breeds_per_breeder
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random: random.Random = random.Random(seed)
+        self.random_lock: threading.Lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def breeder_count(self) -> int:
+        """
+        Returns the total amount of breeders the server lists.
+        """
+        return len(self.regions)*self.breeders_per_region
+
+    def breed_codes(self, breeder_id: int) -> list[str]:
+        """
+        Returns the codes of the breeds a breeder raises.
+        """
+        return [f"{(breeder_id*7+offset*13) % BREED_COUNT:03d}" for offset in range(self.breeds_per_breeder)]
+
+    def fault(self) -> int:
+        """
+        Draws whether a request fails.
+
+        Returns:
+            int: The status code to fail the request with, or None to answer it.
+        """
+        if not self.error_rate and not self.throttle_rate:
+            return None
+        with self.random_lock:
+            draw: float = self.random.random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate+self.error_rate:
+            return 503
+        return None
+
+    def area_map(self) -> str:
+        """
+        Returns the allevatori-con-affisso page containing the ENCI_italia_Map area map.
+        """
+        area_tags: str = "".join(f'<area shape="poly" title="{title}" data-regione="{region}" href="#">'
+                                 for title, region in self.regions)
+        return f'<html><body><map name="ENCI_italia_Map">{area_tags}</map></body></html>'
+
+    def breeders(self, region: str) -> list[dict]:
+        """
+        Returns the GetAllevatori listing of a region.
+        """
+        codes: list[str] = [code for _, code in self.regions]
+        if region not in codes:
+            return []
+        first_id: int = codes.index(region)*self.breeders_per_region + 1
+        return [{"IdAffisso": str(breeder_id),
+                 "DesAffisso": f"Allevamento {breeder_id}",
+                 "Proprietario": f"Proprietario {breeder_id}",
+                 "Razze": self.breed_codes(breeder_id)}
+                for breeder_id in range(first_id, first_id+self.breeders_per_region)]
+
+    def breeder_details(self, breeder_id: int) -> dict:
+        """
+        Returns the TakeAllevatore document of a breeder. Consecutive breeders share a member.
+        """
+        members: list[dict] = [{"DesAssociato": f"Socio {member_id}",
+                                "IdAnagrafica": str(member_id),
+                                "FlagFirmatario": "S" if offset == 0 else "N",
+                                "DesIndirizzoSocio": f"Via Roma {member_id}",
+                                "DesLocalitaSocio": f"Comune {member_id % 500}"}
+                               for offset, member_id in enumerate(breeder_id*self.members_per_breeder//2 + offset
+                                                                  for offset in range(self.members_per_breeder))]
+        breeds: list[dict] = [{"CodRazza": code,
+                               "IdUmb": str(1000+int(code)),
+                               "UltimaCucciolata": f"{2000+int(code) % 24}-01-01T00:00:00",
+                               "DesRazza": f"Razza {code}",
+                               "CodGruppo": str(int(code) % 10 + 1),
+                               "DesGruppo": f"Gruppo {int(code) % 10 + 1}"}
+                              for code in self.breed_codes(breeder_id)]
+        return {"Soci": members, "Razze": breeds}
+
+    def start(self) -> str:
+        """
+        Starts serving on a free local port in a background thread.
+
+        Returns:
+            str: The base url to point the scraper at.
+        """
+        fake: FakeEnciServer = self
+        class Handler(FakeEnciHandler):
+            server_data = fake
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 1024
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        """
+        Returns the base url of the running server.
+        """
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+class FakeEnciHandler(BaseHTTPRequestHandler):
+    """
+    Answers the ENCI endpoints the scraper uses from a FakeEnciServer's data set.
+    """
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, which would otherwise stall keep-alive connections on delayed ACKs
+    disable_nagle_algorithm = True
+    server_data: FakeEnciServer
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/allevatori/allevatori-con-affisso":
+            # the map is served with an ETag, as the ENCI website's pages are, so a copy can be revalidated with a 304
+            page: bytes = self.server_data.area_map().encode("utf-8")
+            etag: str = f'"{hashlib.sha1(page).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.respond(304, b"", "text/html; charset=utf-8", {"ETag": etag})
+            else:
+                self.respond(200, page, "text/html; charset=utf-8", {"ETag": etag})
+        elif url.path == "/umbraco/enci/AllevatoriApi/TakeAllevatore":
+            # only the detail requests are retried by the scraper, so faults are injected there
+            status: int = self.server_data.fault()
+            if status:
+                self.respond(status, b"Too Many Requests" if status == 429 else b"Service Unavailable", "text/plain")
+                return
+            breeder_id: int = int(parse_qs(url.query)["idAffisso"][0])
+            self.respond_json(self.server_data.breeder_details(breeder_id))
+        else:
+            self.respond(404, b"Not Found", "text/plain")
+
+    def do_POST(self) -> None:
+        body: bytes = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path == "/umbraco/enci/AllevatoriApi/GetAllevatori":
+            regions: list[str] = json.loads(body)["regioniAttive"]
+            self.respond_json([breeder for region in regions for breeder in self.server_data.breeders(region)])
+        else:
+            self.respond(404, b"Not Found", "text/plain")
+
+    def respond_json(self, data: object) -> None:
+        self.respond(200, json.dumps(data).encode("utf-8"), "application/json; charset=utf-8")
+
+    def respond(self, status: int, body: bytes, content_type: str, headers: dict[str, str] = None) -> None:
+        if self.server_data.latency:
+            time.sleep(self.server_data.latency)
+        # compress larger bodies when the client negotiates it, as the ENCI website does
+        compressed: bool = "gzip" in self.headers.get("Accept-Encoding", "") and len(body) > 1024
+        if compressed:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if status == 429:
+            self.send_header("Retry-After", f"{self.server_data.retry_after:g}")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # keep the benchmark output readable
+        pass
@@ -0,0 +1,90 @@
+import sqlite3
+import json
+import time
+from models import *
+
+class Journal:
+    """
+    A checkpoint journal of the areas and breeders whose requests have completed, so that an interrupted
+    scrape can be resumed. Each result is committed as soon as it is recorded.
+    """
+    connection: sqlite3.Connection
+    cursor = sqlite3.Cursor
+
+    def __init__(self, path: str = "storage.db"):
+        """
+        Opens the journal and creates its tables.
+
+        Args:
+            path (str, optional): The sqlite3 database to keep the journal in. Defaults to "storage.db".
+        """
+        self.connection = sqlite3.connect(path)
+        self.cursor = self.connection.cursor()
+        # a crash can lose at most the last few commits, rather than each commit waiting on an fsync
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS journal_areas (region TEXT PRIMARY KEY, payload TEXT, completed_at REAL)")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS journal_breeders (id TEXT PRIMARY KEY, payload TEXT, completed_at REAL)")
+        self.connection.commit()
+
+    def clear(self) -> None:
+        """
+        Removes every recorded result, so that the next scrape starts from scratch.
+        """
+        self.cursor.execute("DELETE FROM journal_areas")
+        self.cursor.execute("DELETE FROM journal_breeders")
+        self.connection.commit()
+
+    def record_area(self, area: Area, breeders: list[Breeder]) -> None:
+        """
+        Records the breeders listed in an area.
+
+        Args:
+            area (Area): The area that was scraped.
+            breeders (list[Breeder]): The breeders listed in the area.
+        """
+        payload: str = json.dumps([breeder.to_dict() for breeder in breeders])
+        self.cursor.execute("INSERT OR REPLACE INTO journal_areas VALUES (?,?,?)", (area.region, payload, time.time()))
+        self.connection.commit()
+
+    def record_breeder(self, breeder: Breeder, breed_members: BreedMembers) -> None:
+        """
+        Records the members and breeds of a breeder.
+
+        Args:
+            breeder (Breeder): The breeder whose details were scraped.
+            breed_members (BreedMembers): The members and breeds of the breeder.
+        """
+        payload: str = json.dumps(breed_members.to_dict())
+        self.cursor.execute("INSERT OR REPLACE INTO journal_breeders VALUES (?,?,?)", (breeder.id, payload, time.time()))
+        self.connection.commit()
+
+    def completed_areas(self) -> dict[str, list[Breeder]]:
+        """
+        Returns the breeders of every recorded area.
+
+        Returns:
+            dict[str, list[Breeder]]: The breeders listed in each area, keyed by area region.
+        """
+        return {region: [Breeder.from_dict(breeder) for breeder in json.loads(payload)]
+                for region, payload in self.cursor.execute("SELECT region, payload FROM journal_areas")}
+
+    def completed_breeders(self) -> dict[str, BreedMembers]:
+        """
+        Returns the members and breeds of every recorded breeder.
+
+        Returns:
+            dict[str, BreedMembers]: The members and breeds of each breeder, keyed by breeder id.
+        """
+        return {breeder_id: BreedMembers.from_dict(json.loads(payload))
+                for breeder_id, payload in self.cursor.execute("SELECT id, payload FROM journal_breeders")}
+
+    def completed_keys(self) -> tuple[list[str], list[str]]:
+        """
+        Returns the keys of the recorded results, without decoding their payloads.
+
+        Returns:
+            tuple[list[str], list[str]]: The regions of the recorded areas and the ids of the recorded breeders.
+        """
+        return ([region for region, in self.cursor.execute("SELECT region FROM journal_areas")],
+                [breeder_id for breeder_id, in self.cursor.execute("SELECT id FROM journal_breeders")])
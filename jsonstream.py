@@ -0,0 +1,117 @@
+from typing import Iterator
+import codecs
+import json
+import re
+
+# faster decoders, used when they are installed. ijson parses incrementally, and orjson decodes whole documents
+# straight from bytes several times faster than the json module
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the whitespace before a document and around the elements of an array
+WHITESPACE: re.Pattern = re.compile(r"[ \t\n\r]*")
+WHITESPACE_BYTES: re.Pattern = re.compile(rb"[ \t\n\r]*")
+# the characters that may still continue a number
+NUMBER_TAIL: re.Pattern = re.compile(r"[0-9.eE+-]*")
+# the bytes of the response body decoded at a time when parsing incrementally
+CHUNK_SIZE: int = 64*1024
+
+def loads(data: bytes | str) -> object:
+    """
+    Decodes a whole JSON document, with orjson if it is installed. Bytes are decoded directly, without first being
+    copied into a str.
+
+    Args:
+        data (bytes | str): The document, e.g. response.content.
+
+    Returns:
+        object: The decoded document.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def iter_array(data: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[object]:
+    """
+    Decodes the elements of a JSON array one at a time, so that only one element is ever held decoded, rather than
+    the whole document as a str and a list of dicts. Uses ijson if it is installed, otherwise decodes the body a chunk
+    at a time and pulls each complete element out of the chunk with the json module's raw_decode.
+
+    Args:
+        data (bytes): The UTF-8 encoded array, e.g. response.content.
+        chunk_size (int, optional): The bytes decoded at a time. Defaults to CHUNK_SIZE.
+
+    Yields:
+        object: Each element of the array, in order.
+
+    Raises:
+        json.JSONDecodeError: If the document is not an array or is malformed.
+    """
+    if ijson is not None:
+        # ijson yields nothing for a document that is not an array, so check that it opens one first
+        position: int = WHITESPACE_BYTES.match(data).end()
+        if data[position:position+1] != b"[":
+            raise json.JSONDecodeError("Expecting '['", data[:position+1].decode("utf-8", "replace"), position)
+        try:
+            yield from ijson.items(data, "item", use_float=True)
+        except ijson.JSONError as error:
+            raise json.JSONDecodeError(str(error), "", 0) from error
+        return
+    decoder: json.JSONDecoder = json.JSONDecoder()
+    text_decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder("utf-8")()
+    buffer: str = ""
+    position: int = 0
+    opened: bool = False
+    # what may come next in the array: "first" an element or "]", "element" an element after a comma, and
+    # "separator" a comma or "]" after an element
+    expecting: str = "first"
+    for start in range(0, max(len(data), 1), chunk_size):
+        final: bool = start+chunk_size >= len(data)
+        # keep only the undecoded tail of the previous chunk
+        buffer = buffer[position:]+text_decoder.decode(data[start:start+chunk_size], final)
+        position = 0
+        if not opened:
+            position = WHITESPACE.match(buffer).end()
+            if position == len(buffer) and not final:
+                continue
+            if buffer[position:position+1] != "[":
+                raise json.JSONDecodeError("Expecting '['", buffer, position)
+            opened = True
+            position += 1
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if expecting == "separator":
+                if buffer[position] == "]":
+                    return
+                if buffer[position] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+                expecting = "element"
+                position += 1
+                continue
+            if expecting == "first" and buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # the element continues in the next chunk
+                if final:
+                    raise
+                break
+            # a number at the end of the buffer may continue in the next chunk too, even after a "." or an "e"
+            # that raw_decode stopped short of
+            if (not final and isinstance(element, (int, float)) and not isinstance(element, bool)
+                    and NUMBER_TAIL.match(buffer, end).end() == len(buffer)):
+                break
+            position = end
+            expecting = "separator"
+            yield element
+        if final:
+            raise json.JSONDecodeError("Expecting ']'", buffer, position)
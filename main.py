@@ -1,13 +1,27 @@
-from multiprocessing import Pool, Manager
-import os
-import numpy as np
+from typing import Iterator
+import argparse
+import time
 from models import *
 from database import Database
+from journal import Journal
+from writer import StreamWriter
 from scraper import *
+from engine import PoolBackend, ThreadBackend, BACKENDS, DEFAULT_CONCURRENCY, ADAPTIVE_CONCURRENCY, Scheduler, create_backend, run_task
+from ratelimit import RateLimiter, create_limiters
+from cache import ResponseCache
+from metrics import Metrics
+from adaptive import ConcurrencyController
+from sync import SyncState, Changes
+from registry import EntityRegistry
+from workqueue import WorkQueue, Task
+from staging import StagingArea, stage_area, stage_breeder_details
+from catalog import RegionCatalog
+from retry import RetryPolicy, Failure, DeadLetters, classify, create_policies, configure_dead_letters, dead_letter
+import retry
+from multiprocessing import Process
 
 def database_integration(areas: list[Area], breeders: list[Breeder], 
-                         members: list[Member], breeds: list[Breed], 
-                         manager: Manager) -> None:
+                         members: list[Member], breeds: list[Breed], path: str = "storage.db") -> None:
     """
     Migrates the data collected from scraping into a database. Wraps the add_to_database function to track progress.
 
@@ -16,24 +30,34 @@ def database_integration(areas: list[Area], breeders: list[Breeder],
         breeders (list[Breeder]): The breeders scraped from the ENCI website.
         members (list[Member]): The members scraped from the ENCI website.
         breeds (list[Breed]): The breeds scraped from the ENCI website.
-        manager (Manager): The multiprocessing manager used to share the counter accross processes.
+        path (str, optional): The sqlite3 database file to write to. Defaults to "storage.db".
     """
     # instantiates a database object
-    db: Database = Database()
+    db: Database = Database(path)
     # calculates the total amount of database entries to be added to the database
     total_database_entries: int = len(areas)+len(breeders)+len(members)+len(breeds)+len(breeders)+len(
         [breed for breeder in breeders for breed in breeder.breeds]
         )+len([member for member in members for breeder_id in member.breeder_ids])
+    # numpy is only imported once the summary tables are computed, so that runs which never get here start faster
+    from aggregates import Aggregates
+    from exporter import stop_tracking
+    # the secondary indexes and summary tables are rebuilt once everything is loaded rather than kept up to date row by row,
+    # and the load is not recorded as changes for incremental exports
+    db.drop_indexes()
+    aggregates: Aggregates = Aggregates(db)
+    aggregates.drop_triggers()
+    stop_tracking(db)
     # instantiates a Progress object to track progress
-    progress: Progress = Progress(start_time=time.time(), 
-                                  total_amount=total_database_entries, 
-                                  manager=manager)
-    # adds all data to the database
-    add_to_database(db, areas, breeders, members, breeds, progress)
+    with Progress(start_time=time.time(), total_amount=total_database_entries) as progress:
+        # adds all data to the database
+        add_to_database(db, areas, breeders, members, breeds, progress)
+    db.create_indexes()
+    aggregates.compute()
     
-def add_to_database(db: Database, areas: list[Area], breeders: list[Breeder], members: list[Member], breeds: list[Breed], progress: Progress):
+def add_to_database(db: Database, areas: list[Area], breeders: list[Breeder], members: list[Member], breeds: list[Breed], 
+                    progress: Progress, chunk_size: int = 10000):
     """
-    Adds all data to the database.
+    Adds all data to the database in a single bulk load.
 
     Args:
         db (Database): The database object.
@@ -42,83 +66,247 @@ def add_to_database(db: Database, areas: list[Area], breeders: list[Breeder], me
         members (list[Member]): List of members to add to the database.
         breeds (list[Breed]): List of breeds to add to the database.
         progress (Progress): The progress tracker object.
+        chunk_size (int, optional): The amount of rows inserted per executemany call. Defaults to 10000.
     """
+    db.bulk_load({
+        "areas": ((area.title, area.region) for area in areas),
+        "breeders": ((breeder.title, breeder.owner, breeder.id) for breeder in breeders),
+        "breeds": ((breed.code, breed.id, breed.last_litter, breed.description, breed.group_code, breed.group_description) 
+                   for breed in breeds),
+        "members": ((member.description, member.id, member.signatory, member.address, member.town) for member in members),
+        "areas_breeders": ((breeder.area_region, breeder.id) for breeder in breeders),
+        "breeders_breeds": ((breeder.id, breed_code) for breeder in breeders for breed_code in breeder.breeds),
+        "breeders_members": ((breeder_id, member.id) for member in members for breeder_id in member.breeder_ids),
+    }, chunk_size=chunk_size, progress=progress)
+
+def dead_letter_area(area: Area, failure: Failure) -> None:
+    """
+    Records an area whose listing could not be retrieved, so that a later run can retry it with --retry-dead.
+    """
+    dead_letter("listing", area.region, {"title": area.title, "region": area.region}, failure)
+
+def dead_letter_breeder(breeder: Breeder, failure: Failure) -> None:
+    """
+    Records a breeder whose details could not be retrieved, so that a later run can retry it with --retry-dead.
+    """
+    dead_letter("details", breeder.id, breeder.to_dict(), failure)
+
+def resolve_dead_letters(dead_letters: DeadLetters, regions: list[str], breeder_ids: list[str]) -> None:
+    """
+    Removes the dead letters of the areas and breeders whose results have been committed to the database, so that
+    they are neither reported as failed nor requested again by --retry-dead.
+    """
+    if dead_letters is not None:
+        dead_letters.resolve("listing", regions)
+        dead_letters.resolve("details", breeder_ids)
+
+def iter_breeders(areas: list[Area], backend: PoolBackend | ThreadBackend, 
+                  journal: Journal = None) -> Iterator[tuple[Area, list[Breeder]]]:
+    """
+    Retrieves the breeders of each area from the ENCI website using the given fetch backend, yielding each area as soon as it completes. 
+    Progress is counted here as each result arrives, so the workers do no progress tracking.
+    Areas already recorded in the journal are yielded first without being requested again, and each newly scraped area is recorded.
+    Areas whose listing could not be retrieved are dead-lettered and not yielded.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+
+    Yields:
+        tuple[Area, list[Breeder]]: An area and the Breeder objects listed in it, in order of completion.
+    """
+    # start from the breeders of the areas that have already been scraped
+    completed_areas: dict[str, list[Breeder]] = journal.completed_areas() if journal else {}
     for area in areas:
-        db.query_no_response(query="INSERT OR IGNORE INTO areas VALUES (?,?)", 
-                             params=(area.title, area.region), progress=progress)
-    for breeder in breeders:
-        db.query_no_response(query="INSERT OR IGNORE INTO breeders VALUES (?,?,?)", 
-                             params=(breeder.title, breeder.owner, breeder.id), progress=progress)
-    for breed in breeds:
-        db.query_no_response(query="INSERT OR IGNORE INTO breeds VALUES (?,?,?,?,?,?)", 
-                             params=(breed.code, breed.id, breed.last_litter, breed.description, 
-                                     breed.group_code, breed.group_description), 
-                             progress=progress)
-    for member in members:
-        db.query_no_response(query="INSERT OR IGNORE INTO members VALUES (?,?,?,?,?)", 
-                             params=(member.description, member.id, member.signatory, member.address, member.town), 
-                             progress=progress)
-    for breeder in breeders:
-        db.query_no_response(query="INSERT OR IGNORE INTO areas_breeders VALUES (?,?)", 
-                             params=(breeder.area_region, breeder.id), progress=progress)
-        for breed_code in breeder.breeds:
-            db.query_no_response(query="INSERT OR IGNORE INTO breeders_breeds VALUES (?,?)", 
-                                 params=(breeder.id, breed_code), progress=progress)
-    for member in members:
-        for breeder_id in member.breeder_ids:
-            db.query_no_response(query="INSERT OR IGNORE INTO breeders_members VALUES (?,?)", 
-                                 params=(breeder_id, member.id), progress=progress)
-    db.commit_to_database()
-
-def pooled_breeder_retrieval(areas: list[Area], manager: Manager) -> list[Breeder]:
-    """
-    Retrieves all breeders from the ENCI website using multiprocessing. 
-    Wraps the scrape_area function to allow for tracking progress accross processes.
+        if area.region in completed_areas:
+            yield area, completed_areas[area.region]
+    remaining_areas: list[Area] = [area for area in areas if area.region not in completed_areas]
+    # instantiates a Progress object to track progress
+    with Progress(start_time=time.time(), total_amount=len(remaining_areas)) as progress:
+        # scrape each remaining area using the backend, recording each area as soon as it completes
+        for index, area_breeders in backend.as_completed(scrape_area, [(area,) for area in remaining_areas]):
+            progress.increment_amount_completed()
+            if isinstance(area_breeders, Failure):
+                dead_letter_area(remaining_areas[index], area_breeders)
+                continue
+            if journal:
+                journal.record_area(remaining_areas[index], area_breeders)
+            yield remaining_areas[index], area_breeders
+
+def pooled_breeder_retrieval(areas: list[Area], backend: PoolBackend | ThreadBackend, 
+                             journal: Journal = None) -> list[Breeder]:
+    """
+    Retrieves all breeders from the ENCI website using the given fetch backend. 
+    Collects the results of iter_breeders.
 
     Args:
         areas (list[Area]): The areas of Italy scraped from the ENCI website.
-        manager (Manager): The multiprocessing manager used to share the counter accross processes.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
 
     Returns:
         list[Breeder]: A list of Breeder objects scraped from the ENCI website.
     """
-    # instantiates a Pool object to allow for multiprocessing using all available cores
-    pool: Pool = Pool(os.cpu_count())
+    return [breeder for _, area_breeders in iter_breeders(areas, backend, journal) for breeder in area_breeders]
+
+def iter_breed_members(breeders: list[Breeder], backend: PoolBackend | ThreadBackend, 
+                       journal: Journal = None) -> Iterator[tuple[Breeder, BreedMembers]]:
+    """
+    Retrieves each breeder's members and breeds from the ENCI website using the given fetch backend, 
+    yielding each breeder as soon as it completes. 
+    Progress is counted here as each result arrives, so the workers do no progress tracking.
+    Breeders already recorded in the journal are yielded first without being requested again, and each newly scraped breeder is recorded.
+    Breeders whose details could not be retrieved are dead-lettered and not yielded.
+
+    Args:
+        breeders (list[Breeder]): The breeders scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+
+    Yields:
+        tuple[Breeder, BreedMembers]: A breeder and its members and breeds, in order of completion.
+    """
+    # a breeder listed in several areas only needs its details requesting once
+    unique_breeders: dict[str, Breeder] = {breeder.id: breeder for breeder in breeders}
+    # start from the details of the breeders that have already been scraped
+    completed_breeders: dict[str, BreedMembers] = journal.completed_breeders() if journal else {}
+    for breeder_id, breed_members in completed_breeders.items():
+        if breeder_id in unique_breeders:
+            yield unique_breeders[breeder_id], breed_members
+    remaining_breeders: list[Breeder] = [breeder for breeder in unique_breeders.values() 
+                                         if breeder.id not in completed_breeders]
     # instantiates a Progress object to track progress
-    progress: Progress = Progress(start_time=time.time(), 
-                                  total_amount=len(areas), 
-                                  manager=manager)
-    # use starmap to scrape each area in the list of areas using multiprocessing
-    breeders: list[Breeder] = pool.starmap(scrape_area, [(area,progress,) for area in areas])
-    # flatten the list of lists of breeders into a single list of breeders
-    breeders: list[Breeder] = [breeder for breeder_list in breeders for breeder in breeder_list]
-    return breeders
+    with Progress(start_time=time.time(), total_amount=len(remaining_breeders)) as progress:
+        # scrape each remaining breeder using the backend, recording each breeder as soon as it completes
+        for index, breed_members in backend.as_completed(request_breeder_details, 
+                                                         [(breeder,) for breeder in remaining_breeders]):
+            progress.increment_amount_completed()
+            if isinstance(breed_members, Failure):
+                dead_letter_breeder(remaining_breeders[index], breed_members)
+                continue
+            if journal:
+                journal.record_breeder(remaining_breeders[index], breed_members)
+            yield remaining_breeders[index], breed_members
     
-def pooled_breed_members_retrieval(breeders: list[Breeder], manager: Manager) -> list[BreedMembers]:
+def pooled_breed_members_retrieval(breeders: list[Breeder], backend: PoolBackend | ThreadBackend, 
+                                   journal: Journal = None) -> list[BreedMembers]:
     """
-    Retrieves all breeders' members and breeds from the ENCI website using multiprocessing. 
-    Wraps the request_breeder_details function to allow for tracking progress accross processes.
+    Retrieves all breeders' members and breeds from the ENCI website using the given fetch backend. 
+    Collects the results of iter_breed_members.
 
     Args:
         breeders (list[Breeder]): The breeders scraped from the ENCI website.
-        manager (Manager): The multiprocessing manager used to share the counter accross processes.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
 
     Returns:
         list[BreedMembers]: A list of BreedMembers objects scraped from the ENCI website.
     """
-    # calculate the total amount of breeders to be scraped
-    total_breeder_count = len(breeders)
-    paused_process_count = Counter(manager,0)
-    pool: Pool = Pool(os.cpu_count())
-    # instantiates a Progress object to track progress
-    progress: Progress = Progress(start_time=time.time(), total_amount=total_breeder_count, manager=manager)
-    # use starmap to scrape each breeder in the list of breeders using multiprocessing
-    pooled_breed_members: list[BreedMembers] = pool.starmap(request_breeder_details, 
-                                                            [(breeder, 
-                                                              paused_process_count,np.random.uniform(0.03,0.43), progress) 
-                                                             for breeder in breeders])
-    return pooled_breed_members
+    return [breed_members for _, breed_members in iter_breed_members(breeders, backend, journal)]
     
+def iter_pipelined(areas: list[Area], backend: PoolBackend | ThreadBackend, journal: Journal = None, 
+                   region_sizes: dict[str, int] = None) -> Iterator[tuple[str, object, object]]:
+    """
+    Retrieves the breeders of each area and their members and breeds as one pipeline: the details of an area's breeders
+    are scheduled the moment its listing arrives, rather than after every area has been listed.
+    Areas are listed before any details are fetched, largest first, so that the longest lists of details start earliest.
+    Areas and breeders already recorded in the journal are yielded without being requested again.
+    Areas and breeders that could not be retrieved are dead-lettered and not yielded.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+        region_sizes (dict[str, int], optional): The breeder count of each area in a previous run. Defaults to None.
+
+    Yields:
+        tuple[str, object, object]: ("area", Area, list[Breeder]) or ("breeder", Breeder, BreedMembers), in order of completion.
+    """
+    completed_areas: dict[str, list[Breeder]] = journal.completed_areas() if journal else {}
+    completed_breeders: dict[str, BreedMembers] = journal.completed_breeders() if journal else {}
+    region_sizes = region_sizes or {}
+    scheduler: Scheduler = Scheduler(window=backend.concurrency*2)
+    # the total grows as each listing reveals more breeders
+    progress: Progress = Progress(start_time=time.time(), total_amount=0)
+    scheduled_breeder_ids: set[str] = set()
+    def schedule_breeders(area_breeders: list[Breeder]) -> list[tuple[Breeder, BreedMembers]]:
+        # a breeder listed in several areas only needs its details requesting once
+        journaled: list[tuple[Breeder, BreedMembers]] = []
+        for breeder in area_breeders:
+            if breeder.id in scheduled_breeder_ids:
+                continue
+            scheduled_breeder_ids.add(breeder.id)
+            if breeder.id in completed_breeders:
+                journaled.append((breeder, completed_breeders[breeder.id]))
+            else:
+                progress.total_amount += 1
+                scheduler.submit(1, ("breeder", breeder), request_breeder_details, (breeder,))
+        return journaled
+    pending_areas: int = 0
+    for area in sorted(areas, key=lambda area: -region_sizes.get(area.region, 0)):
+        if area.region in completed_areas:
+            yield "area", area, completed_areas[area.region]
+            for breeder, breed_members in schedule_breeders(completed_areas[area.region]):
+                yield "breeder", breeder, breed_members
+        else:
+            pending_areas += 1
+            progress.total_amount += 1
+            scheduler.submit(0, ("area", area), scrape_area, (area,))
+    if pending_areas == 0:
+        scheduler.close()
+    progress.start()
+    try:
+        for index, result in backend.as_completed(run_task, scheduler.tasks()):
+            kind, item = scheduler.complete(index)
+            progress.increment_amount_completed()
+            if kind == "area":
+                if isinstance(result, Failure):
+                    dead_letter_area(item, result)
+                else:
+                    if journal:
+                        journal.record_area(item, result)
+                    yield "area", item, result
+                    for breeder, breed_members in schedule_breeders(result):
+                        yield "breeder", breeder, breed_members
+                pending_areas -= 1
+                # every listing is in, so the last detail tasks have been submitted
+                if pending_areas == 0:
+                    scheduler.close()
+            elif isinstance(result, Failure):
+                dead_letter_breeder(item, result)
+            else:
+                if journal:
+                    journal.record_breeder(item, result)
+                yield "breeder", item, result
+    finally:
+        # unblock the backend if the run is interrupted
+        scheduler.abort()
+        progress.stop()
+
+def pipelined_retrieval(areas: list[Area], backend: PoolBackend | ThreadBackend, journal: Journal = None, 
+                        region_sizes: dict[str, int] = None) -> tuple[list[Breeder], list[BreedMembers]]:
+    """
+    Retrieves all breeders and their members and breeds as one pipeline. Collects the results of iter_pipelined.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+        region_sizes (dict[str, int], optional): The breeder count of each area in a previous run. Defaults to None.
+
+    Returns:
+        tuple[list[Breeder], list[BreedMembers]]: The breeders and the BreedMembers of each breeder.
+    """
+    breeders: list[Breeder] = []
+    breed_members: list[BreedMembers] = []
+    for kind, _, result in iter_pipelined(areas, backend, journal, region_sizes):
+        if kind == "area":
+            breeders.extend(result)
+        else:
+            breed_members.append(result)
+    return breeders, breed_members
+
 def sort_breed_members(breed_members: list[BreedMembers]) -> (list[Member], list[Breed]):
     """
     Sorts the breed_members of type BreedMembers into seperate lists of members and breeds.
@@ -129,49 +317,609 @@ def sort_breed_members(breed_members: list[BreedMembers]) -> (list[Member], list
     Returns:
         tuple: A tuple containing the lists of members and breeds.
     """
-    # create a dictionary of members and breeds to remove duplicates
-    members: dict[str, Member] = {}
-    breeds: list[str, Breed] = {}
-    # iterate through each BreedMembers object and add the members and breeds to the dictionary if they are not already in it
-    for breed_members in breed_members:
-        for member in breed_members.members:
-            if member.id not in members:
-                members[member.id] = member
-            else:
-                for breeder_id in member.breeder_ids:
-                    if breeder_id not in members[member.id].breeder_ids:
-                        members[member.id].breeder_ids.append(breeder_id)
-        for breed in breed_members.breeds:
-            if breed.code not in breeds:
-                breeds[breed.code] = breed
-    # convert the dictionaries to lists
-    members: list[Member] = list(members.values())
-    breeds: list[Breed] = list(breeds.values())
+    # register every member and breed once, merging the breeders of members that belong to several
+    registry: EntityRegistry = EntityRegistry()
+    for current_breed_members in breed_members:
+        registry.add_breed_members(current_breed_members)
+    members: list[Member] = registry.member_list()
+    breeds: list[Breed] = registry.breed_list()
     return (members, breeds)
 
+def stream_to_database(areas: list[Area], backend: PoolBackend | ThreadBackend, journal: Journal = None, 
+                       batch_size: int = 5000, region_sizes: dict[str, int] = None, path: str = "storage.db") -> None:
+    """
+    Scrapes the breeders and their details, writing each result to the database as it arrives 
+    rather than collecting everything in memory first. Members and breeds are deduplicated by the writer.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+        batch_size (int, optional): The amount of rows written per transaction. Defaults to 5000.
+        region_sizes (dict[str, int], optional): The breeder count of each area in a previous run. 
+            When given, the listings and details are fetched as one pipeline. Defaults to None.
+        path (str, optional): The sqlite3 database file to write to. Defaults to "storage.db".
+    """
+    from aggregates import Aggregates
+    from exporter import stop_tracking
+    database: Database = Database(path)
+    database.drop_indexes()
+    Aggregates(database).drop_triggers()
+    stop_tracking(database)
+    with StreamWriter(path, batch_size=batch_size) as writer:
+        writer.put_areas(areas)
+        if region_sizes is not None:
+            print("\nStarting to retrieve and store all breeders and their details.")
+            for kind, item, result in iter_pipelined(areas, backend, journal, region_sizes):
+                if kind == "area":
+                    writer.put_breeders(result)
+                else:
+                    writer.put_breed_members(item, result)
+        else:
+            print("\nStarting to retrieve all breeders.")
+            breeders: list[Breeder] = []
+            for _, area_breeders in iter_breeders(areas, backend, journal):
+                writer.put_breeders(area_breeders)
+                breeders.extend(area_breeders)
+            print(f"\nStarting to retrieve and store breeder details for {len(breeders)} breeders.")
+            for breeder, breed_members in iter_breed_members(breeders, backend, journal):
+                writer.put_breed_members(breeder, breed_members)
+    database.create_indexes()
+    Aggregates(database).compute()
+    print(f"\nAll information added to the database ({writer.rows_written} rows).")
+
+def staged_retrieval(areas: list[Area], backend: PoolBackend | ThreadBackend, staging: StagingArea) -> int:
+    """
+    Scrapes the breeders and their details with every worker writing its results into its own staging database,
+    so the database writes happen in parallel and the details are never sent back to this process.
+    Merge the staging databases with Database.merge_staging once the backend is closed.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        staging (StagingArea): The staging area the workers write to.
+
+    Returns:
+        int: The amount of breeders whose details were staged.
+    """
+    staging.write({"areas": [(area.title, area.region) for area in areas]})
+    print("\nStarting to retrieve and stage all breeders.")
+    breeders: dict[str, Breeder] = {}
+    with Progress(start_time=time.time(), total_amount=len(areas)) as progress:
+        for index, area_breeders in backend.as_completed(stage_area, [(area, staging) for area in areas]):
+            progress.increment_amount_completed()
+            if isinstance(area_breeders, Failure):
+                dead_letter_area(areas[index], area_breeders)
+                continue
+            # a breeder listed in several areas only needs its details requesting once
+            for breeder in area_breeders:
+                breeders.setdefault(breeder.id, breeder)
+    unique_breeders: list[Breeder] = list(breeders.values())
+    print(f"\nStarting to retrieve and stage breeder details for {len(unique_breeders)} breeders.")
+    staged: int = 0
+    with Progress(start_time=time.time(), total_amount=len(unique_breeders)) as progress:
+        for index, failure in backend.as_completed(stage_breeder_details, [(breeder, staging) for breeder in unique_breeders]):
+            progress.increment_amount_completed()
+            if failure:
+                dead_letter_breeder(unique_breeders[index], failure)
+            else:
+                staged += 1
+    return staged
+
+def delta_sync(areas: list[Area], backend: PoolBackend | ThreadBackend, journal: Journal = None, 
+               max_age: float = None, path: str = "storage.db", dead_letters: DeadLetters = None) -> Changes:
+    """
+    Brings the database up to date with the website while requesting only what changed: every area's listing is fetched,
+    but the details are only requested for breeders that are new or whose listing record differs from the last sync.
+    The database is updated in place, breeders that are no longer listed are marked as removed and deleted from the
+    scraped tables, and every change is written to the change log.
+
+    Args:
+        areas (list[Area]): The areas of Italy scraped from the ENCI website.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        journal (Journal, optional): The checkpoint journal to resume from and record to. Defaults to None.
+        max_age (float, optional): The seconds after which an unchanged breeder's details are requested again. Defaults to None, never.
+        path (str, optional): The sqlite3 database file to update. Defaults to "storage.db".
+        dead_letters (DeadLetters, optional): The dead letters to remove the listed areas and fetched breeders from.
+            Defaults to None.
+
+    Returns:
+        Changes: The changes that were found.
+    """
+    state: SyncState = SyncState(path)
+    print("\nStarting to retrieve all breeders.")
+    listed: list[tuple[Area, list[Breeder]]] = list(iter_breeders(areas, backend, journal))
+    breeders: list[Breeder] = [breeder for _, area_breeders in listed for breeder in area_breeders]
+    changes: Changes = state.diff(breeders, max_age, {area.region for area, _ in listed})
+    print(f"\nListing compared with the last sync: {changes}.")
+    to_fetch: list[Breeder] = changes.to_fetch
+    print(f"\nStarting to retrieve breeder details for {len(to_fetch)} breeders.")
+    fetched: list[tuple[Breeder, BreedMembers]] = list(iter_breed_members(to_fetch, backend, journal))
+    from aggregates import Aggregates
+    # the data is updated before the fingerprints, so an interrupted sync fetches the same breeders again next time
+    database: Database = Database(path)
+    database.upsert_breeders(listed, fetched)
+    fetched_ids: set[str] = {breeder.id for breeder, _ in fetched}
+    # breeders whose details failed keep their old fingerprint, so the next sync requests them again
+    failed_ids: set[str] = {breeder.id for breeder in to_fetch} - fetched_ids
+    state.record([breeder for breeder in breeders if breeder.id not in failed_ids], changes, fetched_ids)
+    state.connection.close()
+    resolve_dead_letters(dead_letters, [area.region for area, _ in listed], fetched_ids)
+    # the full-text indexes are rebuilt and the summaries of the changed rows recomputed to take in the updated
+    # and removed rows
+    database.create_indexes()
+    Aggregates(database).refresh()
+    print("\nAll changes applied to the database.")
+    return changes
+
+def retry_dead_letters(dead_letters: DeadLetters, backend: PoolBackend | ThreadBackend, path: str = "storage.db") -> None:
+    """
+    Requests again only the areas and breeders that were dead-lettered by earlier runs, updating the database in place.
+    An area that is listed this time has the details of all of its breeders requested. Every task that succeeds 
+    leaves the dead letters, while one that fails again stays with its attempts added up.
+
+    Args:
+        dead_letters (DeadLetters): The dead letters to retry.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        path (str, optional): The sqlite3 database file to update. Defaults to "storage.db".
+    """
+    listings: list[tuple[str, object, str, int]] = dead_letters.entries("listing")
+    details: list[tuple[str, object, str, int]] = dead_letters.entries("details")
+    print(f"\nRetrying {len(listings)} dead-lettered areas and {len(details)} dead-lettered breeders.")
+    areas: list[Area] = [Area(payload["title"], payload["region"]) for _, payload, _, _ in listings]
+    listed: list[tuple[Area, list[Breeder]]] = list(iter_breeders(areas, backend))
+    breeders: list[Breeder] = [Breeder.from_dict(payload) for _, payload, _, _ in details]
+    breeders.extend(breeder for _, area_breeders in listed for breeder in area_breeders)
+    fetched: list[tuple[Breeder, BreedMembers]] = list(iter_breed_members(breeders, backend))
+    from aggregates import Aggregates
+    database: Database = Database(path)
+    database.upsert_breeders(listed, fetched)
+    database.create_indexes()
+    Aggregates(database).refresh()
+    resolve_dead_letters(dead_letters, [area.region for area, _ in listed], [breeder.id for breeder, _ in fetched])
+    print(f"\n{len(listed)} areas and {len(fetched)} breeders recovered, {len(dead_letters)} still dead-lettered.")
+
+def refresh_targets(areas: list[Area], breeder_ids: list[str], backend: PoolBackend | ThreadBackend, 
+                    path: str = "storage.db", dead_letters: DeadLetters = None) -> None:
+    """
+    Requests again only the given areas and breeders, updating the database in place. Every breeder listed in the
+    areas has its details requested, and so does every given breeder, as it was last stored.
+
+    Args:
+        areas (list[Area]): The areas to list again.
+        breeder_ids (list[str]): The ids of the breeders to request the details of.
+        backend (PoolBackend | ThreadBackend): The fetch backend the requests are run on.
+        path (str, optional): The sqlite3 database file to update. Defaults to "storage.db".
+        dead_letters (DeadLetters, optional): The dead letters to remove the listed areas and fetched breeders from.
+            Defaults to None.
+    """
+    from aggregates import Aggregates
+    database: Database = Database(path)
+    breeders: dict[str, Breeder] = {breeder.id: breeder for breeder in database.breeders_by_id(breeder_ids)}
+    missing: list[str] = sorted(set(breeder_ids)-set(breeders))
+    if missing:
+        print(f"\n{len(missing)} breeders are not in {path} and are skipped: {', '.join(missing)}.")
+    listed: list[tuple[Area, list[Breeder]]] = list(iter_breeders(areas, backend)) if areas else []
+    breeders.update((breeder.id, breeder) for _, area_breeders in listed for breeder in area_breeders)
+    print(f"\nStarting to retrieve breeder details for {len(breeders)} breeders.")
+    fetched: list[tuple[Breeder, BreedMembers]] = list(iter_breed_members(list(breeders.values()), backend))
+    database.upsert_breeders(listed, fetched)
+    resolve_dead_letters(dead_letters, [area.region for area, _ in listed], [breeder.id for breeder, _ in fetched])
+    database.create_indexes()
+    Aggregates(database).refresh()
+    print(f"\n{len(listed)} areas and {len(fetched)} breeders refreshed.")
+
+def run_queue_worker(work_queue: WorkQueue, initargs: tuple, poll_interval: float = 0.5) -> None:
+    """
+    Claims tasks from the work queue and runs them until every task is done or dead. Run as a worker process, 
+    any number of which can share a queue, on this host or on others.
+    A listing task is acknowledged together with the detail tasks of the breeders it lists. A failed task is handed 
+    back to the queue, to be retried or dead-lettered, rather than being retried here.
+
+    Args:
+        work_queue (WorkQueue): The queue to claim tasks from.
+        initargs (tuple): The arguments passed to init_worker.
+        poll_interval (float, optional): The seconds to wait when no task is claimable yet. Defaults to 0.5.
+    """
+    init_worker(*initargs)
+    while True:
+        tasks: list[Task] = work_queue.claim()
+        if not tasks:
+            if work_queue.is_drained():
+                return
+            time.sleep(poll_interval)
+            continue
+        for task in tasks:
+            try:
+                if task.kind == "listing":
+                    breeders: list[Breeder] = get_breeders(Area(task.payload["title"], task.payload["region"]))
+                    work_queue.ack(task, [breeder.to_dict() for breeder in breeders], 
+                                   {"details": ([(breeder.id, breeder.to_dict()) for breeder in breeders], 1)})
+                else:
+                    breed_members: BreedMembers = get_breeder_details(Breeder.from_dict(task.payload))
+                    work_queue.ack(task, breed_members.to_dict())
+            except Exception as e:
+                # an error that retrying cannot fix, such as a 404, is dead-lettered at once
+                state: str = work_queue.fail(task, f"{type(e).__name__}: {e}", 
+                                             dead=retry.POLICIES[classify(e)].max_attempts <= 1)
+                print(f"({task})Error: {e} - {'Dead-lettered' if state == 'dead' else 'Requeued'}.")
+
+def run_queue_workers(work_queue: WorkQueue, workers: int, initargs: tuple) -> None:
+    """
+    Runs local worker processes on the work queue until it is drained, showing the progress of the whole queue,
+    which includes tasks completed by workers on other hosts.
+
+    Args:
+        work_queue (WorkQueue): The queue to work on.
+        workers (int): The amount of worker processes to run.
+        initargs (tuple): The arguments passed to init_worker in every worker.
+    """
+    processes: list[Process] = [Process(target=run_queue_worker, args=(work_queue, initargs), daemon=True) 
+                                for _ in range(workers)]
+    for process in processes:
+        process.start()
+    finished: int = 0
+    with Progress(start_time=time.time(), total_amount=0) as progress:
+        try:
+            while any(process.is_alive() for process in processes):
+                # the total grows as listing tasks enqueue the detail tasks of their breeders
+                counts: list[dict[str, int]] = list(work_queue.counts().values())
+                progress.total_amount = sum(sum(states.values()) for states in counts)
+                now_finished: int = sum(states["done"]+states["dead"] for states in counts)
+                progress.increment_amount_completed(now_finished-finished)
+                finished = now_finished
+                time.sleep(0.5)
+        finally:
+            for process in processes:
+                process.join()
+
+def collect_queue(work_queue: WorkQueue) -> tuple[list[Area], list[Breeder], list[BreedMembers]]:
+    """
+    Gathers the results of every done task in the work queue.
+
+    Args:
+        work_queue (WorkQueue): The queue to collect from.
+
+    Returns:
+        tuple[list[Area], list[Breeder], list[BreedMembers]]: The areas, the breeders listed in them and their members and breeds.
+    """
+    listings: list[tuple[str, object, object]] = work_queue.results("listing")
+    areas: list[Area] = [Area(payload["title"], payload["region"]) for _, payload, _ in listings]
+    breeders: list[Breeder] = [Breeder.from_dict(breeder) for _, _, result in listings for breeder in result]
+    breed_members: list[BreedMembers] = [BreedMembers.from_dict(result) for _, _, result in work_queue.results("details")]
+    return areas, breeders, breed_members
+
+def queue_crawl(work_queue: WorkQueue, role: str, workers: int, initargs: tuple, resume: bool = False, 
+                path: str = "storage.db") -> None:
+    """
+    Scrapes through the durable work queue. Each role is one step, so the steps can be spread over several hosts 
+    sharing the queue file: enqueue the areas on one host, work on every host, then collect on one host.
+
+    Args:
+        work_queue (WorkQueue): The queue to use.
+        role (str): "enqueue", "work", "collect", or "all" to run every step here.
+        workers (int): The amount of local worker processes to run.
+        initargs (tuple): The arguments passed to init_worker in every worker.
+        resume (bool, optional): Keep the tasks of an earlier run instead of starting afresh. Defaults to False.
+        path (str, optional): The sqlite3 database file to collect the results into. Defaults to "storage.db".
+    """
+    if role in ("enqueue", "all"):
+        if not resume:
+            work_queue.clear()
+        areas: list[Area] = get_areas()
+        added: int = work_queue.enqueue("listing", [(area.region, {"title": area.title, "region": area.region}) for area in areas])
+        print(f"\n{added} areas added to the work queue.")
+    if role in ("work", "all"):
+        print(f"\nStarting {workers} queue workers.")
+        run_queue_workers(work_queue, workers, initargs)
+    if role in ("collect", "all"):
+        dead: list[tuple] = work_queue.dead()
+        if dead:
+            print(f"\n{len(dead)} tasks were dead-lettered, e.g. {dead[0][0]} {dead[0][1]}: {dead[0][3]}")
+        areas, breeders, breed_members = collect_queue(work_queue)
+        members, breeds = sort_breed_members(breed_members)
+        print(f"\nStarting to add {len(breeders)} breeders to database.")
+        database_integration(areas, breeders, members, breeds, path)
+        print("\nAll information added to the database.")
+
+# the options each run mode honours, keyed by the mode's flags, with None for a plain full run. Every other option is
+# rejected rather than silently ignored
+MODE_OPTIONS: dict[str, set[str]] = {
+    None: {"--resume", "--pipeline"},
+    "--queue": {"--resume"},
+    "--retry-dead": set(),
+    "--region/--breeder": set(),
+    "--sync": {"--resume"},
+    "--stream": {"--resume", "--pipeline"},
+    "--staged": set(),
+}
+# the options that only apply along with another one
+DEPENDENT_OPTIONS: dict[str, str] = {
+    "--sync-max-age": "--sync",
+    "--staging-dir": "--staged",
+    "--queue-role": "--queue",
+    "--workers": "--queue",
+    "--requeue-dead": "--queue",
+}
+
+def validate_arguments(parser: argparse.ArgumentParser, arguments: argparse.Namespace) -> None:
+    """
+    Rejects combinations of options that the run modes do not support, exiting with a usage error.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser the arguments came from.
+        arguments (argparse.Namespace): The parsed command line arguments.
+    """
+    given: dict[str, bool] = {
+        "--queue": arguments.queue is not None, "--retry-dead": arguments.retry_dead,
+        "--region/--breeder": bool(arguments.region or arguments.breeder), "--sync": arguments.sync,
+        "--stream": arguments.stream, "--staged": arguments.staged, "--resume": arguments.resume,
+        "--pipeline": arguments.pipeline, "--sync-max-age": arguments.sync_max_age is not None,
+        "--staging-dir": arguments.staging_dir is not None, "--queue-role": arguments.queue_role != "all",
+        "--workers": arguments.workers is not None, "--requeue-dead": arguments.requeue_dead,
+    }
+    modes: list[str] = [mode for mode in MODE_OPTIONS if mode is not None and given[mode]]
+    if len(modes) > 1:
+        parser.error(f"{' and '.join(modes)} can not be combined")
+    mode: str = modes[0] if modes else None
+    for option in ("--resume", "--pipeline"):
+        if given[option] and option not in MODE_OPTIONS[mode]:
+            parser.error(f"{option} is not supported with {mode}")
+    for option, required in DEPENDENT_OPTIONS.items():
+        if given[option] and not given[required]:
+            parser.error(f"{option} only applies with {required}")
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command line arguments.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Scrapes the ENCI breeders with affisso.")
+    parser.add_argument("--output", default="storage.db", 
+                        help="The sqlite3 database to write the scraped data, journal, dead letters and sync state to. Defaults to storage.db.")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pool", 
+                        help="The fetch backend: a process pool or a thread pool in a single process. Defaults to pool.")
+    parser.add_argument("--concurrency", type=int, default=None, 
+                        help="The maximum amount of in-flight requests. Defaults to the core count for pool and 128 for thread.")
+    parser.add_argument("--adaptive", action="store_true", 
+                        help="Adapt the requests in flight to the server's latency and errors, up to --concurrency. "
+                             "Defaults --concurrency to 32 for the pool backend and 128 for the thread backend.")
+    parser.add_argument("--initial-concurrency", type=float, default=4.0, 
+                        help="With --adaptive, the requests in flight to start from. Defaults to 4.")
+    parser.add_argument("--pool-size", type=int, default=None, 
+                        help="The maximum amount of keep-alive connections per worker. Defaults to the concurrency.")
+    parser.add_argument("--connect-timeout", type=float, default=5.0, 
+                        help="Seconds to wait for a connection to the ENCI website. Defaults to 5.")
+    parser.add_argument("--read-timeout", type=float, default=10.0, 
+                        help="Seconds to wait for the ENCI website to respond. Defaults to 10.")
+    parser.add_argument("--listing-rate", type=float, default=2.0, 
+                        help="GetAllevatori requests per second shared by all workers, 0 for no limit. Defaults to 2.")
+    parser.add_argument("--listing-burst", type=float, default=4.0, 
+                        help="GetAllevatori requests that may be sent back to back. Defaults to 4.")
+    parser.add_argument("--details-rate", type=float, default=20.0, 
+                        help="TakeAllevatore requests per second shared by all workers, 0 for no limit. Defaults to 20.")
+    parser.add_argument("--details-burst", type=float, default=20.0, 
+                        help="TakeAllevatore requests that may be sent back to back. Defaults to 20.")
+    parser.add_argument("--cache", nargs="?", const="cache.db", default=None, 
+                        help="Cache responses in the given sqlite3 file. Defaults to cache.db when given without a path.")
+    parser.add_argument("--cache-size", type=float, default=512.0, 
+                        help="The most MiB of compressed responses to cache before evicting the least recently used. Defaults to 512.")
+    parser.add_argument("--listing-ttl", type=float, default=24.0, 
+                        help="Hours a cached GetAllevatori response is used without asking the server. Defaults to 24.")
+    parser.add_argument("--details-ttl", type=float, default=24.0, 
+                        help="Hours a cached TakeAllevatore response is used without asking the server. Defaults to 24.")
+    parser.add_argument("--offline", action="store_true", 
+                        help="Serve every request from the cache without touching the network. Implies --cache.")
+    parser.add_argument("--stream", action="store_true", 
+                        help="Write results to the database while scraping, instead of holding them all in memory until the end.")
+    parser.add_argument("--batch-size", type=int, default=5000, 
+                        help="The amount of rows written per transaction when streaming. Defaults to 5000.")
+    parser.add_argument("--staged", action="store_true", 
+                        help="Have every worker write its results into its own staging database while scraping, "
+                             "then merge them into the output database in one transaction.")
+    parser.add_argument("--staging-dir", default=None, 
+                        help="With --staged, the directory to keep the staging databases in. Defaults to a temporary directory.")
+    parser.add_argument("--pipeline", action="store_true", 
+                        help="Fetch each area's breeder details as soon as its listing arrives, largest areas first.")
+    parser.add_argument("--resume", action="store_true", 
+                        help="Skip the areas and breeders recorded in the checkpoint journal by an interrupted run.")
+    parser.add_argument("--sync", action="store_true", 
+                        help="Request details only for breeders that are new or whose listing changed since the last sync, "
+                             "updating the database in place and logging every change.")
+    parser.add_argument("--sync-max-age", type=float, default=None, 
+                        help="With --sync, also request the details of unchanged breeders last fetched more than this many days ago.")
+    parser.add_argument("--queue", nargs="?", const="queue.db", default=None, 
+                        help="Scrape through a durable sqlite3 work queue that worker processes on several hosts can share. Defaults to queue.db.")
+    parser.add_argument("--queue-role", choices=["all", "enqueue", "work", "collect"], default="all", 
+                        help="With --queue, the step to run here: enqueue the areas, work on tasks, or collect the results into storage.db. Defaults to all.")
+    parser.add_argument("--workers", type=int, default=None, 
+                        help="With --queue, the amount of local worker processes. Defaults to --concurrency.")
+    parser.add_argument("--lease", type=float, default=60.0, 
+                        help="With --queue, the seconds a claimed task stays with its worker before another may claim it. Defaults to 60.")
+    parser.add_argument("--max-attempts", type=int, default=5, 
+                        help="With --queue, the claims after which a failing task is dead-lettered. Defaults to 5.")
+    parser.add_argument("--requeue-dead", action="store_true", 
+                        help="With --queue, give dead-lettered tasks a fresh set of attempts before working.")
+    parser.add_argument("--retry-attempts", type=int, default=None, 
+                        help="The attempts of each request before it is dead-lettered, for every error that is retried. "
+                             "Defaults to between 2 and 10 by the kind of error.")
+    parser.add_argument("--retry-delay", type=float, default=None, 
+                        help="The seconds of the first back-off before a failed request is retried, doubling with each attempt. "
+                             "Defaults to between 0.5 and 2 by the kind of error.")
+    parser.add_argument("--retry-dead", action="store_true", 
+                        help="Request again only the areas and breeders dead-lettered by earlier runs, updating the database in place.")
+    parser.add_argument("--region", nargs="+", default=None, metavar="CODE", 
+                        help="Request again only the breeders of these areas, e.g. LOM, updating the database in place.")
+    parser.add_argument("--breeder", nargs="+", default=None, metavar="ID", 
+                        help="Request again only the details of these stored breeders, updating the database in place.")
+    parser.add_argument("--regions-file", default="regions.json", 
+                        help="The file the areas of Italy are kept in between runs. Defaults to regions.json.")
+    parser.add_argument("--regions-max-age", type=float, default=7.0, 
+                        help="Days the kept areas are used for before they are revalidated against the website. Defaults to 7.")
+    parser.add_argument("--refresh-regions", action="store_true", 
+                        help="Request and parse the areas of Italy again, whatever the age of the kept copy.")
+    parser.add_argument("--metrics", nargs="?", const="metrics.json", default=None, 
+                        help="Write a JSON summary of request latencies, sizes, statuses, retries and phase times. Defaults to metrics.json.")
+    parser.add_argument("--prometheus", default=None, 
+                        help="Also write the metrics to this file in the Prometheus text format, e.g. for the node exporter's textfile collector.")
+    arguments: argparse.Namespace = parser.parse_args()
+    validate_arguments(parser, arguments)
+    return arguments
+
 if __name__ == "__main__":
-    # instantiate a Manager object to create a semaphores for progress tracking across processes
-    manager: Manager = Manager()
+    arguments: argparse.Namespace = parse_arguments()
     # Centered title with 50-character width
     print("_" * 50)
     print("\n" + f"{'Allevatori Scraper v1.0.0':^50}")
     print("_" * 50)
-    # get all areas
-    areas: list[Area] = get_areas()
-    # get all breeders using multiprocessing
-    print("\nStarting to retrieve all breeders.")
-    breeders: list[Breeder] = pooled_breeder_retrieval(areas, manager)
-    print("\nAll breeders scraped.")
-    print(f"\nStarting to retrieve breeder details for {len(breeders)} breeders.")
-    # get all breeders' members and breeds using multiprocessing
-    breed_members: list[BreedMembers] = pooled_breed_members_retrieval(breeders, manager)
-    members: list[Member] = None
-    breeds: list[Breed] = None
-    # sort breed_members of type BreedMembers into lists of members and breeds
-    members, breeds = sort_breed_members(breed_members)
-    print("\nAll breeders details retrieved.")
-    print("\nStarting to add all breeders to database.")
-    # add all data to a relational database
-    database_integration(areas, breeders, members, breeds, manager)
-    print("\nAll information added to the database.")
-    print("\nProgram complete. Exiting.")
\ No newline at end of file
+    # the keep-alive session settings of this process and every worker
+    concurrency: int = arguments.concurrency or (ADAPTIVE_CONCURRENCY if arguments.adaptive else DEFAULT_CONCURRENCY)[arguments.backend]
+    session_settings: tuple = (arguments.pool_size or concurrency, (arguments.connect_timeout, arguments.read_timeout))
+    # create the rate limiters shared by every worker
+    limiters: dict[str, RateLimiter] = create_limiters({
+        "GetAllevatori": (arguments.listing_rate, arguments.listing_burst),
+        "TakeAllevatore": (arguments.details_rate, arguments.details_burst),
+    })
+    # open the response cache, if enabled
+    cache: ResponseCache = None
+    if arguments.cache or arguments.offline:
+        cache = ResponseCache(path=arguments.cache or "cache.db", 
+                              ttl={"GetAllevatori": arguments.listing_ttl*3600.0, 
+                                   "TakeAllevatore": arguments.details_ttl*3600.0},
+                              max_size=int(arguments.cache_size*1024*1024), offline=arguments.offline)
+    # the request metrics shared by every worker, along with the wall time of each phase
+    run_metrics: Metrics = Metrics()
+    # the adaptive limit on requests in flight, with the backend's workers as its ceiling
+    controller: ConcurrencyController = None
+    if arguments.adaptive:
+        controller = ConcurrencyController(initial=arguments.initial_concurrency, maximum=concurrency)
+        controller.start_sampling()
+    # how each kind of failed request is retried
+    retry_policies: dict[str, RetryPolicy] = create_policies(arguments.retry_attempts, arguments.retry_delay)
+    initargs: tuple = (session_settings, limiters, cache, run_metrics, controller, retry_policies)
+    init_worker(*initargs)
+    if arguments.queue:
+        # the roles are run on several hosts sharing the file, which WAL does not support
+        work_queue: WorkQueue = WorkQueue(arguments.queue, lease_seconds=arguments.lease, max_attempts=arguments.max_attempts,
+                                          shared=arguments.queue_role != "all")
+        if arguments.requeue_dead:
+            print(f"\n{work_queue.requeue_dead()} dead-lettered tasks requeued.")
+        with run_metrics.phase("queue"):
+            queue_crawl(work_queue, arguments.queue_role, arguments.workers or concurrency, initargs, 
+                        resume=arguments.resume or arguments.requeue_dead, path=arguments.output)
+    else:
+        # open the checkpoint journal, starting it afresh unless resuming an interrupted run
+        journal: Journal = Journal(arguments.output)
+        if not arguments.resume:
+            journal.clear()
+        # record the requests that fail on every attempt, keeping the earlier ones unless everything is requested again
+        dead_letters: DeadLetters = DeadLetters(arguments.output)
+        if not (arguments.resume or arguments.retry_dead or arguments.sync or arguments.region or arguments.breeder):
+            dead_letters.clear()
+        configure_dead_letters(dead_letters)
+        # get the areas from the region catalog, unless the run only requests breeders it already knows
+        areas: list[Area] = []
+        if not (arguments.retry_dead or (arguments.breeder and not arguments.region)):
+            with run_metrics.phase("areas"):
+                areas = RegionCatalog(arguments.regions_file, arguments.regions_max_age*86400.0).areas(arguments.refresh_regions)
+        if arguments.region:
+            unknown: set[str] = set(arguments.region)-{area.region for area in areas}
+            if unknown:
+                print(f"\nUnknown regions {', '.join(sorted(unknown))}, the areas are {', '.join(area.region for area in areas)}.")
+            areas = [area for area in areas if area.region in arguments.region]
+        # instantiate the backend the requests are run on, which starts its workers once the first requests are sent
+        # and needs no more of them than there are breeders to request
+        if arguments.breeder and not arguments.region:
+            concurrency = min(concurrency, len(arguments.breeder))
+        backend: PoolBackend | ThreadBackend = create_backend(arguments.backend, concurrency, initializer=init_worker, 
+                                                             initargs=initargs)
+        # the previous run's area sizes, so that a pipelined run lists the largest areas first
+        region_sizes: dict[str, int] = Database(arguments.output).region_sizes() if arguments.pipeline else None
+        if arguments.retry_dead:
+            with run_metrics.phase("retry"):
+                retry_dead_letters(dead_letters, backend, arguments.output)
+            backend.close()
+        elif arguments.region or arguments.breeder:
+            with run_metrics.phase("refresh"):
+                refresh_targets(areas, arguments.breeder or [], backend, arguments.output, dead_letters)
+            backend.close()
+        elif arguments.sync:
+            with run_metrics.phase("sync"):
+                delta_sync(areas, backend, journal, arguments.sync_max_age*86400.0 if arguments.sync_max_age is not None else None, 
+                           arguments.output, dead_letters)
+            backend.close()
+            journal.clear()
+        elif arguments.stream:
+            with run_metrics.phase("stream"):
+                stream_to_database(areas, backend, journal, arguments.batch_size, region_sizes, arguments.output)
+            backend.close()
+            # the journal holds every area and breeder this run, or the run it resumed, wrote to the database
+            resolve_dead_letters(dead_letters, *journal.completed_keys())
+            journal.clear()
+        elif arguments.staged:
+            staging: StagingArea = StagingArea(arguments.staging_dir)
+            with run_metrics.phase("staged"):
+                staged: int = staged_retrieval(areas, backend, staging)
+            # every worker has finished writing once the backend is closed
+            backend.close()
+            print(f"\nMerging {len(staging.paths())} staging databases holding {staged} breeders into {arguments.output}.")
+            with run_metrics.phase("merge"):
+                from aggregates import Aggregates
+                from exporter import stop_tracking
+                database: Database = Database(arguments.output)
+                database.drop_indexes()
+                Aggregates(database).drop_triggers()
+                stop_tracking(database)
+                database.merge_staging(staging.paths())
+                database.create_indexes()
+                Aggregates(database).compute()
+            staging.remove()
+            print("\nAll information added to the database.")
+        else:
+            if arguments.pipeline:
+                # get all breeders and their members and breeds as one pipeline using the backend
+                print("\nStarting to retrieve all breeders and their details.")
+                with run_metrics.phase("pipeline"):
+                    breeders, breed_members = pipelined_retrieval(areas, backend, journal, region_sizes)
+            else:
+                # get all breeders using the backend
+                print("\nStarting to retrieve all breeders.")
+                with run_metrics.phase("breeders"):
+                    breeders: list[Breeder] = pooled_breeder_retrieval(areas, backend, journal)
+                print("\nAll breeders scraped.")
+                print(f"\nStarting to retrieve breeder details for {len(breeders)} breeders.")
+                # get all breeders' members and breeds using the backend
+                with run_metrics.phase("details"):
+                    breed_members: list[BreedMembers] = pooled_breed_members_retrieval(breeders, backend, journal)
+            backend.close()
+            members: list[Member] = None
+            breeds: list[Breed] = None
+            # sort breed_members of type BreedMembers into lists of members and breeds
+            with run_metrics.phase("sort"):
+                members, breeds = sort_breed_members(breed_members)
+            print("\nAll breeders details retrieved.")
+            print("\nStarting to add all breeders to database.")
+            # add all data to a relational database
+            with run_metrics.phase("database"):
+                database_integration(areas, breeders, members, breeds, arguments.output)
+            # every result is committed to the database now, so the checkpoint payloads are no longer needed, and the
+            # areas and breeders they hold, from this run or the run it resumed, no longer failed
+            resolve_dead_letters(dead_letters, *journal.completed_keys())
+            journal.clear()
+            print("\nAll information added to the database.")
+        if len(dead_letters):
+            print(f"\n{len(dead_letters)} areas and breeders failed on every attempt. Run again with --retry-dead to retry only them.")
+    if controller:
+        history: list[tuple[float, float, int]] = controller.stop_sampling()
+        run_metrics.record_series("concurrency_limit", history)
+        if history:
+            print(f"\nAdaptive concurrency: started at {arguments.initial_concurrency:g}, peaked at {max(limit for _, limit, _ in history):g}, "
+                  f"ended at {history[-1][1]:g} requests in flight.")
+    # write the metrics of the run, if asked for
+    if arguments.metrics:
+        run_metrics.write_json(arguments.metrics)
+    if arguments.prometheus:
+        run_metrics.write_prometheus(arguments.prometheus)
+    print("\nProgram complete. Exiting.")
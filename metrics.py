@@ -0,0 +1,226 @@
+from multiprocessing import Array
+from contextlib import contextmanager
+from ctypes import c_double
+from typing import Iterator
+import json
+import math
+import time
+
+# the endpoints whose requests are measured
+ENDPOINTS: list[str] = ["allevatori-con-affisso", "GetAllevatori", "TakeAllevatore"]
+# the totals kept for each endpoint
+FIELDS: list[str] = ["requests", "errors", "retries", "cache_hits", "bytes", "wire_seconds", "sleep_seconds"]
+# the upper bounds in seconds of the latency histogram buckets, growing by 25% from 1ms to roughly 70s
+BUCKETS: list[float] = [0.001*1.25**index for index in range(51)]
+# the status codes are counted in one slot each
+STATUS_CODES: int = 600
+
+class EndpointMetrics(object):
+    """
+    The request measurements of one endpoint, kept in shared memory so that every worker process adds to the same totals.
+    Must be created before the worker processes and handed to them through the pool initializer.
+    """
+    values: Array
+
+    def __init__(self):
+        """
+        Initializes every total, bucket and status count to zero.
+        """
+        # [FIELDS..., a count per bucket..., a count above the last bucket, a count per status code...]
+        self.values = Array(c_double, len(FIELDS)+len(BUCKETS)+1+STATUS_CODES)
+
+    def add(self, field: str, amount: float = 1.0) -> None:
+        """
+        Adds to one of the FIELDS totals.
+        """
+        with self.values.get_lock():
+            self.values[FIELDS.index(field)] += amount
+
+    def record_response(self, seconds: float, status: int, size: int) -> None:
+        """
+        Records a response: its latency, status code and body size.
+        """
+        bucket: int = len(FIELDS)+self.bucket_index(seconds)
+        with self.values.get_lock():
+            self.values[0] += 1
+            self.values[4] += size
+            self.values[5] += seconds
+            self.values[bucket] += 1
+            if 0 <= status < STATUS_CODES:
+                self.values[len(FIELDS)+len(BUCKETS)+1+status] += 1
+
+    @staticmethod
+    def bucket_index(seconds: float) -> int:
+        """
+        Returns the index of the histogram bucket a latency falls into.
+        """
+        if seconds <= BUCKETS[0]:
+            return 0
+        return min(math.ceil(math.log(seconds/BUCKETS[0], 1.25)-1e-9), len(BUCKETS))
+
+    def snapshot(self) -> tuple[dict[str, float], list[float], dict[int, int]]:
+        """
+        Returns a consistent copy of the totals, the bucket counts and the status code counts.
+        """
+        with self.values.get_lock():
+            values: list[float] = self.values[:]
+        totals: dict[str, float] = dict(zip(FIELDS, values[:len(FIELDS)]))
+        buckets: list[float] = values[len(FIELDS):len(FIELDS)+len(BUCKETS)+1]
+        statuses: dict[int, int] = {status: int(count) for status, count in enumerate(values[len(FIELDS)+len(BUCKETS)+1:]) if count}
+        return totals, buckets, statuses
+
+    @staticmethod
+    def percentile(buckets: list[float], fraction: float) -> float:
+        """
+        Estimates a latency percentile from the bucket counts, interpolating linearly within the bucket it falls in.
+        """
+        total: float = sum(buckets)
+        if not total:
+            return 0.0
+        target: float = total*fraction
+        cumulative: float = 0.0
+        for index, count in enumerate(buckets):
+            if count and cumulative+count >= target:
+                lower: float = BUCKETS[index-1] if index > 0 else 0.0
+                upper: float = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]*1.25
+                return lower+(upper-lower)*(target-cumulative)/count
+            cumulative += count
+        return BUCKETS[-1]
+
+class Metrics(object):
+    """
+    Request metrics of every endpoint across all workers, plus the wall time of each phase of the run.
+    """
+    endpoints: dict[str, EndpointMetrics]
+    phases: dict[str, float]
+    series: dict[str, list[tuple]]
+
+    def __init__(self):
+        """
+        Initializes the shared measurements of every endpoint.
+        """
+        self.endpoints = {endpoint: EndpointMetrics() for endpoint in ENDPOINTS}
+        self.phases = {}
+        self.series = {}
+        self.started_at = time.time()
+
+    def record_response(self, endpoint: str, seconds: float, status: int, size: int) -> None:
+        """
+        Records a response received from the server.
+
+        Args:
+            endpoint (str): The name of the endpoint.
+            seconds (float): The seconds spent on the wire.
+            status (int): The HTTP status code.
+            size (int): The size of the body in bytes.
+        """
+        if endpoint in self.endpoints:
+            self.endpoints[endpoint].record_response(seconds, status, size)
+
+    def add(self, endpoint: str, field: str, amount: float = 1.0) -> None:
+        """
+        Adds to one of the FIELDS totals of an endpoint, e.g. add("TakeAllevatore", "sleep_seconds", 0.5).
+        """
+        if endpoint in self.endpoints:
+            self.endpoints[endpoint].add(field, amount)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measures the wall time of a phase of the run, e.g. with metrics.phase("details"): ...
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0)+time.perf_counter()-start
+
+    def record_series(self, name: str, samples: list[tuple]) -> None:
+        """
+        Records a time series measured during the run, e.g. the (seconds, limit, in flight) samples of the concurrency controller.
+        The value following the timestamp in the last sample is reported as a gauge in the Prometheus output.
+        """
+        self.series[name] = samples
+
+    def summary(self) -> dict:
+        """
+        Returns every measurement, with latency percentiles, as a JSON-serialisable dictionary.
+        """
+        endpoints: dict[str, dict] = {}
+        for endpoint, endpoint_metrics in self.endpoints.items():
+            totals, buckets, statuses = endpoint_metrics.snapshot()
+            endpoints[endpoint] = {
+                **{field: (int(value) if field in ("requests", "errors", "retries", "cache_hits", "bytes") else round(value, 6))
+                   for field, value in totals.items()},
+                "latency_seconds": {name: round(EndpointMetrics.percentile(buckets, fraction), 6)
+                                    for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+                "status_codes": {str(status): count for status, count in statuses.items()},
+            }
+        return {"started_at": self.started_at, "wall_seconds": round(time.time()-self.started_at, 6),
+                "phases_seconds": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                "endpoints": endpoints,
+                "series": self.series}
+
+    def write_json(self, path: str) -> None:
+        """
+        Writes the summary to a JSON file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes every measurement to a file in the Prometheus text exposition format.
+        """
+        lines: list[str] = []
+        def family(name: str, kind: str, help: str) -> None:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+        snapshots: dict[str, tuple] = {endpoint: metrics.snapshot() for endpoint, metrics in self.endpoints.items()}
+        counters: list[tuple[str, str, str]] = [
+            ("requests", "enci_requests_total", "Responses received from the server."),
+            ("errors", "enci_request_errors_total", "Requests that failed without a response."),
+            ("retries", "enci_request_retries_total", "Requests retried after a failure."),
+            ("cache_hits", "enci_cache_hits_total", "Requests answered from the response cache."),
+            ("bytes", "enci_response_bytes_total", "Bytes of response bodies received."),
+            ("sleep_seconds", "enci_sleep_seconds_total", "Seconds spent waiting on rate limits and retry delays."),
+        ]
+        for field, name, help in counters:
+            family(name, "counter", help)
+            for endpoint, (totals, _, _) in snapshots.items():
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {totals[field]:g}')
+        family("enci_responses_total", "counter", "Responses received, by status code.")
+        for endpoint, (_, _, statuses) in snapshots.items():
+            for status, count in statuses.items():
+                lines.append(f'enci_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        family("enci_request_duration_seconds", "histogram", "Seconds each request spent on the wire.")
+        for endpoint, (totals, buckets, _) in snapshots.items():
+            cumulative: float = 0.0
+            for upper, count in zip(BUCKETS, buckets):
+                cumulative += count
+                lines.append(f'enci_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{upper:.6g}"}} {cumulative:g}')
+            lines.append(f'enci_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {sum(buckets):g}')
+            lines.append(f'enci_request_duration_seconds_sum{{endpoint="{endpoint}"}} {totals["wire_seconds"]:g}')
+            lines.append(f'enci_request_duration_seconds_count{{endpoint="{endpoint}"}} {sum(buckets):g}')
+        family("enci_phase_seconds", "gauge", "Wall time of each phase of the run.")
+        for name, seconds in self.phases.items():
+            lines.append(f'enci_phase_seconds{{phase="{name}"}} {seconds:g}')
+        for name, samples in self.series.items():
+            if samples:
+                family(f"enci_{name}", "gauge", f"The last {name.replace('_', ' ')} sampled during the run.")
+                lines.append(f"enci_{name} {samples[-1][1]:g}")
+        with open(path, "w") as file:
+            file.write("\n".join(lines)+"\n")
+
+# the metrics of this process, or None if requests are not measured
+METRICS: Metrics = None
+
+def configure_metrics(metrics: Metrics) -> None:
+    """
+    Sets the metrics that requests sent from this process are recorded to.
+
+    Args:
+        metrics (Metrics): The metrics shared by all workers, or None to not measure requests.
+    """
+    global METRICS
+    METRICS = metrics
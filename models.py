@@ -1,7 +1,24 @@
+from sys import intern
+
+__all__ = ["Breed", "Member", "Breeder", "Area", "BreedMembers"]
+
+# The models use __slots__, so instances carry no per-object __dict__. Strings that repeat across many objects
+# (region and breed codes, group descriptions, towns) are interned, so every object refers to a single copy.
+# __reduce__ pickles the constructor arguments as a plain tuple rather than a dictionary of attribute names, and as
+# pickle writes an object it has already written as a back-reference, each interned string crosses a process boundary
+# once per payload. Unpickling calls __init__ again, so the strings are interned on the receiving side too.
+
+def intern_optional(value: str) -> str:
+    """
+    Interns a string, passing through None and non-string values.
+    """
+    return intern(value) if isinstance(value, str) else value
+
 class Breed:
     """
     Represents a breed of dog.
     """
+    __slots__ = ("code", "id", "last_litter", "description", "group_code", "group_description")
     code: str
     id: str
     last_litter: str
@@ -9,34 +26,43 @@ class Breed:
     group_code: str
     group_description: str
     def __init__(self, code:str, id:str, last_litter:str, description:str, group_code:str, group_description:str):
-        self.code = code
-        self.id = id
-        self.last_litter = last_litter
-        self.description = description
-        self.group_code = group_code
-        self.group_description = group_description
+        self.code = intern_optional(code)
+        self.id = intern_optional(id)
+        self.last_litter = intern_optional(last_litter)
+        self.description = intern_optional(description)
+        self.group_code = intern_optional(group_code)
+        self.group_description = intern_optional(group_description)
     def __str__(self):
         return f"{self.code}-{self.id}-{self.last_litter}-{self.description}-{self.group_code}-{self.group_description}"
     def __repr__(self):
         return Breed.__str__(self)
-    
+    def __reduce__(self):
+        return (Breed, (self.code, self.id, self.last_litter, self.description, self.group_code, self.group_description))
+    def to_dict(self) -> dict:
+        return {"code": self.code, "id": self.id, "last_litter": self.last_litter, "description": self.description,
+                "group_code": self.group_code, "group_description": self.group_description}
+    @staticmethod
+    def from_dict(data: dict):
+        return Breed(**data)
+
 class Member:
     """
     Represents a member of ENCI.
     """
+    __slots__ = ("description", "id", "signatory", "address", "town", "breeder_ids")
     description: str
     id: str
     signatory: bool
     address: str
     town: str
     breeder_ids: list[str]
-    def __init__(self, description: str, id: str, signatory: bool, address: str, town: str, breeder_ids: list[str] = []):
+    def __init__(self, description: str, id: str, signatory: bool, address: str, town: str, breeder_ids: list[str] = None):
         self.description = description
         self.id = id
         self.signatory = signatory
         self.address = address
-        self.town = town
-        self.breeder_ids = breeder_ids
+        self.town = intern_optional(town)
+        self.breeder_ids = breeder_ids if breeder_ids is not None else []
     def __str__(self):
         return f"{self.description}-{self.id}-{self.signatory}-{self.address}-{self.town}"
     def __repr__(self):
@@ -45,25 +71,34 @@ class Member:
         return hash(self.id)
     def __eq__(self, __value: object) -> bool:
         return self.id == __value.id
-    
+    def __reduce__(self):
+        return (Member, (self.description, self.id, self.signatory, self.address, self.town, self.breeder_ids))
+    def to_dict(self) -> dict:
+        return {"description": self.description, "id": self.id, "signatory": self.signatory, "address": self.address,
+                "town": self.town, "breeder_ids": self.breeder_ids}
+    @staticmethod
+    def from_dict(data: dict):
+        return Member(**data)
+
 
 class Breeder:
     """
     Represents a breeder of dogs.
     """
+    __slots__ = ("title", "owner", "id", "area_region", "breeds", "members")
     title: str
     owner: str
     id: str
     area_region: str
     breeds: list[str] #breed codes only
     members: list[str] #member ids only
-    def __init__(self, title: str, owner: str, id: str, area_region:str, breeds: list[str] = [], members: list[str] = []):
+    def __init__(self, title: str, owner: str, id: str, area_region:str, breeds: list[str] = None, members: list[str] = None):
         self.title = title
         self.owner = owner
         self.id = id
-        self.area_region = area_region
-        self.breeds = breeds
-        self.members = members
+        self.area_region = intern_optional(area_region)
+        self.breeds = [intern_optional(code) for code in breeds] if breeds is not None else []
+        self.members = members if members is not None else []
     def __hash__(self) -> int:
         return hash(self.id)
     def __eq__(self, __value: object) -> bool:
@@ -72,36 +107,57 @@ class Breeder:
         return f"({self.title}){self.owner}-{self.breeds}-{self.id}"
     def __repr__(self):
         return Breeder.__str__(self)
+    def __reduce__(self):
+        return (Breeder, (self.title, self.owner, self.id, self.area_region, self.breeds, self.members))
     @staticmethod
     def get_key(obj)->int:
         return int(obj.id)
+    def to_dict(self) -> dict:
+        return {"title": self.title, "owner": self.owner, "id": self.id, "area_region": self.area_region,
+                "breeds": self.breeds, "members": self.members}
+    @staticmethod
+    def from_dict(data: dict):
+        return Breeder(**data)
 
 class Area:
     """
     Represents an area of Italy.
     """
+    __slots__ = ("title", "region", "breeders")
     title: str
     region: str
     breeders: list[Breeder]
     def __init__(self, title, region):
-        self.title = title
-        self.region = region
+        self.title = intern_optional(title)
+        self.region = intern_optional(region)
         self.breeders = []
     def __str__(self):
         return f"({self.region}){self.title}"
     def __repr__(self):
         return Area.__str__(self)
     def __hash__(self) -> int:
-        return hash(self.title, self.region)
+        return hash((self.title, self.region))
     def __eq__(self, o: object) -> bool:
         return self.title == o.title and self.region == o.region
-    
+    def __reduce__(self):
+        return (Area, (self.title, self.region), (None, {"breeders": self.breeders}))
+
 class BreedMembers:
     """
     Represents the members and breeds of a breeder.
     """
+    __slots__ = ("breeds", "members")
     breeds: list[Breed]
     members: list[Member]
-    def __init__(self, breeds: list[Breed] = [], members: list[Member] = []):
-        self.breeds = breeds
-        self.members = members
\ No newline at end of file
+    def __init__(self, breeds: list[Breed] = None, members: list[Member] = None):
+        self.breeds = breeds if breeds is not None else []
+        self.members = members if members is not None else []
+    def __reduce__(self):
+        return (BreedMembers, (self.breeds, self.members))
+    def to_dict(self) -> dict:
+        return {"breeds": [breed.to_dict() for breed in self.breeds],
+                "members": [member.to_dict() for member in self.members]}
+    @staticmethod
+    def from_dict(data: dict):
+        return BreedMembers(breeds=[Breed.from_dict(breed) for breed in data["breeds"]],
+                            members=[Member.from_dict(member) for member in data["members"]])
@@ -0,0 +1,113 @@
+from multiprocessing import Array
+from ctypes import c_double
+from email.utils import parsedate_to_datetime
+import time
+
+# the seconds to pause an endpoint for when a 429 response does not say how long to wait
+DEFAULT_RETRY_AFTER: float = 5.0
+
+class RateLimiter(object):
+    """
+    A token bucket in shared memory that bounds the request rate of every process, thread and task using it.
+    Must be created before the worker processes and handed to them through the pool initializer.
+    """
+    rate: float
+    burst: float
+    state: Array
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        """
+        Initializes the bucket with a full burst of tokens.
+
+        Args:
+            rate (float): The requests per second the bucket refills at.
+            burst (float, optional): The most requests that may be sent back to back. Defaults to 1.
+        """
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        # [tokens available, time the tokens were last counted, time requests are paused until]
+        self.state = Array(c_double, [self.burst, time.monotonic(), 0.0])
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent and takes a token for it.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        waited: float = 0.0
+        while True:
+            with self.state.get_lock():
+                now: float = time.monotonic()
+                tokens, updated_at, paused_until = self.state[:]
+                if now < paused_until:
+                    wait: float = paused_until-now
+                else:
+                    tokens = min(self.burst, tokens+(now-updated_at)*self.rate)
+                    if tokens >= 1.0:
+                        self.state[0], self.state[1] = tokens-1.0, now
+                        return waited
+                    self.state[0], self.state[1] = tokens, now
+                    wait: float = (1.0-tokens)/self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops every user of the bucket from sending requests for the given amount of seconds,
+        after which the bucket refills from empty rather than releasing a burst.
+
+        Args:
+            seconds (float): The seconds to pause for.
+        """
+        with self.state.get_lock():
+            now: float = time.monotonic()
+            paused_until: float = max(self.state[2], now+seconds)
+            self.state[0], self.state[1], self.state[2] = 0.0, paused_until, paused_until
+
+def parse_retry_after(value: str) -> float:
+    """
+    Parses a Retry-After header, which is either a number of seconds or an HTTP date.
+
+    Args:
+        value (str): The value of the header. May be None.
+
+    Returns:
+        float: The seconds to wait, or DEFAULT_RETRY_AFTER if the header is missing or invalid.
+    """
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp()-time.time(), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+# the rate limiters of this process, keyed by endpoint name
+LIMITERS: dict[str, RateLimiter] = {}
+
+def create_limiters(budgets: dict[str, tuple[float, float]]) -> dict[str, RateLimiter]:
+    """
+    Creates a rate limiter for every endpoint with a budget.
+
+    Args:
+        budgets (dict[str, tuple[float, float]]): The (requests per second, burst) of each endpoint.
+            Endpoints with no rate are not limited.
+
+    Returns:
+        dict[str, RateLimiter]: The rate limiters keyed by endpoint name.
+    """
+    return {endpoint: RateLimiter(rate, burst) for endpoint, (rate, burst) in budgets.items() if rate}
+
+def configure_limiters(limiters: dict[str, RateLimiter]) -> None:
+    """
+    Sets the rate limiters used by requests sent from this process.
+
+    Args:
+        limiters (dict[str, RateLimiter]): The rate limiters keyed by endpoint name.
+    """
+    LIMITERS.clear()
+    LIMITERS.update(limiters)
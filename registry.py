@@ -0,0 +1,102 @@
+from models import *
+
+class EntityRegistry(object):
+    """
+    Deduplicates areas, breeders, members and breeds by their keys, and keeps the breeders of each member as a set,
+    so that adding an entity or merging a member's breeders costs O(1) however many are registered.
+    The first sighting of an entity is kept. The breeds of a breeder are the ones its listing gives, in Breeder.breeds.
+    """
+    areas: dict[str, Area]
+    breeders: dict[str, Breeder]
+    members: dict[str, Member]
+    breeds: dict[str, Breed]
+    member_breeders: dict[str, set[str]]
+
+    def __init__(self):
+        """
+        Initializes an empty registry.
+        """
+        self.areas = {}
+        self.breeders = {}
+        self.members = {}
+        self.breeds = {}
+        # breeder ids keyed by member id
+        self.member_breeders = {}
+
+    def add_area(self, area: Area) -> Area:
+        """
+        Registers an area, keyed by region.
+
+        Returns:
+            Area: The registered area, which is the earlier one if the region was already registered.
+        """
+        return self.areas.setdefault(area.region, area)
+
+    def add_breeder(self, breeder: Breeder) -> Breeder:
+        """
+        Registers a breeder, keyed by id.
+
+        Returns:
+            Breeder: The registered breeder, which is the earlier one if the id was already registered.
+        """
+        return self.breeders.setdefault(breeder.id, breeder)
+
+    def add_member(self, member: Member) -> Member:
+        """
+        Registers a member, keyed by id, relating it to the breeders in its breeder_ids.
+
+        Returns:
+            Member: The registered member, which is the earlier one if the id was already registered.
+        """
+        registered: Member = self.members.get(member.id)
+        if registered is None:
+            registered = self.members[member.id] = member
+            self.member_breeders[member.id] = set(member.breeder_ids)
+        else:
+            self.member_breeders[member.id].update(member.breeder_ids)
+        return registered
+
+    def add_breed(self, breed: Breed) -> Breed:
+        """
+        Registers a breed, keyed by code.
+
+        Returns:
+            Breed: The registered breed, which is the earlier one if the code was already registered.
+        """
+        return self.breeds.setdefault(breed.code, breed)
+
+    def add_breed_members(self, breed_members: BreedMembers) -> None:
+        """
+        Registers the members and breeds of a breeder, relating each member to the breeders in its breeder_ids.
+
+        Args:
+            breed_members (BreedMembers): The members and breeds.
+        """
+        # add_member and add_breed inlined, as this runs once for every scraped breeder
+        members: dict[str, Member] = self.members
+        member_breeders: dict[str, set[str]] = self.member_breeders
+        for member in breed_members.members:
+            breeder_ids: set[str] = member_breeders.get(member.id)
+            if breeder_ids is None:
+                members[member.id] = member
+                breeder_ids = member_breeders[member.id] = set(member.breeder_ids)
+            else:
+                breeder_ids.update(member.breeder_ids)
+        breeds: dict[str, Breed] = self.breeds
+        for breed in breed_members.breeds:
+            if breed.code not in breeds:
+                breeds[breed.code] = breed
+
+    def member_list(self) -> list[Member]:
+        """
+        Returns the registered members, each with breeder_ids set to every breeder it is related to.
+        """
+        for member_id, member in self.members.items():
+            member.breeder_ids = sorted(self.member_breeders[member_id])
+        return list(self.members.values())
+
+    def breed_list(self) -> list[Breed]:
+        """
+        Returns the registered breeds.
+        """
+        return list(self.breeds.values())
@@ -0,0 +1,264 @@
+import requests
+import sqlite3
+import random
+import json
+import time
+from typing import Callable
+from cache import CacheMissError
+import metrics
+
+class RetryPolicy(object):
+    """
+    How a class of errors is retried: up to max_attempts attempts in all, waiting an exponentially growing delay
+    between them, base_delay*2**(attempt-1) capped at max_delay. With jitter, the wait is drawn uniformly from zero
+    up to that delay ("full jitter"), so that workers which failed together do not retry together.
+    """
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    jitter: bool
+    def __init__(self, max_attempts: int, base_delay: float = 1.0, max_delay: float = 30.0, jitter: bool = True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+    def __str__(self):
+        return f"{self.max_attempts}x({self.base_delay}s..{self.max_delay}s)"
+    def __repr__(self):
+        return RetryPolicy.__str__(self)
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the seconds to wait after the given failed attempt, counting from 1.
+        """
+        delay: float = min(self.base_delay*2**(attempt-1), self.max_delay)
+        return random.uniform(0.0, delay) if self.jitter else delay
+
+# the retry policy of each error class. Errors that retrying cannot fix, a 4xx other than 429 or a missing cached
+# response when offline, are given up on at once. A 429 has already paused the rate limiter for as long as the
+# server asked, so it only backs off briefly on top of that
+DEFAULT_POLICIES: dict[str, RetryPolicy] = {
+    "connect_timeout": RetryPolicy(6, base_delay=1.0, max_delay=30.0),
+    "read_timeout": RetryPolicy(4, base_delay=2.0, max_delay=60.0),
+    "connection": RetryPolicy(6, base_delay=1.0, max_delay=30.0),
+    "throttled": RetryPolicy(10, base_delay=0.5, max_delay=10.0),
+    "server": RetryPolicy(6, base_delay=1.0, max_delay=30.0),
+    "client": RetryPolicy(1),
+    "decode": RetryPolicy(3, base_delay=1.0, max_delay=10.0),
+    "schema": RetryPolicy(2, base_delay=1.0, max_delay=10.0),
+    "offline": RetryPolicy(1),
+    "other": RetryPolicy(3, base_delay=1.0, max_delay=30.0),
+}
+
+def classify(error: BaseException) -> str:
+    """
+    Classifies an error raised while requesting or parsing a response.
+
+    Args:
+        error (BaseException): The error.
+
+    Returns:
+        str: One of the keys of DEFAULT_POLICIES.
+    """
+    if isinstance(error, CacheMissError):
+        return "offline"
+    # a connect timeout is both a Timeout and a ConnectionError, so it is checked first
+    if isinstance(error, requests.ConnectTimeout):
+        return "connect_timeout"
+    if isinstance(error, requests.Timeout):
+        return "read_timeout"
+    if isinstance(error, requests.ConnectionError):
+        return "connection"
+    if isinstance(error, requests.HTTPError):
+        status: int = error.response.status_code if error.response is not None else 0
+        if status == 429:
+            return "throttled"
+        if 400 <= status < 500:
+            return "client"
+        return "server"
+    if isinstance(error, json.JSONDecodeError):
+        return "decode"
+    # a response that parsed but lacks the expected keys or elements
+    if isinstance(error, (KeyError, IndexError, TypeError, AttributeError)):
+        return "schema"
+    return "other"
+
+def create_policies(max_attempts: int = None, base_delay: float = None) -> dict[str, RetryPolicy]:
+    """
+    Copies the default policies, overriding the attempts and base delay of every class that is retried.
+
+    Args:
+        max_attempts (int, optional): The attempts of every retried class. Defaults to None, the class defaults.
+        base_delay (float, optional): The base delay of every retried class. Defaults to None, the class defaults.
+
+    Returns:
+        dict[str, RetryPolicy]: The policies, keyed by error class.
+    """
+    policies: dict[str, RetryPolicy] = {}
+    for error_class, policy in DEFAULT_POLICIES.items():
+        retried: bool = policy.max_attempts > 1
+        policies[error_class] = RetryPolicy(max_attempts if retried and max_attempts else policy.max_attempts,
+                                            base_delay if retried and base_delay is not None else policy.base_delay,
+                                            policy.max_delay, policy.jitter)
+    return policies
+
+class Failure(object):
+    """
+    The outcome of a task that failed on its last attempt, returned in place of its result so that one bad breeder
+    does not abort the backend's other tasks.
+    """
+    error_class: str
+    error: str
+    attempts: int
+    def __init__(self, error_class: str, error: str, attempts: int):
+        self.error_class = error_class
+        self.error = error
+        self.attempts = attempts
+    def __str__(self):
+        return f"{self.error_class} after {self.attempts} attempts: {self.error}"
+    def __repr__(self):
+        return Failure.__str__(self)
+
+# the retry policies of this process
+POLICIES: dict[str, RetryPolicy] = DEFAULT_POLICIES
+
+def configure_retries(policies: dict[str, RetryPolicy]) -> None:
+    """
+    Sets the retry policies used by tasks run in this process.
+
+    Args:
+        policies (dict[str, RetryPolicy]): The policies keyed by error class, or None for the defaults.
+    """
+    global POLICIES
+    POLICIES = policies or DEFAULT_POLICIES
+
+def call_with_retries(func: Callable, args: tuple, key: str, endpoint: str) -> object:
+    """
+    Calls a function, retrying it by the policy of each error's class until it succeeds or its attempts run out.
+    Every retry and its wait are recorded in the metrics, if they are configured.
+
+    Args:
+        func (Callable): The function to call.
+        args (tuple): The arguments to call it with.
+        key (str): What the call is for, e.g. the breeder id, shown in error messages.
+        endpoint (str): The name of the endpoint the function requests.
+
+    Returns:
+        object: The result of the function, or a Failure describing the last error.
+    """
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            return func(*args)
+        except Exception as e:
+            error_class: str = classify(e)
+            policy: RetryPolicy = POLICIES.get(error_class, DEFAULT_POLICIES[error_class])
+            # attempts are counted across classes, so a breeder that fails in different ways still ends
+            if attempt >= policy.max_attempts:
+                print(f"({key})Error: {e} - Giving up after {attempt} attempts.")
+                return Failure(error_class, f"{type(e).__name__}: {e}", attempt)
+            delay: float = policy.delay(attempt)
+            print(f"({key})Error: {e} - Retrying in {delay:.2f} seconds.")
+            if metrics.METRICS:
+                metrics.METRICS.add(endpoint, "retries")
+                metrics.METRICS.add(endpoint, "sleep_seconds", delay)
+            if delay:
+                time.sleep(delay)
+
+class DeadLetters:
+    """
+    The tasks that failed on their last attempt, kept in storage.db with their last error, so that a later run can
+    retry just them. A task that fails again has its attempts added to its earlier ones.
+    """
+    connection: sqlite3.Connection
+    cursor = sqlite3.Cursor
+
+    def __init__(self, path: str = "storage.db"):
+        """
+        Opens the dead-letter table, creating it if needed.
+
+        Args:
+            path (str, optional): The sqlite3 database to keep the table in. Defaults to "storage.db".
+        """
+        self.connection = sqlite3.connect(path)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS dead_letters (kind TEXT, key TEXT, payload TEXT, error_class TEXT, error TEXT, attempts INTEGER, runs INTEGER, failed_at REAL, PRIMARY KEY(kind, key))")
+        self.connection.commit()
+
+    def record(self, kind: str, key: str, payload: object, failure: Failure) -> None:
+        """
+        Records a failed task.
+
+        Args:
+            kind (str): The kind of the task, "listing" or "details".
+            key (str): The area region or breeder id.
+            payload (object): The JSON-serialisable area or breeder, to request it again from.
+            failure (Failure): How the task failed.
+        """
+        self.cursor.execute("INSERT INTO dead_letters VALUES (?,?,?,?,?,?,1,?) ON CONFLICT(kind, key) DO UPDATE SET "
+                            "payload=excluded.payload, error_class=excluded.error_class, error=excluded.error, "
+                            "attempts=attempts+excluded.attempts, runs=runs+1, failed_at=excluded.failed_at",
+                            (kind, key, json.dumps(payload), failure.error_class, failure.error, failure.attempts, time.time()))
+        self.connection.commit()
+
+    def resolve(self, kind: str, keys: list[str]) -> None:
+        """
+        Removes tasks that have since succeeded.
+
+        Args:
+            kind (str): The kind of the tasks.
+            keys (list[str]): The keys of the tasks.
+        """
+        self.cursor.executemany("DELETE FROM dead_letters WHERE kind=? AND key=?", ((kind, key) for key in keys))
+        self.connection.commit()
+
+    def entries(self, kind: str) -> list[tuple[str, object, str, int]]:
+        """
+        Returns the failed tasks of a kind.
+
+        Args:
+            kind (str): The kind of the tasks.
+
+        Returns:
+            list[tuple[str, object, str, int]]: The key, payload, last error and total attempts of each task.
+        """
+        return [(key, json.loads(payload), error, attempts) for key, payload, error, attempts in
+                self.cursor.execute("SELECT key, payload, error, attempts FROM dead_letters WHERE kind=? ORDER BY failed_at", (kind,))]
+
+    def __len__(self) -> int:
+        return self.cursor.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Removes every failed task.
+        """
+        self.cursor.execute("DELETE FROM dead_letters")
+        self.connection.commit()
+
+# the dead letters failed tasks are recorded to by this process, or None to only report them
+DEAD_LETTERS: DeadLetters = None
+
+def configure_dead_letters(dead_letters: DeadLetters) -> None:
+    """
+    Sets the dead letters failed tasks are recorded to.
+
+    Args:
+        dead_letters (DeadLetters): The dead letters, or None to only report failed tasks.
+    """
+    global DEAD_LETTERS
+    DEAD_LETTERS = dead_letters
+
+def dead_letter(kind: str, key: str, payload: object, failure: Failure) -> None:
+    """
+    Records a failed task to the configured dead letters, if any.
+
+    Args:
+        kind (str): The kind of the task, "listing" or "details".
+        key (str): The area region or breeder id.
+        payload (object): The JSON-serialisable area or breeder.
+        failure (Failure): How the task failed.
+    """
+    if DEAD_LETTERS is not None:
+        DEAD_LETTERS.record(kind, key, payload, failure)
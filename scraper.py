@@ -1,50 +1,107 @@
 from models import *
 import requests
-from bs4 import BeautifulSoup
-import json
-import time
-import numpy as np
 from Progress import *
+from session import configure_session, send
+from ratelimit import RateLimiter, configure_limiters
+from cache import ResponseCache, configure_cache
+from metrics import Metrics, configure_metrics
+from adaptive import ConcurrencyController, configure_controller
+from registry import EntityRegistry
+from jsonstream import loads, iter_array
+from retry import RetryPolicy, Failure, configure_retries, call_with_retries
+import os
 
-def get_areas() -> list[Area]:
+# the root of the ENCI website, overridable so the scraper can be pointed at a local stand-in server
+BASE_URL: str = os.environ.get("ENCI_BASE_URL", "https://www.enci.it")
+
+def init_worker(session_settings: tuple, limiters: dict[str, RateLimiter], cache: ResponseCache = None,
+                worker_metrics: Metrics = None, controller: ConcurrencyController = None,
+                retry_policies: dict[str, RetryPolicy] = None) -> None:
+    """
+    Prepares a worker to send requests. Passed as the initializer of the fetch backend.
+
+    Args:
+        session_settings (tuple): The (pool size, timeout) passed to configure_session.
+        limiters (dict[str, RateLimiter]): The rate limiters shared by all workers, keyed by endpoint name.
+        cache (ResponseCache, optional): The on-disk response cache, or None to always request. Defaults to None.
+        worker_metrics (Metrics, optional): The request metrics shared by all workers, or None to not measure. Defaults to None.
+        controller (ConcurrencyController, optional): The adaptive limit on requests in flight shared by all workers,
+            or None to not adapt. Defaults to None.
+        retry_policies (dict[str, RetryPolicy], optional): The retry policy of each error class, or None for the defaults.
+            Defaults to None.
+    """
+    configure_session(*session_settings)
+    configure_limiters(limiters)
+    configure_cache(cache)
+    configure_metrics(worker_metrics)
+    configure_controller(controller)
+    configure_retries(retry_policies)
+
+def get_areas(session: requests.Session = None) -> list[Area]:
     """
     Gets the areas of Italy from the ENCI website.
 
+    Args:
+        session (requests.Session, optional): The session to send the request with. Defaults to the worker's session.
+
     Returns:
         list[Area]: A list of Area objects.
     """
-    URL:str = f"https://www.enci.it/allevatori/allevatori-con-affisso?codRegione=PIE"
-    # request the page
-    page:requests.Response = requests.get(URL)
-    soup:BeautifulSoup = BeautifulSoup(page.content, "html.parser")
+    return parse_areas(request_areas_page(session).content)
+
+def request_areas_page(session: requests.Session = None, headers: dict[str, str] = None) -> requests.Response:
+    """
+    Requests the page whose map lists the areas of Italy.
+
+    Args:
+        session (requests.Session, optional): The session to send the request with. Defaults to the worker's session.
+        headers (dict[str, str], optional): Extra request headers, e.g. to revalidate a copy. Defaults to None.
+
+    Returns:
+        requests.Response: The response, which is a 304 if the headers revalidated an unchanged copy.
+    """
+    URL:str = f"{BASE_URL}/allevatori/allevatori-con-affisso?codRegione=PIE"
+    return send("allevatori-con-affisso", "GET", URL, session, headers=headers)
+
+def parse_areas(content: bytes) -> list[Area]:
+    """
+    Parses the areas of Italy out of the map on the allevatori-con-affisso page.
+
+    Args:
+        content (bytes): The HTML of the page.
+
+    Returns:
+        list[Area]: A list of Area objects.
+    """
+    # bs4 is only needed when the page is parsed, which the region catalog saves most runs from
+    from bs4 import BeautifulSoup
+    soup:BeautifulSoup = BeautifulSoup(content, "html.parser")
     # find the map element
     map = soup.find("map", {"name": "ENCI_italia_Map"})
     area_tags = map.find_all("area")
-    areas: list[Area] = []
-    # create an Area object for each area tag
+    registry: EntityRegistry = EntityRegistry()
+    # create an Area object for each area tag, keeping the first of the tags of each region
     for a in area_tags:
-        current_area = Area(a["title"], a["data-regione"])
-        if current_area not in areas:
-            areas.append(current_area)
-    return areas
+        registry.add_area(Area(a["title"], a["data-regione"]))
+    return list(registry.areas.values())
 
-def get_breeder_details(breeder: Breeder) -> BreedMembers:
+def get_breeder_details(breeder: Breeder, session: requests.Session = None) -> BreedMembers:
     """
     Gets the members and breeds of a breeder from the ENCI website.
 
     Args:
         breeder (Breeder): The breeder to get the details of.
+        session (requests.Session, optional): The session to send the request with. Defaults to the worker's session.
 
     Returns:
         BreedMembers: A BreedMembers object containing the members and breeds of the breeder.
     """
-    url:str = f"https://www.enci.it/umbraco/enci/AllevatoriApi/TakeAllevatore?idAffisso={breeder.id}"
-    payload:dict = {}
-    headers:dict = {}
-    breed_members: BreedMembers = BreedMembers()
+    url:str = f"{BASE_URL}/umbraco/enci/AllevatoriApi/TakeAllevatore?idAffisso={breeder.id}"
+    registry: EntityRegistry = EntityRegistry()
     # request the page
-    response = requests.request("GET", url, headers=headers, data=payload, timeout=10)
-    breeder_data = json.loads(response.text)
+    response = send("TakeAllevatore", "GET", url, session)
+    # decoded straight from the body's bytes, with orjson when it is installed
+    breeder_data = loads(response.content)
     # instantiate a Member object for each member of the breeder
     for current_member in breeder_data["Soci"]:
         member: Member = Member(description=current_member["DesAssociato"],
@@ -53,9 +110,8 @@ def get_breeder_details(breeder: Breeder) -> BreedMembers:
                                 address=current_member["DesIndirizzoSocio"],
                                 town=current_member["DesLocalitaSocio"],
                                 breeder_ids=[breeder.id])
-        # add the member to the BreedMembers object if they are not already in it
-        if member not in breed_members.members:
-            breed_members.members.append(member)
+        # add the member unless a member with the same id was already added
+        registry.add_member(member)
     # instantiate a Breed object for each breed of the breeder
     for current_breed in breeder_data["Razze"]:
         new_breed: Breed = Breed(code=current_breed["CodRazza"],
@@ -64,96 +120,65 @@ def get_breeder_details(breeder: Breeder) -> BreedMembers:
                                  description=current_breed["DesRazza"],
                                  group_code=current_breed["CodGruppo"],
                                  group_description=current_breed["DesGruppo"])
-        # add the breed to the BreedMembers object if it is not already in it
-        if new_breed not in breed_members.breeds:
-            breed_members.breeds.append(new_breed)
-    return breed_members
+        # add the breed unless a breed with the same code was already added
+        registry.add_breed(new_breed)
+    return BreedMembers(breeds=registry.breed_list(), members=list(registry.members.values()))
 
-def get_breeders(area:Area) -> list[Breeder]:
+def get_breeders(area:Area, session: requests.Session = None) -> list[Breeder]:
     """
     Gets the breeders in the specified area.
 
     Args:
         area (Area): The area to get the breeders from.
+        session (requests.Session, optional): The session to send the request with. Defaults to the worker's session.
 
     Returns:
         list[Breeder]: A list of Breeder objects where the breeders belong to the specified area.
     """
-    url:str = "https://www.enci.it/umbraco/enci/AllevatoriApi/GetAllevatori"
+    url:str = f"{BASE_URL}/umbraco/enci/AllevatoriApi/GetAllevatori"
     payload:str = "{\"regioniAttive\":[\""+area.region+"\"],\"filtroRazze\":[]}"
     headers:dict[str:any] = {
     'Content-Type': 'application/json;charset=utf-8'
     }
     # request the page
-    response: requests.Response = requests.request("POST", url, headers=headers, data=payload)
-    breeder_data = json.loads(response.text)
-    breeders: list[Breeder] = []
-    # instantiate a Breeder object for each breeder in the area
-    for current_breeder in breeder_data:
+    response: requests.Response = send("GetAllevatori", "POST", url, session, headers=headers, data=payload)
+    registry: EntityRegistry = EntityRegistry()
+    # instantiate a Breeder object for each breeder in the area as it is decoded, so the whole listing is never held
+    # as a str and a list of dicts on top of the response body
+    for current_breeder in iter_array(response.content):
         breeder: Breeder = Breeder(title=current_breeder["DesAffisso"], 
                                    owner=current_breeder["Proprietario"], 
                                    id=current_breeder["IdAffisso"], 
                                    area_region=area.region,
                                    breeds=[breed_code for breed_code in current_breeder["Razze"]])
-        # add the breeder to the list if they are not already in it
-        if breeder not in breeders:
-            breeders.append(breeder)
-    return breeders
+        # add the breeder unless a breeder with the same id was already added
+        registry.add_breeder(breeder)
+    return list(registry.breeders.values())
 
-def scrape_area(area: Area, progress: Progress) -> list[Breeder]:
+def scrape_area(area: Area) -> list[Breeder] | Failure:
     """
-    Wraps the get_breeders function to allow for tracking progress accross processes.
+    Wraps the get_breeders function as the task run on the fetch backend for each area.
+    Failed requests are retried by the retry policy of their error class.
 
     Args:
         area (Area): The area to get the breeders from.
-        progress (Progress): The progress tracker object.
 
     Returns:
-        list[Breeder]: A list of Breeder objects where the breeders belong to the specified area.
+        list[Breeder] | Failure: The breeders that belong to the specified area, or a Failure if every attempt failed.
     """
-    # get the breeders in the area
-    breeders: list[Breeder] = get_breeders(area)
-    # increment the amount of completed tasks and display the progress
-    progress.increment_amount_completed()
-    progress.display_progress()
-    return breeders
+    return call_with_retries(get_breeders, (area,), area.region, "GetAllevatori")
 
-def request_breeder_details(breeder: Breeder, paused_process_count: Counter, wait_time: float, progress: Progress) -> BreedMembers:
+def request_breeder_details(breeder: Breeder) -> BreedMembers | Failure:
     """
-    Wraps the get_breeder_details function to allow for tracking progress accross processes. 
-    Handles errors and retries so that the program does not crash upon a failed request.
+    Wraps the get_breeder_details function as the task run on the fetch backend for each breeder. 
+    Failed requests are retried by the retry policy of their error class, with a bounded amount of attempts,
+    so that a breeder which always fails cannot hold up a worker forever.
+    The request rate is bounded by the TakeAllevatore rate limiter shared by all workers.
 
     Args:
         breeder (Breeder): The breeder to get the details of.
-        paused_process_count (Counter): The counter for tracking the number of paused processes.
-        wait_time (float): The amount of time to wait before retrying the request.
-        progress (Progress): The progress tracker object.
 
     Returns:
-        BreedMembers: A BreedMembers object containing the members and breeds of the breeder.
+        BreedMembers | Failure: The members and breeds of the breeder, or a Failure if every attempt failed.
     """
-    # wait for a random amount of time to avoid overloading the server
-    time.sleep(wait_time)
-    breed_members: BreedMembers = None
-    completed: bool = False
-    # keep retrying until the request is successful
-    while not completed:
-        # try to get the breeder details
-        try:
-            # if there are more than 10 paused processes, wait for 5 seconds to prevent overloading the server
-            if paused_process_count.value > 10:
-                time.sleep(5.0)
-            # get the breeder details
-            breed_members = get_breeder_details(breeder)
-            completed = True
-        # if there is an error, wait for a random amount of time and retry
-        except Exception as e:
-            print(f"({breeder.id})Error: {e} - Retrying in 7.3-11.48 seconds.")
-            # increment the paused process count and wait for a random amount of time
-            paused_process_count.increment()
-            time.sleep(np.random.uniform(7.3,11.48))
-            paused_process_count.decrement()
-    # increment the amount of completed tasks and display the progress
-    progress.increment_amount_completed()
-    progress.display_progress()
-    return breed_members
\ No newline at end of file
+    return call_with_retries(get_breeder_details, (breeder,), breeder.id, "TakeAllevatore")
@@ -0,0 +1,141 @@
+from requests.adapters import HTTPAdapter
+from ratelimit import LIMITERS, RateLimiter, parse_retry_after
+from cache import CachedResponse, CacheMissError
+import cache
+import metrics
+import adaptive
+import requests
+import threading
+import time
+import os
+
+# the maximum amount of keep-alive connections kept open per host
+POOL_SIZE: int = 16
+# the (connect, read) timeouts in seconds applied to every request
+TIMEOUT: tuple[float, float] = (5.0, 10.0)
+
+_session: requests.Session = None
+_session_pid: int = None
+_session_lock: threading.Lock = threading.Lock()
+
+def configure_session(pool_size: int = None, timeout: tuple[float, float] = None) -> None:
+    """
+    Sets the connection pool size and timeouts used by sessions created in this process.
+    Passed as the initializer of worker processes so that every worker uses the same settings.
+
+    Args:
+        pool_size (int, optional): The maximum amount of keep-alive connections per host. Defaults to POOL_SIZE.
+        timeout (tuple[float, float], optional): The (connect, read) timeouts in seconds. Defaults to TIMEOUT.
+    """
+    global POOL_SIZE, TIMEOUT, _session
+    POOL_SIZE = pool_size or POOL_SIZE
+    TIMEOUT = timeout or TIMEOUT
+    # the next get_session call builds a session with the new settings
+    _session = None
+
+def create_session(pool_size: int = None) -> requests.Session:
+    """
+    Creates a session that keeps connections alive and negotiates compressed responses.
+
+    Args:
+        pool_size (int, optional): The maximum amount of keep-alive connections per host. Defaults to POOL_SIZE.
+
+    Returns:
+        requests.Session: The new session.
+    """
+    session: requests.Session = requests.Session()
+    adapter: HTTPAdapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size or POOL_SIZE, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+def get_session() -> requests.Session:
+    """
+    Returns the session of the current worker, creating it on first use.
+    Each process gets its own session, which is shared by all of the threads of that process.
+
+    Returns:
+        requests.Session: The session of the current worker.
+    """
+    global _session, _session_pid
+    # sockets can not be shared with forked children, so a session is only reused within the process that created it
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = create_session()
+                _session_pid = os.getpid()
+    return _session
+
+def send(endpoint: str, method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+    """
+    Sends a request once the endpoint's rate limiter allows it, answering from the response cache when it holds a fresh copy.
+    A stale cached copy is revalidated with its ETag/Last-Modified so that an unchanged response costs a 304.
+    A 429 response pauses every worker sharing the limiter for as long as its Retry-After header asks.
+    When a concurrency controller is configured, the request waits for one of its slots and reports back whether it was healthy.
+    When metrics are configured, the wait for the limiter, the time on the wire, the body size and the status are recorded.
+
+    Args:
+        endpoint (str): The name of the endpoint, used to pick its rate limiter and cache TTL, e.g. "TakeAllevatore".
+        method (str): The HTTP method.
+        url (str): The url to request.
+        session (requests.Session, optional): The session to send the request with. Defaults to the worker's session.
+        **kwargs: Passed on to requests.Session.request.
+
+    Returns:
+        requests.Response: The response.
+
+    Raises:
+        requests.HTTPError: If the response has an error status code.
+        CacheMissError: If the cache is offline and holds no response for the request.
+    """
+    key: str = None
+    cached: CachedResponse = None
+    if cache.CACHE:
+        key = cache.CACHE.key(method, url, kwargs.get("data"))
+        cached = cache.CACHE.get(key)
+        if cached and (cache.CACHE.offline or cached.is_fresh(cache.CACHE.ttl.get(endpoint, 0.0))):
+            if metrics.METRICS:
+                metrics.METRICS.add(endpoint, "cache_hits")
+            return cached.to_response(url)
+        if cache.CACHE.offline:
+            raise CacheMissError(f"No cached response for {method} {url}")
+        if cached:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **cached.validators()}
+    session = session or get_session()
+    controller: adaptive.ConcurrencyController = adaptive.CONTROLLER
+    waited: float = controller.acquire() if controller else 0.0
+    healthy: bool = False
+    try:
+        limiter: RateLimiter = LIMITERS.get(endpoint)
+        if limiter:
+            waited += limiter.acquire()
+        if metrics.METRICS and waited:
+            metrics.METRICS.add(endpoint, "sleep_seconds", waited)
+        start: float = time.perf_counter()
+        try:
+            response: requests.Response = session.request(method, url, timeout=TIMEOUT, **kwargs)
+        except requests.RequestException:
+            if metrics.METRICS:
+                metrics.METRICS.add(endpoint, "errors")
+            raise
+        # timeouts, connection errors, 5xx and 429 all tell the controller to back off
+        healthy = response.status_code < 500 and response.status_code != 429
+    finally:
+        if controller:
+            controller.release(healthy, time.perf_counter()-start if healthy else 0.0)
+    if metrics.METRICS:
+        metrics.METRICS.record_response(endpoint, time.perf_counter()-start, response.status_code, len(response.content))
+    if response.status_code == 429 and limiter:
+        limiter.pause(parse_retry_after(response.headers.get("Retry-After")))
+    if response.status_code == 304 and cached:
+        cache.CACHE.refresh(key)
+        return cached.to_response(url)
+    response.raise_for_status()
+    # a 304 to the caller's own validators has no body to serve later, so only successful responses are kept
+    if cache.CACHE and 200 <= response.status_code < 300:
+        cache.CACHE.put(key, endpoint, response)
+    return response
@@ -0,0 +1,135 @@
+from models import *
+from database import Database
+from scraper import scrape_area, request_breeder_details
+from retry import Failure
+import glob
+import os
+import tempfile
+import threading
+
+# the staging database of this process, opened on first use, along with the process and directory it belongs to
+_database: Database = None
+_database_key: tuple[int, str] = None
+_database_lock: threading.Lock = threading.Lock()
+
+class StagingArea(object):
+    """
+    A directory of staging sqlite3 databases, one per worker process, which the workers write their own results into
+    as they scrape, in parallel and without handing the results back to the main process. The main process then
+    merges every staging database into the output database at once with Database.merge_staging.
+    Only the directory is pickled, so a StagingArea can be passed to the workers as a task argument.
+    """
+    directory: str
+
+    def __init__(self, directory: str = None):
+        """
+        Initializes the staging directory.
+
+        Args:
+            directory (str, optional): The directory to keep the staging databases in, which is created if missing.
+                Defaults to None, a new temporary directory.
+        """
+        self.directory = directory or tempfile.mkdtemp(prefix="enci-staging-")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def database(self) -> Database:
+        """
+        Returns the staging database of the current process, opening it on first use.
+        Threads of the same process, such as those of the thread backend, share it.
+        """
+        global _database, _database_key
+        key: tuple[int, str] = (os.getpid(), self.directory)
+        if _database_key != key:
+            with _database_lock:
+                if _database_key != key:
+                    _database = Database(os.path.join(self.directory, f"staging-{os.getpid()}.db"), check_same_thread=False)
+                    # a staging database is scratch space, rebuilt by scraping again if lost, so commits need not wait on the disk
+                    _database.cursor.execute("PRAGMA journal_mode=WAL")
+                    _database.cursor.execute("PRAGMA synchronous=OFF")
+                    _database_key = key
+        return _database
+
+    def write(self, tables: dict[str, list[tuple]]) -> None:
+        """
+        Writes rows to the staging database of the current process, committing them at once.
+
+        Args:
+            tables (dict[str, list[tuple]]): The rows to insert, keyed by table name.
+        """
+        database: Database = self.database()
+        with _database_lock:
+            database.insert_rows(tables)
+
+    def paths(self) -> list[str]:
+        """
+        Returns the staging databases written so far.
+        """
+        return sorted(glob.glob(os.path.join(self.directory, "staging-*.db")))
+
+    def remove(self) -> None:
+        """
+        Closes this process's staging database and deletes the staging databases, along with the staging directory
+        if nothing else is left in it.
+        """
+        global _database, _database_key
+        with _database_lock:
+            if _database_key is not None and _database_key[1] == self.directory:
+                _database.connection.close()
+                _database, _database_key = None, None
+        for path in glob.glob(os.path.join(self.directory, "staging-*.db*")):
+            os.remove(path)
+        if not os.listdir(self.directory):
+            os.rmdir(self.directory)
+
+def listing_rows(breeders: list[Breeder]) -> dict[str, list[tuple]]:
+    """
+    Returns the rows of the breeders listed in an area, along with their area and breed links.
+    """
+    return {"breeders": [(breeder.title, breeder.owner, breeder.id) for breeder in breeders],
+            "areas_breeders": [(breeder.area_region, breeder.id) for breeder in breeders],
+            "breeders_breeds": [(breeder.id, breed_code) for breeder in breeders for breed_code in breeder.breeds]}
+
+def details_rows(breed_members: BreedMembers) -> dict[str, list[tuple]]:
+    """
+    Returns the rows of a breeder's members and breeds, along with the member links.
+    """
+    return {"breeds": [(breed.code, breed.id, breed.last_litter, breed.description, breed.group_code, breed.group_description)
+                       for breed in breed_members.breeds],
+            "members": [(member.description, member.id, member.signatory, member.address, member.town)
+                        for member in breed_members.members],
+            "breeders_members": [(breeder_id, member.id) for member in breed_members.members
+                                 for breeder_id in member.breeder_ids]}
+
+def stage_area(area: Area, staging: StagingArea) -> list[Breeder] | Failure:
+    """
+    Scrapes an area and writes its breeders to the worker's staging database. Run on the fetch backend.
+
+    Args:
+        area (Area): The area to get the breeders from.
+        staging (StagingArea): The staging area to write to.
+
+    Returns:
+        list[Breeder] | Failure: The breeders of the area, whose details are scraped next, or a Failure if every attempt failed.
+    """
+    breeders: list[Breeder] | Failure = scrape_area(area)
+    if not isinstance(breeders, Failure):
+        staging.write(listing_rows(breeders))
+    return breeders
+
+def stage_breeder_details(breeder: Breeder, staging: StagingArea) -> Failure:
+    """
+    Scrapes a breeder's members and breeds and writes them to the worker's staging database. Run on the fetch backend.
+    The details are not returned, so they are never pickled back to the main process.
+
+    Args:
+        breeder (Breeder): The breeder to get the details of.
+        staging (StagingArea): The staging area to write to.
+
+    Returns:
+        Failure: None once the details are staged, or a Failure if every attempt failed.
+    """
+    breed_members: BreedMembers | Failure = request_breeder_details(breeder)
+    if isinstance(breed_members, Failure):
+        return breed_members
+    staging.write(details_rows(breed_members))
+    return None
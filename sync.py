@@ -0,0 +1,195 @@
+import sqlite3
+import hashlib
+import json
+import time
+from models import *
+
+# the listing fields a breeder's fingerprint is taken over, as returned by GetAllevatori
+LISTING_FIELDS: list[str] = ["title", "owner", "area_region", "breeds"]
+
+def listing_record(breeder: Breeder) -> dict:
+    """
+    Returns the fields of a breeder that come from its GetAllevatori listing, in a canonical form.
+
+    Args:
+        breeder (Breeder): The breeder as listed.
+
+    Returns:
+        dict: The listing fields keyed by name, with the breed codes sorted.
+    """
+    return {"title": breeder.title, "owner": breeder.owner, "area_region": breeder.area_region,
+            "breeds": sorted(breeder.breeds)}
+
+def fingerprint(breeder: Breeder) -> str:
+    """
+    Returns a digest of a breeder's listing record, which changes whenever any of its listed fields does.
+
+    Args:
+        breeder (Breeder): The breeder as listed.
+
+    Returns:
+        str: The hex digest.
+    """
+    return hashlib.sha1(json.dumps([breeder.id, listing_record(breeder)], separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def unique_breeders(breeders: list[Breeder]) -> list[Breeder]:
+    """
+    Returns each breeder once, as listed in the area with the smallest region code that lists it. Areas complete in
+    any order, so this keeps a breeder listed in several areas fingerprinted with the same area on every sync, the
+    one the database's readers report too.
+
+    Args:
+        breeders (list[Breeder]): Every breeder in the listing, once per area that lists it.
+
+    Returns:
+        list[Breeder]: The breeders, in order of first appearance.
+    """
+    unique: dict[str, Breeder] = {}
+    for breeder in breeders:
+        if breeder.id not in unique or breeder.area_region < unique[breeder.id].area_region:
+            unique[breeder.id] = breeder
+    return list(unique.values())
+
+class Changes(object):
+    """
+    The difference between the current listing and the listing stored by the previous sync.
+    """
+    added: list[Breeder]
+    changed: list[tuple[Breeder, list[str]]]
+    stale: list[Breeder]
+    removed: list[str]
+    unchanged: int
+
+    def __init__(self):
+        self.added = []
+        self.changed = []
+        self.stale = []
+        self.removed = []
+        self.unchanged = 0
+
+    @property
+    def to_fetch(self) -> list[Breeder]:
+        """
+        Returns the breeders whose details need requesting.
+        """
+        return self.added+[breeder for breeder, _ in self.changed]+self.stale
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.stale)} stale, "
+                f"{len(self.removed)} removed, {self.unchanged} unchanged")
+
+class SyncState:
+    """
+    The fingerprint of every breeder's listing record as of the last sync, and a log of the changes each sync found.
+    Kept in storage.db next to the scraped tables.
+    """
+    connection: sqlite3.Connection
+    cursor = sqlite3.Cursor
+
+    def __init__(self, path: str = "storage.db"):
+        """
+        Opens the sync state and creates its tables.
+
+        Args:
+            path (str, optional): The sqlite3 database to keep the sync state in. Defaults to "storage.db".
+        """
+        self.connection = sqlite3.connect(path)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS sync_breeders (id TEXT PRIMARY KEY, fingerprint TEXT, listing TEXT, first_seen REAL, last_seen REAL, fetched_at REAL, removed_at REAL)")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS change_log (id INTEGER PRIMARY KEY AUTOINCREMENT, breeder_id TEXT, change TEXT, fields TEXT, changed_at REAL)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS change_log_breeder_id ON change_log(breeder_id)")
+        self.connection.commit()
+
+    def diff(self, breeders: list[Breeder], max_age: float = None, regions: set[str] = None) -> Changes:
+        """
+        Compares the current listing with the stored fingerprints.
+
+        Args:
+            breeders (list[Breeder]): Every breeder in the current listing.
+            max_age (float, optional): The seconds after which an unchanged breeder's details are requested again anyway,
+                as a change of members alone does not show in the listing. Defaults to None, never.
+            regions (set[str], optional): The regions whose listings were retrieved. A breeder last listed in another
+                area is not removed, as its area may have failed to list. Defaults to None, every region.
+
+        Returns:
+            Changes: The added, changed, stale and removed breeders.
+        """
+        stored: dict[str, tuple] = {row[0]: row[1:] for row in
+                                    self.cursor.execute("SELECT id, fingerprint, listing, fetched_at, removed_at FROM sync_breeders")}
+        changes: Changes = Changes()
+        now: float = time.time()
+        listed: set[str] = set()
+        for breeder in unique_breeders(breeders):
+            listed.add(breeder.id)
+            if breeder.id not in stored:
+                changes.added.append(breeder)
+                continue
+            stored_fingerprint, stored_listing, fetched_at, removed_at = stored[breeder.id]
+            if removed_at is not None or fetched_at is None:
+                # a breeder that reappears, or whose details were never stored, is fetched as if new
+                changes.added.append(breeder)
+            elif stored_fingerprint != fingerprint(breeder):
+                previous: dict = json.loads(stored_listing)
+                current: dict = listing_record(breeder)
+                changes.changed.append((breeder, [field for field in LISTING_FIELDS if previous.get(field) != current[field]]))
+            elif max_age is not None and now-fetched_at > max_age:
+                changes.stale.append(breeder)
+            else:
+                changes.unchanged += 1
+        changes.removed = [breeder_id for breeder_id, (_, stored_listing, _, removed_at) in stored.items()
+                           if breeder_id not in listed and removed_at is None
+                           and (regions is None or json.loads(stored_listing)["area_region"] in regions)]
+        return changes
+
+    def record(self, breeders: list[Breeder], changes: Changes, fetched: set[str]) -> None:
+        """
+        Stores the fingerprints of the current listing and logs the changes, in one transaction. Removed breeders
+        are deleted from the scraped tables in the same transaction, along with the members no other breeder has,
+        so that the queries, summary tables and exports stop counting them.
+
+        Args:
+            breeders (list[Breeder]): Every breeder in the current listing.
+            changes (Changes): The changes found by diff.
+            fetched (set[str]): The ids of the breeders whose details were stored by this sync.
+        """
+        now: float = time.time()
+        changed_fields: dict[str, list[str]] = {breeder.id: fields for breeder, fields in changes.changed}
+        self.cursor.execute("BEGIN")
+        try:
+            self.cursor.executemany(
+                "INSERT INTO sync_breeders VALUES (?,?,?,?,?,?,NULL) ON CONFLICT(id) DO UPDATE SET "
+                "fingerprint=excluded.fingerprint, listing=excluded.listing, last_seen=excluded.last_seen, "
+                "fetched_at=COALESCE(excluded.fetched_at, fetched_at), removed_at=NULL",
+                ((breeder.id, fingerprint(breeder), json.dumps(listing_record(breeder)), now, now,
+                  now if breeder.id in fetched else None) for breeder in unique_breeders(breeders)))
+            self.cursor.executemany("UPDATE sync_breeders SET removed_at=? WHERE id=?",
+                                    ((now, breeder_id) for breeder_id in changes.removed))
+            if changes.removed:
+                self.delete_breeders(changes.removed)
+            log: list[tuple] = ([(breeder.id, "added", None, now) for breeder in changes.added]
+                                +[(breeder_id, "changed", json.dumps(fields), now) for breeder_id, fields in changed_fields.items()]
+                                +[(breeder.id, "refreshed", None, now) for breeder in changes.stale]
+                                +[(breeder_id, "removed", None, now) for breeder_id in changes.removed])
+            self.cursor.executemany("INSERT INTO change_log (breeder_id, change, fields, changed_at) VALUES (?,?,?,?)", log)
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+    def delete_breeders(self, breeder_ids: list[str]) -> None:
+        """
+        Deletes breeders from the scraped tables, with their links and the members no other breeder has.
+        Runs inside the caller's transaction.
+
+        Args:
+            breeder_ids (list[str]): The ids of the breeders to delete.
+        """
+        rows: list[tuple[str]] = [(breeder_id,) for breeder_id in breeder_ids]
+        member_ids: set[str] = {row[0] for breeder_id in breeder_ids for row in self.cursor.execute(
+            "SELECT member_id FROM breeders_members WHERE breeder_id=?", (breeder_id,)).fetchall()}
+        for table in ("areas_breeders", "breeders_breeds", "breeders_members"):
+            self.cursor.executemany(f"DELETE FROM {table} WHERE breeder_id=?", rows)
+        self.cursor.executemany("DELETE FROM breeders WHERE id=?", rows)
+        self.cursor.executemany("DELETE FROM members WHERE id=? AND NOT EXISTS (SELECT 1 FROM breeders_members WHERE member_id=?)",
+                                ((member_id, member_id) for member_id in member_ids))
@@ -0,0 +1,16 @@
+from models import *
+
+def listed_breeder(breeder_id: str, region: str, breeds: list[str] = None) -> Breeder:
+    """
+    Returns a breeder as an area's listing holds it, with breed 001 unless breeds are given.
+    """
+    return Breeder(f"Allevamento {breeder_id}", f"Proprietario {breeder_id}", breeder_id, region, breeds or ["001"])
+
+def details(breeder: Breeder) -> tuple[Breeder, BreedMembers]:
+    """
+    Returns the details fetched for a breeder, as the scraper builds them: its breeds, each in group 1, and one
+    member of its own.
+    """
+    members: list[Member] = [Member(f"Socio {breeder.id}", f"m{breeder.id}", True, "Via Roma 1", "Milano", [breeder.id])]
+    breeds: list[Breed] = [Breed(code, f"1{code}", "2020-01-01T00:00:00", f"Razza {code}", "1", "Gruppo 1") for code in breeder.breeds]
+    return breeder, BreedMembers(breeds, members)
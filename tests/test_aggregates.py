@@ -0,0 +1,100 @@
+import os
+import random
+import tempfile
+import unittest
+from aggregates import AGGREGATES, Aggregates
+from database import Database
+from models import *
+from sync import SyncState
+
+AREAS: list[Area] = [Area("Piemonte", "PIE"), Area("Lombardia", "LOM"), Area("Veneto", "VEN")]
+
+class RefreshTests(unittest.TestCase):
+    """
+    Checks on random data that refreshing the summary tables after upserts and deletes gives the same counts as
+    computing them from scratch.
+    """
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "storage.db")
+        self.db: Database = Database(self.path)
+        self.aggregates: Aggregates = Aggregates(self.db)
+        self.random: random.Random = random.Random(0)
+
+    def tearDown(self) -> None:
+        self.db.connection.close()
+        self.directory.cleanup()
+
+    def breed(self, code: str) -> Breed:
+        # the group and the year of the last litter change from draw to draw
+        year: int = self.random.choice([2019, 2020, 2021])
+        last_litter: str = self.random.choice([f"{year}-05-01T00:00:00", None])
+        group: str = str(self.random.randint(1, 4))
+        return Breed(code, f"1{code}", last_litter, f"Razza {code}", group, f"Gruppo {group}")
+
+    def fetch(self, breeder_id: str) -> tuple[Breeder, BreedMembers]:
+        # members are drawn from a small pool, so that many are shared by several breeders
+        breeds: list[Breed] = [self.breed(f"{code:03d}") for code in self.random.sample(range(12), self.random.randint(0, 3))]
+        members: list[Member] = [Member(f"Socio {member_id}", f"m{member_id}", True, "Via Roma 1", "Milano")
+                                 for member_id in self.random.sample(range(40), self.random.randint(0, 3))]
+        breeder: Breeder = Breeder(f"Allevamento {breeder_id}", f"Proprietario {breeder_id}", breeder_id,
+                                   self.random.choice(AREAS).region, [breed.code for breed in breeds])
+        return breeder, BreedMembers(breeds, members)
+
+    def listing(self, breeders: list[Breeder]) -> list[tuple[Area, list[Breeder]]]:
+        # a breeder is listed in its own area, and sometimes in a second one
+        listed: dict[str, list[Breeder]] = {area.region: [] for area in AREAS}
+        for breeder in breeders:
+            listed[breeder.area_region].append(breeder)
+            if self.random.random() < 0.2:
+                other: str = self.random.choice(AREAS).region
+                if other != breeder.area_region:
+                    listed[other].append(Breeder(breeder.title, breeder.owner, breeder.id, other, breeder.breeds))
+        return [(area, listed[area.region]) for area in AREAS]
+
+    def summaries(self) -> dict[str, dict[str, int]]:
+        return {name: self.aggregates.counts(name) for name in AGGREGATES}
+
+    def assertRefreshMatchesCompute(self) -> None:
+        self.aggregates.refresh()
+        refreshed: dict[str, dict[str, int]] = self.summaries()
+        self.aggregates.compute()
+        self.assertEqual(refreshed, self.summaries())
+
+    def test_refresh_matches_compute(self) -> None:
+        fetched: dict[str, tuple[Breeder, BreedMembers]] = dict((str(index), self.fetch(str(index))) for index in range(60))
+        self.db.upsert_breeders(self.listing([breeder for breeder, _ in fetched.values()]), list(fetched.values()))
+        self.aggregates.compute()
+        # the sync state knows every stored breeder, so that it deletes the ones no longer listed
+        state: SyncState = SyncState(self.path)
+        breeders: list[Breeder] = [breeder for breeder, _ in fetched.values()]
+        state.record(breeders, state.diff(breeders), set(fetched))
+        for round in range(10):
+            with self.subTest(round=round):
+                # some breeders are fetched again with other breeds and members, and a few new ones are added
+                updated: list[str] = self.random.sample(sorted(fetched), 15)+[f"{round}-{index}" for index in range(3)]
+                for breeder_id in updated:
+                    fetched[breeder_id] = self.fetch(breeder_id)
+                breeders = [breeder for breeder, _ in fetched.values()]
+                self.db.upsert_breeders(self.listing(breeders), [fetched[breeder_id] for breeder_id in updated])
+                state.record(breeders, state.diff(breeders), set(updated))
+                self.assertRefreshMatchesCompute()
+                # and a few are no longer listed, so the sync deletes them
+                for breeder_id in self.random.sample(sorted(fetched), 4):
+                    del fetched[breeder_id]
+                breeders = [breeder for breeder, _ in fetched.values()]
+                changes = state.diff(breeders)
+                state.record(breeders, changes, set())
+                self.assertEqual(len(changes.removed), 4)
+                self.assertRefreshMatchesCompute()
+        state.connection.close()
+
+    def test_refresh_without_compute_computes(self) -> None:
+        breeder, breed_members = self.fetch("1")
+        self.db.upsert_breeders([(AREAS[0], [breeder])], [(breeder, breed_members)])
+        self.aggregates.refresh()
+        self.assertTrue(self.aggregates.is_tracking())
+        self.assertEqual(self.aggregates.lookup("region_breeders", "PIE"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
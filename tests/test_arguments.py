@@ -0,0 +1,39 @@
+import contextlib
+import io
+import sys
+import unittest
+from unittest import mock
+from main import parse_arguments
+
+def parse(*options: str):
+    with mock.patch.object(sys, "argv", ["main.py", *options]):
+        return parse_arguments()
+
+class ArgumentTests(unittest.TestCase):
+    def assertRejected(self, *options: str) -> None:
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            parse(*options)
+
+    def test_modes_are_exclusive(self) -> None:
+        self.assertRejected("--stream", "--staged")
+        self.assertRejected("--sync", "--retry-dead")
+        self.assertRejected("--queue", "--region", "LOM")
+
+    def test_unsupported_modifiers(self) -> None:
+        self.assertRejected("--staged", "--resume")
+        self.assertRejected("--staged", "--pipeline")
+        self.assertRejected("--sync", "--pipeline")
+        self.assertRejected("--breeder", "1", "--resume")
+
+    def test_dependent_options(self) -> None:
+        self.assertRejected("--sync-max-age", "7")
+        self.assertRejected("--queue-role", "work")
+
+    def test_supported_combinations(self) -> None:
+        self.assertTrue(parse("--stream", "--pipeline", "--resume").stream)
+        self.assertTrue(parse("--sync", "--resume", "--sync-max-age", "7").sync)
+        self.assertEqual(parse("--region", "LOM", "--breeder", "1").breeder, ["1"])
+        self.assertTrue(parse("--pipeline", "--resume").pipeline)
+
+if __name__ == "__main__":
+    unittest.main()
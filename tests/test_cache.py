@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import requests
+import cache
+from cache import CacheMissError, ResponseCache, configure_cache
+from session import send
+
+class ValidatingHandler(BaseHTTPRequestHandler):
+    """
+    Serves a fixed body at /etag with an ETag, at /modified with a Last-Modified date and at /plain with neither,
+    answering 304 to matching validators, and logs every request it receives.
+    """
+    protocol_version = "HTTP/1.1"
+    ETAG: str = '"v1"'
+    LAST_MODIFIED: str = "Wed, 01 Jan 2025 00:00:00 GMT"
+    requests: list[tuple[str, int]]
+
+    def do_GET(self) -> None:
+        headers: dict[str, str] = {"/etag": {"ETag": self.ETAG}, "/modified": {"Last-Modified": self.LAST_MODIFIED}}.get(self.path, {})
+        unchanged: bool = (("ETag" in headers and self.headers.get("If-None-Match") == self.ETAG) or
+                           ("Last-Modified" in headers and self.headers.get("If-Modified-Since") == self.LAST_MODIFIED))
+        status: int = 304 if unchanged else 200
+        body: bytes = b"" if unchanged else f"body of {self.path}".encode("utf-8")
+        self.requests.append((self.path, status))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+class FakeClock(object):
+    """
+    Stands in for the time module in cache, so that every call is a second later than the last.
+    """
+    def __init__(self):
+        self.now = 1000.0
+    def time(self) -> float:
+        self.now += 1.0
+        return self.now
+
+class RevalidationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.handler: type = type("Handler", (ValidatingHandler,), {"requests": []})
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url: str = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.cache: ResponseCache = ResponseCache(os.path.join(self.directory.name, "cache.db"), ttl={"test": 3600.0})
+        configure_cache(self.cache)
+
+    def tearDown(self) -> None:
+        configure_cache(None)
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def get(self, path: str) -> bytes:
+        return send("test", "GET", self.base_url+path).content
+
+    def expire(self) -> None:
+        # every cached response was fetched two hours ago, past the hour it stays fresh
+        self.cache.connection().execute("UPDATE responses SET fetched_at=fetched_at-7200")
+        self.cache.connection().commit()
+
+    def test_fresh_responses_are_served_from_the_cache(self) -> None:
+        self.assertEqual(self.get("/plain"), b"body of /plain")
+        self.assertEqual(self.get("/plain"), b"body of /plain")
+        self.assertEqual(self.handler.requests, [("/plain", 200)])
+
+    def test_expired_responses_are_requested_again(self) -> None:
+        self.get("/plain")
+        self.expire()
+        self.assertEqual(self.get("/plain"), b"body of /plain")
+        self.assertEqual(self.handler.requests, [("/plain", 200), ("/plain", 200)])
+
+    def test_etag_revalidation(self) -> None:
+        self.get("/etag")
+        self.expire()
+        self.assertEqual(self.get("/etag"), b"body of /etag")
+        # the 304 made the copy fresh again
+        self.assertEqual(self.get("/etag"), b"body of /etag")
+        self.assertEqual(self.handler.requests, [("/etag", 200), ("/etag", 304)])
+
+    def test_last_modified_revalidation(self) -> None:
+        self.get("/modified")
+        self.expire()
+        self.assertEqual(self.get("/modified"), b"body of /modified")
+        self.assertEqual(self.handler.requests, [("/modified", 200), ("/modified", 304)])
+
+    def test_offline_serves_stale_responses(self) -> None:
+        self.get("/etag")
+        self.expire()
+        self.cache.offline = True
+        self.assertEqual(self.get("/etag"), b"body of /etag")
+        self.assertEqual(self.handler.requests, [("/etag", 200)])
+
+    def test_offline_miss(self) -> None:
+        self.cache.offline = True
+        with self.assertRaises(CacheMissError):
+            self.get("/plain")
+        self.assertEqual(self.handler.requests, [])
+
+class EvictionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.clock = mock.patch.object(cache, "time", FakeClock())
+        self.clock.start()
+
+    def tearDown(self) -> None:
+        self.clock.stop()
+        self.directory.cleanup()
+
+    def response(self) -> requests.Response:
+        # random bytes do not compress, so every stored body is about 1000 bytes
+        response: requests.Response = requests.Response()
+        response.status_code = 200
+        response._content = os.urandom(1000)
+        return response
+
+    def stored(self, response_cache: ResponseCache) -> list[str]:
+        return [key for key, in response_cache.connection().execute("SELECT key FROM responses ORDER BY key")]
+
+    def test_least_recently_used_are_evicted(self) -> None:
+        response_cache: ResponseCache = ResponseCache(os.path.join(self.directory.name, "cache.db"), max_size=4500)
+        for key in "abcd":
+            response_cache.put(key, "test", self.response())
+        # reading a makes b the least recently used
+        self.assertIsNotNone(response_cache.get("a"))
+        response_cache.put("e", "test", self.response())
+        # 5 responses are over the limit, so the least recently used is evicted to get under 90% of it
+        self.assertEqual(self.stored(response_cache), ["a", "c", "d", "e"])
+        self.assertLessEqual(response_cache._size, 4500*0.9)
+
+    def test_size_is_counted_across_connections(self) -> None:
+        path: str = os.path.join(self.directory.name, "cache.db")
+        first: ResponseCache = ResponseCache(path, max_size=10**6)
+        for key in "abcd":
+            first.put(key, "test", self.response())
+        # a cache opened on the same file, as by the next run or another worker, starts from the stored size
+        second: ResponseCache = ResponseCache(path, max_size=2500)
+        second.put("e", "test", self.response())
+        self.assertEqual(self.stored(second), ["d", "e"])
+
+if __name__ == "__main__":
+    unittest.main()
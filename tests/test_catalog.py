@@ -0,0 +1,56 @@
+import os
+import socket
+import tempfile
+import unittest
+import cache
+import scraper
+from cache import ResponseCache, configure_cache
+from catalog import RegionCatalog
+from fake_server import FakeEnciServer
+
+class RegionCatalogTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.fake: FakeEnciServer = FakeEnciServer(regions=3)
+        self.base_url: str = scraper.BASE_URL
+        scraper.BASE_URL = self.fake.start()
+        # every copy is stale at once, so each call revalidates
+        self.catalog: RegionCatalog = RegionCatalog(os.path.join(self.directory.name, "regions.json"), max_age=-1)
+
+    def tearDown(self) -> None:
+        configure_cache(None)
+        scraper.BASE_URL = self.base_url
+        self.fake.stop()
+        self.directory.cleanup()
+
+    def regions(self) -> list[str]:
+        return [area.region for area in self.catalog.areas()]
+
+    def test_revalidated_304_is_not_served_from_the_cache(self) -> None:
+        self.assertEqual(self.regions(), ["PIE", "VDA", "LOM"])
+        configure_cache(ResponseCache(os.path.join(self.directory.name, "cache.db"), ttl={"allevatori-con-affisso": 3600}))
+        # the catalog's own validators get a 304, which must not be cached as the page
+        self.assertEqual(self.regions(), ["PIE", "VDA", "LOM"])
+        os.remove(self.catalog.path)
+        self.assertEqual(self.regions(), ["PIE", "VDA", "LOM"])
+
+    def test_stale_copy_is_used_when_the_website_is_unreachable(self) -> None:
+        self.regions()
+        # a port nothing listens on, as the pooled connection to the stand-in server would outlive stopping it
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            scraper.BASE_URL = f"http://127.0.0.1:{closed.getsockname()[1]}"
+        self.assertEqual(self.regions(), ["PIE", "VDA", "LOM"])
+
+    def test_stale_copy_is_used_offline(self) -> None:
+        self.regions()
+        configure_cache(ResponseCache(os.path.join(self.directory.name, "cache.db"), offline=True))
+        self.assertEqual(self.regions(), ["PIE", "VDA", "LOM"])
+
+    def test_missing_copy_offline_raises(self) -> None:
+        configure_cache(ResponseCache(os.path.join(self.directory.name, "cache.db"), offline=True))
+        with self.assertRaises(cache.CacheMissError):
+            self.regions()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from database import Database
+from models import *
+from helpers import details, listed_breeder
+
+LOMBARDIA: Area = Area("Lombardia", "LOM")
+PIEMONTE: Area = Area("Piemonte", "PIE")
+
+class UpsertBreedersTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.db: Database = Database(os.path.join(self.directory.name, "storage.db"))
+        # breeder 7 is listed in both areas, breeder 8 in Lombardia only
+        self.db.upsert_breeders([(LOMBARDIA, [listed_breeder("7", "LOM"), listed_breeder("8", "LOM")]),
+                                 (PIEMONTE, [listed_breeder("7", "PIE")])],
+                                [details(listed_breeder("7", "LOM")), details(listed_breeder("8", "LOM"))])
+
+    def tearDown(self) -> None:
+        self.db.connection.close()
+        self.directory.cleanup()
+
+    def links(self) -> list[tuple]:
+        return self.db.cursor.execute("SELECT area_region, breeder_id FROM areas_breeders ORDER BY 1, 2").fetchall()
+
+    def test_every_listed_area_is_linked(self) -> None:
+        self.assertEqual(self.links(), [("LOM", "7"), ("LOM", "8"), ("PIE", "7")])
+
+    def test_areas_not_listed_again_keep_their_links(self) -> None:
+        self.db.upsert_breeders([(LOMBARDIA, [listed_breeder("7", "LOM"), listed_breeder("8", "LOM")])],
+                                [details(listed_breeder("7", "LOM"))])
+        self.assertEqual(self.links(), [("LOM", "7"), ("LOM", "8"), ("PIE", "7")])
+
+    def test_breeders_without_a_listing_keep_their_links(self) -> None:
+        self.db.upsert_breeders([], [details(listed_breeder("7", "LOM"))])
+        self.assertEqual(self.links(), [("LOM", "7"), ("LOM", "8"), ("PIE", "7")])
+
+    def test_breeders_no_longer_listed_lose_the_area(self) -> None:
+        self.db.upsert_breeders([(PIEMONTE, [listed_breeder("8", "PIE")])], [details(listed_breeder("8", "PIE"))])
+        self.assertEqual(self.links(), [("LOM", "7"), ("LOM", "8"), ("PIE", "8")])
+
+    def test_breeders_never_stored_are_not_linked(self) -> None:
+        self.db.upsert_breeders([(PIEMONTE, [listed_breeder("7", "PIE"), listed_breeder("9", "PIE")])], [])
+        self.assertEqual(self.links(), [("LOM", "7"), ("LOM", "8"), ("PIE", "7")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from engine import PoolBackend, Scheduler, ThreadBackend, run_task
+
+def square(value: int) -> int:
+    return value*value
+
+def failing_arguments():
+    yield (1,)
+    yield (2,)
+    raise ValueError("no more arguments")
+
+class BackendTests(object):
+    """
+    The checks every backend must pass, mixed into a TestCase per backend.
+    """
+    backend_type: type
+
+    def setUp(self) -> None:
+        self.backend = self.backend_type(4)
+
+    def tearDown(self) -> None:
+        self.backend.close()
+
+    def test_starmap(self) -> None:
+        self.assertEqual(self.backend.starmap(square, [(value,) for value in range(50)]), [value*value for value in range(50)])
+
+    def test_as_completed(self) -> None:
+        results: list[tuple[int, int]] = list(self.backend.as_completed(square, [(value,) for value in range(50)]))
+        self.assertEqual(sorted(results), [(value, value*value) for value in range(50)])
+
+    def test_as_completed_empty(self) -> None:
+        self.assertEqual(list(self.backend.as_completed(square, [])), [])
+
+    def test_as_completed_with_scheduler(self) -> None:
+        scheduler: Scheduler = Scheduler(window=2)
+        for value in range(10):
+            scheduler.submit(value, value, square, (value,))
+        scheduler.close()
+        keys: list[int] = [scheduler.complete(index) for index, _ in self.backend.as_completed(run_task, scheduler.tasks())]
+        self.assertEqual(sorted(keys), list(range(10)))
+
+class ThreadBackendTests(BackendTests, unittest.TestCase):
+    backend_type = ThreadBackend
+
+    def test_failing_arguments_are_raised(self) -> None:
+        # consumed in a thread, so that a hang fails the test instead of blocking it
+        raised: list[BaseException] = []
+        def consume() -> None:
+            try:
+                list(self.backend.as_completed(square, failing_arguments()))
+            except ValueError as error:
+                raised.append(error)
+        thread: threading.Thread = threading.Thread(target=consume, daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "as_completed blocked after its arguments failed")
+        self.assertEqual([str(error) for error in raised], ["no more arguments"])
+
+class PoolBackendTests(BackendTests, unittest.TestCase):
+    backend_type = PoolBackend
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import csv
+import os
+import tempfile
+import unittest
+from database import Database
+from exporter import Exporter, stop_tracking
+
+class IncrementalExportTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.db: Database = Database(os.path.join(self.directory.name, "storage.db"))
+        self.db.cursor.executemany("INSERT INTO breeders VALUES (?,?,?)", [("Allevamento 1", "Proprietario 1", "1"),
+                                                                           ("Allevamento 2", "Proprietario 2", "2")])
+        self.db.connection.commit()
+        self.exporter: Exporter = Exporter(self.db, os.path.join(self.directory.name, "exports"))
+
+    def tearDown(self) -> None:
+        self.db.connection.close()
+        self.directory.cleanup()
+
+    def read(self, path: str) -> list[list[str]]:
+        with open(path, newline="", encoding="utf-8") as file:
+            return list(csv.reader(file))
+
+    def test_first_incremental_export_after_a_full_one_is_full(self) -> None:
+        self.exporter.export("breeders")
+        self.db.cursor.execute("UPDATE breeders SET title='Allevamento rinominato' WHERE id='1'")
+        self.db.connection.commit()
+        path, rows = self.exporter.export("breeders", incremental=True)
+        self.assertEqual((os.path.basename(path), rows), ("breeders.csv", 2))
+        self.assertIn(["Allevamento rinominato", "Proprietario 1", "1"], self.read(path))
+
+    def test_changes_are_exported(self) -> None:
+        self.exporter.export("breeders", incremental=True)
+        self.db.cursor.execute("UPDATE breeders SET title='Allevamento rinominato' WHERE id='1'")
+        self.db.cursor.execute("DELETE FROM breeders WHERE id='2'")
+        self.db.connection.commit()
+        path, rows = self.exporter.export("breeders", incremental=True)
+        self.assertEqual(rows, 2)
+        self.assertEqual(self.read(path), [["title", "owner", "id", "deleted"], ["Allevamento rinominato", "Proprietario 1", "1", "0"],
+                                           ["", "", "2", "1"]])
+
+    def test_full_loads_are_not_recorded(self) -> None:
+        self.exporter.export("breeders", incremental=True)
+        stop_tracking(self.db)
+        self.db.bulk_load({"breeders": ((f"Allevamento {index}", f"Proprietario {index}", str(index)) for index in range(3, 1000))})
+        self.assertFalse(self.exporter.is_tracking())
+        self.assertEqual(self.db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'export_%' AND name != 'export_state'").fetchone()[0], 0)
+        path, rows = self.exporter.export("breeders", incremental=True)
+        self.assertEqual((os.path.basename(path), rows), ("breeders.csv", 999))
+
+    def test_no_changes_still_writes_the_header(self) -> None:
+        self.exporter.export("breeders", incremental=True)
+        path, rows = self.exporter.export("breeders", incremental=True)
+        self.assertEqual((rows, self.read(path)), (0, [["title", "owner", "id", "deleted"]]))
+
+if __name__ == "__main__":
+    unittest.main()
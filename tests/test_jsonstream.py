@@ -0,0 +1,54 @@
+import json
+import unittest
+import jsonstream
+
+# a GetAllevatori listing as the website sends it, with nested arrays, non-ASCII text and a float
+LISTING: list[dict] = [{"IdAffisso": str(breeder_id), "DesAffisso": f"Allevamento dell'Àquila {breeder_id}",
+                        "Razze": ["001", "042"], "Punteggio": breeder_id/4} for breeder_id in range(1, 200)]
+MALFORMED: list[bytes] = [b"", b"   ", b'{"IdAffisso": "1"}', b'[{"IdAffisso": "1"}', b'[{"IdAffisso": }]', b"[1,",
+                         b"[,1,2]", b"[1,,2]", b"[1 2]", b"[1,2,]", b"[,]", b'[{"IdAffisso": "1"} {"IdAffisso": "2"}]']
+
+class IterArrayTests(object):
+    """
+    The checks iter_array must pass with every decoder, mixed into a TestCase per decoder.
+    """
+    decoder = None
+
+    def setUp(self) -> None:
+        self.installed = jsonstream.ijson
+        jsonstream.ijson = self.decoder
+
+    def tearDown(self) -> None:
+        jsonstream.ijson = self.installed
+
+    def test_elements(self) -> None:
+        content: bytes = json.dumps(LISTING, ensure_ascii=False).encode("utf-8")
+        self.assertEqual(list(jsonstream.iter_array(content, chunk_size=97)), LISTING)
+
+    def test_whitespace(self) -> None:
+        content: bytes = json.dumps(LISTING, indent=2).encode("utf-8")
+        self.assertEqual(list(jsonstream.iter_array(b"\n "+content+b"\n", chunk_size=64)), LISTING)
+
+    def test_numbers_split_between_chunks(self) -> None:
+        content: bytes = b"[1, 22, -333, 4.5, 6e-7, true, 8.25E+3]"
+        for chunk_size in range(1, len(content)+1):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(jsonstream.iter_array(content, chunk_size=chunk_size)), json.loads(content))
+
+    def test_empty_array(self) -> None:
+        self.assertEqual(list(jsonstream.iter_array(b" [ ] ")), [])
+
+    def test_malformed(self) -> None:
+        for content in MALFORMED:
+            with self.subTest(content=content), self.assertRaises(json.JSONDecodeError):
+                list(jsonstream.iter_array(content, chunk_size=4))
+
+class JsonIterArrayTests(IterArrayTests, unittest.TestCase):
+    decoder = None
+
+@unittest.skipIf(jsonstream.ijson is None, "ijson is not installed")
+class IjsonIterArrayTests(IterArrayTests, unittest.TestCase):
+    decoder = jsonstream.ijson
+
+if __name__ == "__main__":
+    unittest.main()
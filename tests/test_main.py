@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from fake_server import FakeEnciServer
+
+MAIN: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+class DeadLetterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.fake: FakeEnciServer = FakeEnciServer(regions=1, breeders_per_region=5)
+        self.base_url: str = self.fake.start()
+
+    def tearDown(self) -> None:
+        self.fake.stop()
+        self.directory.cleanup()
+
+    def run_main(self, *options: str) -> None:
+        # every detail request fails at once while the server's error rate is 1
+        subprocess.run([sys.executable, MAIN, "--backend", "thread", "--details-rate", "0", "--retry-attempts", "1", *options],
+                       cwd=self.directory.name, env={**os.environ, "ENCI_BASE_URL": self.base_url},
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120)
+
+    def dead_letters(self) -> list[tuple[str, str]]:
+        with sqlite3.connect(os.path.join(self.directory.name, "storage.db")) as connection:
+            return connection.execute("SELECT kind, key FROM dead_letters ORDER BY kind, key").fetchall()
+
+    def test_refreshed_breeder_leaves_the_dead_letters(self) -> None:
+        self.run_main()
+        self.fake.error_rate = 1.0
+        self.run_main("--breeder", "5")
+        self.assertEqual(self.dead_letters(), [("details", "5")])
+        self.fake.error_rate = 0.0
+        self.run_main("--breeder", "5")
+        self.assertEqual(self.dead_letters(), [])
+
+    def test_synced_breeders_leave_the_dead_letters(self) -> None:
+        self.run_main("--sync")
+        self.fake.error_rate = 1.0
+        self.run_main("--sync", "--sync-max-age", "0")
+        self.assertEqual(len(self.dead_letters()), 5)
+        self.fake.error_rate = 0.0
+        self.run_main("--sync", "--sync-max-age", "0")
+        self.assertEqual(self.dead_letters(), [])
+
+    def test_resumed_run_resolves_the_dead_letters(self) -> None:
+        self.fake.error_rate = 1.0
+        self.run_main()
+        self.assertEqual(self.dead_letters(), [("details", str(breeder_id)) for breeder_id in range(1, 6)])
+        self.fake.error_rate = 0.0
+        self.run_main("--resume")
+        self.assertEqual(self.dead_letters(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from database import Database
+from models import *
+
+LOMBARDIA: Area = Area("Lombardia", "LOM")
+PIEMONTE: Area = Area("Piemonte", "PIE")
+LABRADOR: Breed = Breed("001", "1001", "2021-03-01T00:00:00", "Labrador Retriever", "8", "Cani da riporto")
+BRACCO: Breed = Breed("042", "1042", None, "Bracco Italiano", "7", "Cani da ferma")
+
+class QueryTests(object):
+    """
+    The checks the read methods must pass with and without FTS5, mixed into a TestCase per search mode.
+    """
+    fts: bool
+
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.db: Database = Database(os.path.join(self.directory.name, "storage.db"))
+        if not self.fts:
+            self.db.has_fts = False
+        lake: Breeder = Breeder("Allevamento del Lago", "Mario Rossi", "1", "LOM", ["001", "042"])
+        hill: Breeder = Breeder("Della Collina", "Giulia Bianchi", "2", "LOM", ["042"])
+        house: Breeder = Breeder("Casa Rossini", "Luca Verdi", "3", "PIE", ["001"])
+        mario: Member = Member("Mario Rossi", "m1", True, "Via Roma 1", "Milano")
+        anna: Member = Member("Anna Neri", "m2", False, "Corso Francia 10", "Torino")
+        giulia: Member = Member("Giulia Bianchi", "m3", True, "Via Dante 5", "milano")
+        # breeder 2 is listed in Piemonte as well
+        self.db.upsert_breeders([(LOMBARDIA, [lake, hill]), (PIEMONTE, [house, Breeder(hill.title, hill.owner, "2", "PIE")])],
+                                [(lake, BreedMembers([LABRADOR, BRACCO], [mario])),
+                                 (hill, BreedMembers([BRACCO], [mario, giulia])),
+                                 (house, BreedMembers([LABRADOR], [anna]))])
+        self.db.create_indexes()
+
+    def tearDown(self) -> None:
+        self.db.connection.close()
+        self.directory.cleanup()
+
+    def ids(self, entities: list) -> list[str]:
+        return sorted(entity.id for entity in entities)
+
+    def test_breeders_with_breed(self) -> None:
+        breeders: list[Breeder] = self.db.breeders_with_breed("042")
+        self.assertEqual(self.ids(breeders), ["1", "2"])
+        self.assertEqual((breeders[0].area_region, breeders[0].breeds, breeders[0].members), ("LOM", ["001", "042"], ["m1"]))
+        self.assertEqual(self.db.breeders_with_breed("999"), [])
+
+    def test_breeders_in_region(self) -> None:
+        breeders: list[tuple[Breeder, list[Breed]]] = self.db.breeders_in_region("PIE")
+        self.assertEqual([(breeder.id, [breed.description for breed in breeds]) for breeder, breeds in breeders],
+                         [("2", ["Bracco Italiano"]), ("3", ["Labrador Retriever"])])
+        self.assertIsNone(breeders[0][1][0].last_litter)
+
+    def test_members_in_town(self) -> None:
+        members: list[Member] = self.db.members_in_town("MILANO")
+        self.assertEqual(self.ids(members), ["m1", "m3"])
+        self.assertEqual((members[0].signatory, members[0].breeder_ids), (True, ["1", "2"]))
+        self.assertFalse(self.db.members_in_town("Torino")[0].signatory)
+
+    def test_members_of_breeder(self) -> None:
+        self.assertEqual(self.ids(self.db.members_of_breeder("2")), ["m1", "m3"])
+        self.assertEqual(self.db.members_of_breeder("9"), [])
+
+    def test_search_breeders(self) -> None:
+        self.assertEqual(self.ids(self.db.search_breeders("lago")), ["1"])
+        # every word must match, in any of the indexed columns
+        self.assertEqual(self.ids(self.db.search_breeders("allevamento rossi")), ["1"])
+        self.assertEqual(self.db.search_breeders("collina rossi"), [])
+        self.assertEqual(self.ids(self.db.search_breeders("Ross*")), ["1", "3"])
+
+    def test_search_members(self) -> None:
+        self.assertEqual(self.ids(self.db.search_members("milano")), ["m1", "m3"])
+        self.assertEqual(self.ids(self.db.search_members("via milano")), ["m1", "m3"])
+        self.assertEqual(self.ids(self.db.search_members("Bian* dante")), ["m3"])
+        self.assertEqual(self.ids(self.db.search_members("tor*")), ["m2"])
+
+    def test_search_limit(self) -> None:
+        self.assertEqual(len(self.db.search_members("milano", limit=1)), 1)
+
+    def test_search_syntax_is_not_a_query(self) -> None:
+        self.assertEqual(self.db.search_breeders('"'), [])
+        self.assertEqual(self.db.search_breeders("*"), [])
+        self.assertEqual(self.db.search_breeders("lago OR"), [])
+
+@unittest.skipUnless(Database(":memory:").has_fts, "the sqlite3 library has no FTS5")
+class FullTextQueryTests(QueryTests, unittest.TestCase):
+    fts = True
+
+    def test_words_match_whole(self) -> None:
+        # without a *, a word matches whole words only
+        self.assertEqual(self.ids(self.db.search_breeders("rossi")), ["1"])
+
+class LikeQueryTests(QueryTests, unittest.TestCase):
+    fts = False
+
+    def test_search_indexes_are_not_created(self) -> None:
+        self.assertEqual(self.db.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%_search'").fetchone()[0], 0)
+
+if __name__ == "__main__":
+    unittest.main()
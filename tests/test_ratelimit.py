@@ -0,0 +1,106 @@
+import multiprocessing
+import unittest
+from email.utils import formatdate
+from unittest import mock
+import requests
+import ratelimit
+from fake_server import FakeEnciServer
+from ratelimit import DEFAULT_RETRY_AFTER, RateLimiter, configure_limiters, parse_retry_after
+from session import send
+
+class FakeClock(object):
+    """
+    Stands in for the time module in ratelimit: sleeping moves the clock forward at once, and every sleep is logged.
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+    def monotonic(self) -> float:
+        return self.now
+    def time(self) -> float:
+        return self.now
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def pause_limiter(limiter: RateLimiter, seconds: float) -> None:
+    limiter.pause(seconds)
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock: FakeClock = FakeClock()
+        self.patch = mock.patch.object(ratelimit, "time", self.clock)
+        self.patch.start()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+
+    def acquire_times(self, limiter: RateLimiter, count: int) -> list[float]:
+        times: list[float] = []
+        for _ in range(count):
+            limiter.acquire()
+            times.append(self.clock.now-1000.0)
+        return times
+
+    def test_burst_then_rate(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0, burst=4)
+        self.assertEqual(self.acquire_times(limiter, 8), [0.0, 0.0, 0.0, 0.0, 0.5, 1.0, 1.5, 2.0])
+
+    def test_idle_bucket_refills_up_to_the_burst(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0, burst=3)
+        self.acquire_times(limiter, 3)
+        self.clock.now += 100.0
+        self.assertEqual(self.acquire_times(limiter, 5), [100.0, 100.0, 100.0, 100.5, 101.0])
+
+    def test_acquire_returns_the_wait(self) -> None:
+        limiter: RateLimiter = RateLimiter(4.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.25)
+
+    def test_pause_empties_the_bucket(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0, burst=4)
+        limiter.acquire()
+        limiter.pause(3.0)
+        # the pause, then the bucket refills from empty instead of releasing the rest of the burst
+        self.assertEqual(self.acquire_times(limiter, 3), [3.5, 4.0, 4.5])
+
+    def test_pause_keeps_the_longest(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0)
+        limiter.pause(5.0)
+        limiter.pause(1.0)
+        self.assertEqual(self.acquire_times(limiter, 1), [5.5])
+
+    def test_pause_is_shared_with_other_processes(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0, burst=4)
+        # the worker process pauses the bucket it was handed, as one does on a 429
+        process: multiprocessing.Process = multiprocessing.get_context("fork").Process(target=pause_limiter, args=(limiter, 2.0))
+        process.start()
+        process.join(10)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.acquire_times(limiter, 1), [2.5])
+
+    def test_throttled_response_pauses_the_endpoint(self) -> None:
+        limiter: RateLimiter = RateLimiter(2.0, burst=4)
+        configure_limiters({"TakeAllevatore": limiter})
+        with FakeEnciServer(regions=1, breeders_per_region=1, throttle_rate=1.0, retry_after=7) as fake:
+            with self.assertRaises(requests.HTTPError):
+                send("TakeAllevatore", "GET", f"{fake.base_url}/umbraco/enci/AllevatoriApi/TakeAllevatore?idAffisso=1")
+        configure_limiters({})
+        self.assertEqual(self.acquire_times(limiter, 1), [7.5])
+
+class ParseRetryAfterTests(unittest.TestCase):
+    def test_seconds(self) -> None:
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertEqual(parse_retry_after("-3"), 0.0)
+
+    def test_http_date(self) -> None:
+        with mock.patch.object(ratelimit.time, "time", return_value=1_700_000_000.0):
+            self.assertEqual(parse_retry_after(formatdate(1_700_000_030.0, usegmt=True)), 30.0)
+
+    def test_missing_or_invalid(self) -> None:
+        for value in (None, "", "soon"):
+            with self.subTest(value=value):
+                self.assertEqual(parse_retry_after(value), DEFAULT_RETRY_AFTER)
+
+if __name__ == "__main__":
+    unittest.main()
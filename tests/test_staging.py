@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from database import Database
+from staging import details_rows, listing_rows
+from helpers import details, listed_breeder
+
+class MergeStagingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.db: Database = Database(os.path.join(self.directory.name, "storage.db"))
+
+    def tearDown(self) -> None:
+        self.db.connection.close()
+        self.directory.cleanup()
+
+    def stage(self, count: int) -> list[str]:
+        """
+        Writes count staging databases, each holding breeders 10 apart that the next one holds again: staging
+        database i holds breeders i*10 up to i*10+19, all sharing breed 001 and the member of their own id.
+        """
+        paths: list[str] = []
+        for index in range(count):
+            path: str = os.path.join(self.directory.name, f"staging-{index}.db")
+            staging: Database = Database(path)
+            for breeder_id in range(index*10, index*10+20):
+                breeder, breed_members = details(listed_breeder(str(breeder_id), "LOM"))
+                staging.insert_rows(listing_rows([breeder]))
+                staging.insert_rows(details_rows(breed_members))
+            staging.connection.close()
+            paths.append(path)
+        return paths
+
+    def count(self, table: str) -> int:
+        return self.db.cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_more_databases_than_can_be_attached(self) -> None:
+        limit: int = self.db.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        count: int = 2*limit+5
+        self.db.merge_staging(self.stage(count))
+        breeders: int = count*10+10
+        self.assertEqual(self.count("breeders"), breeders)
+        self.assertEqual(self.count("members"), breeders)
+        self.assertEqual(self.count("breeds"), 1)
+        self.assertEqual(self.count("areas_breeders"), breeders)
+        self.assertEqual(self.count("breeders_breeds"), breeders)
+        self.assertEqual(self.count("breeders_members"), breeders)
+        self.assertEqual(self.db.cursor.execute("PRAGMA database_list").fetchall()[1:], [])
+
+    def test_lower_attach_limit(self) -> None:
+        # folding goes several rounds deep when only two databases can be attached at once
+        self.db.connection.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 2)
+        self.db.merge_staging(self.stage(7))
+        self.assertEqual(self.count("breeders"), 80)
+        self.assertEqual(self.count("breeders_members"), 80)
+
+    def test_stored_rows_are_kept(self) -> None:
+        self.db.insert_rows({"breeders": [("Allevamento esistente", "Proprietario esistente", "0")]})
+        self.db.merge_staging(self.stage(2))
+        self.assertEqual(self.count("breeders"), 30)
+        self.assertEqual(self.db.cursor.execute("SELECT title FROM breeders WHERE id='0'").fetchone()[0], "Allevamento esistente")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from database import Database
+from models import *
+from sync import SyncState
+from helpers import listed_breeder
+
+class SyncStateTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.state: SyncState = SyncState(os.path.join(self.directory.name, "storage.db"))
+
+    def tearDown(self) -> None:
+        self.state.connection.close()
+        self.directory.cleanup()
+
+    def sync(self, breeders: list[Breeder]):
+        changes = self.state.diff(breeders)
+        self.state.record(breeders, changes, {breeder.id for breeder in changes.to_fetch})
+        return changes
+
+    def test_breeders_in_several_areas_are_unchanged(self) -> None:
+        in_order: list[Breeder] = [listed_breeder("7", "LOM"), listed_breeder("8", "LOM"), listed_breeder("7", "PIE")]
+        self.sync(in_order)
+        # the same listing again, then with the areas completing in the other order
+        for breeders in (in_order, in_order, in_order[::-1]):
+            changes = self.sync(breeders)
+            self.assertEqual((changes.added, changes.changed, changes.unchanged), ([], [], 2))
+
+    def test_changed_fields(self) -> None:
+        self.sync([listed_breeder("7", "LOM")])
+        renamed: Breeder = listed_breeder("7", "LOM")
+        renamed.title = "Allevamento rinominato"
+        changes = self.sync([renamed])
+        self.assertEqual([(breeder.id, fields) for breeder, fields in changes.changed], [("7", ["title"])])
+
+    def test_removed_breeders_are_deleted(self) -> None:
+        database: Database = Database(os.path.join(self.directory.name, "storage.db"))
+        breeders: list[Breeder] = [listed_breeder("7", "LOM"), listed_breeder("8", "LOM"), listed_breeder("9", "PIE")]
+        # member "shared" belongs to breeders 7 and 8, member "only7" to breeder 7 alone
+        database.upsert_breeders([(Area("Lombardia", "LOM"), breeders[:2]), (Area("Piemonte", "PIE"), breeders[2:])],
+                                 [(breeder, BreedMembers([], [Member("Socio", member_id, False, "", "")
+                                                              for member_id in {"7": ["shared", "only7"]}.get(breeder.id, ["shared"])]))
+                                  for breeder in breeders])
+        self.sync(breeders)
+        # breeder 9's area fails to list, and breeder 7 is no longer listed
+        changes = self.state.diff(breeders[1:2], regions={"LOM"})
+        self.state.record(breeders[1:2], changes, set())
+        self.assertEqual(changes.removed, ["7"])
+        self.assertEqual(database.cursor.execute("SELECT id FROM breeders ORDER BY id").fetchall(), [("8",), ("9",)])
+        self.assertEqual(database.cursor.execute("SELECT id FROM members").fetchall(), [("shared",)])
+        self.assertEqual(database.cursor.execute("SELECT COUNT(*) FROM areas_breeders WHERE breeder_id='7'").fetchone()[0], 0)
+        self.assertEqual(database.cursor.execute("SELECT COUNT(*) FROM breeders_members WHERE breeder_id='7'").fetchone()[0], 0)
+        database.connection.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import signal
+import tempfile
+import time
+import unittest
+from multiprocessing import Process
+from retry import RetryPolicy
+from workqueue import WorkQueue
+
+# the task whose first worker hangs until it is killed, holding the lease
+STUCK: str = "stuck"
+
+def work(queue: WorkQueue, log_path: str) -> None:
+    """
+    Works on the queue until it is drained, logging each task this process acknowledged.
+    """
+    while True:
+        tasks = queue.claim()
+        if not tasks:
+            if queue.is_drained():
+                return
+            time.sleep(0.02)
+            continue
+        for task in tasks:
+            if task.key == STUCK and task.attempts == 1:
+                time.sleep(600)
+            if queue.ack(task, os.getpid()):
+                # each line is one small append, so lines from different processes never interleave
+                with open(log_path, "a") as log:
+                    log.write(f"{task.key}\n")
+
+class WorkQueueTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.log_path: str = os.path.join(self.directory.name, "acks.log")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def run_workers(self, shared: bool, workers: int = 4, tasks: int = 200) -> None:
+        queue: WorkQueue = WorkQueue(os.path.join(self.directory.name, f"queue-{shared}.db"), lease_seconds=1.0, shared=shared)
+        keys: list[str] = [STUCK]+[str(index) for index in range(tasks)]
+        queue.enqueue("details", [(key, {}) for key in keys])
+        processes: list[Process] = [Process(target=work, args=(queue, self.log_path), daemon=True) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        # kill the worker holding the stuck task while its lease runs
+        deadline: float = time.time()+30
+        owner: str = None
+        while owner is None and time.time() < deadline:
+            owner = queue.connection().execute("SELECT lease_owner FROM tasks WHERE key=? AND state='leased'", (STUCK,)).fetchone()
+            time.sleep(0.01)
+        self.assertIsNotNone(owner, "the stuck task was never claimed")
+        killed: int = int(owner[0].rsplit(":", 1)[1])
+        os.kill(killed, signal.SIGKILL)
+        for process in processes:
+            process.join(60)
+            self.assertFalse(process.is_alive())
+        with open(self.log_path) as log:
+            acked: list[str] = log.read().split()
+        self.assertEqual(sorted(acked), sorted(keys))
+        self.assertEqual(queue.counts(), {"details": {"pending": 0, "leased": 0, "done": len(keys), "dead": 0}})
+        attempts, acked_by = queue.connection().execute("SELECT attempts, result FROM tasks WHERE key=?", (STUCK,)).fetchone()
+        self.assertEqual(attempts, 2)
+        self.assertNotEqual(int(acked_by), killed)
+
+    def test_killed_worker_local(self) -> None:
+        self.run_workers(shared=False)
+
+    def test_killed_worker_shared(self) -> None:
+        self.run_workers(shared=True)
+
+    def test_failed_tasks_back_off(self) -> None:
+        queue: WorkQueue = WorkQueue(os.path.join(self.directory.name, "queue.db"), max_attempts=6, retry_delay=1.0, max_retry_delay=5.0)
+        queue.retry_policy = RetryPolicy(6, base_delay=1.0, max_delay=5.0, jitter=False)
+        queue.enqueue("details", [("7", {})])
+        delays: list[float] = []
+        for _ in range(5):
+            # make the task claimable again at once, and record the wait its failure asked for
+            queue.connection().execute("UPDATE tasks SET available_at=0")
+            task = queue.claim()[0]
+            self.assertEqual(queue.fail(task, "HTTP 503"), "pending")
+            delays.append(queue.connection().execute("SELECT available_at-updated_at FROM tasks").fetchone()[0])
+        self.assertEqual([round(delay, 3) for delay in delays], [1.0, 2.0, 4.0, 5.0, 5.0])
+
+    def test_shared_queue_uses_the_rollback_journal(self) -> None:
+        path: str = os.path.join(self.directory.name, "queue.db")
+        local: WorkQueue = WorkQueue(path)
+        local.enqueue("listing", [("LOM", {})])
+        self.assertEqual(local.connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        # the file can only leave WAL once no other connection has it open
+        local.connection().close()
+        queue: WorkQueue = WorkQueue(path, shared=True)
+        self.assertEqual(queue.connection().execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        self.assertEqual(queue.counts()["listing"]["pending"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+import sqlite3
+import json
+import os
+import socket
+import time
+from retry import RetryPolicy
+
+# the states a task moves through: pending -> leased -> done, or back to pending on failure, or dead after max_attempts
+STATES: list[str] = ["pending", "leased", "done", "dead"]
+
+class Task(object):
+    """
+    A task claimed from the work queue.
+    """
+    id: int
+    kind: str
+    key: str
+    payload: object
+    attempts: int
+    def __init__(self, id: int, kind: str, key: str, payload: object, attempts: int):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+    def __str__(self):
+        return f"{self.kind}:{self.key}#{self.id}"
+    def __repr__(self):
+        return Task.__str__(self)
+
+class WorkQueue:
+    """
+    A durable work queue kept in a sqlite3 database, which any number of worker processes, on one host or on several
+    hosts sharing the file, claim tasks from. A claim is a lease: a task whose worker neither acknowledges nor fails it
+    before the lease expires is handed to another worker. A task that has failed max_attempts times is dead-lettered.
+    Tasks are unique per (kind, key), so enqueueing is idempotent.
+    The sqlite3 connection is opened lazily in each process that uses the queue. A queue on one host uses WAL, which
+    lets readers run alongside the writer through memory shared between the processes. Hosts share no memory, so WAL
+    does not work over a network filesystem, and a shared queue uses the rollback journal instead, whose locks the
+    filesystem must support.
+    """
+    path: str
+    lease_seconds: float
+    max_attempts: int
+    retry_delay: float
+    max_retry_delay: float
+    retry_policy: RetryPolicy
+    shared: bool
+
+    def __init__(self, path: str = "queue.db", lease_seconds: float = 60.0, max_attempts: int = 5, retry_delay: float = 1.0,
+                 max_retry_delay: float = 60.0, shared: bool = False):
+        """
+        Initializes the queue settings.
+
+        Args:
+            path (str, optional): The sqlite3 database the queue is kept in. Defaults to "queue.db".
+            lease_seconds (float, optional): The seconds a claimed task stays with its worker. Defaults to 60.0.
+            max_attempts (int, optional): The claims after which a failing task is dead-lettered. Defaults to 5.
+            retry_delay (float, optional): The most seconds a task that failed once waits before it can be claimed again.
+                The wait doubles with every further failure, with full jitter. Defaults to 1.0.
+            max_retry_delay (float, optional): The cap on the wait of a failed task. Defaults to 60.0.
+            shared (bool, optional): Other hosts use the file too, so the rollback journal is used instead of WAL.
+                Defaults to False.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # failed tasks back off like failed requests, so that a failing server is not retried at a fixed rate
+        self.retry_policy = RetryPolicy(max_attempts, base_delay=retry_delay, max_delay=max_retry_delay)
+        self.shared = shared
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self) -> dict:
+        # only the settings are shipped to worker processes, which open their own connection
+        return {"path": self.path, "lease_seconds": self.lease_seconds, "max_attempts": self.max_attempts,
+                "retry_delay": self.retry_delay, "max_retry_delay": self.max_retry_delay, "shared": self.shared}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, creating the task table on first use.
+
+        Raises:
+            sqlite3.OperationalError: If a shared queue is still in WAL mode because another connection has it open.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            # transactions are begun explicitly, so that a claim can take the write lock before reading
+            self._connection = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            journal_mode: str = "delete" if self.shared else "wal"
+            if self._connection.execute(f"PRAGMA journal_mode={journal_mode}").fetchone()[0] != journal_mode:
+                # WAL is kept in the file, and can only be left while no other connection has it open
+                raise sqlite3.OperationalError(f"{self.path} could not be switched to journal_mode={journal_mode}, close the other processes using it first")
+            # a shared queue syncs every commit, as a lost commit on one host could hand a task to two hosts
+            self._connection.execute("PRAGMA synchronous=FULL" if self.shared else "PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, key TEXT, payload TEXT, priority INTEGER, state TEXT, attempts INTEGER, lease_owner TEXT, lease_expires REAL, available_at REAL, result TEXT, error TEXT, updated_at REAL, UNIQUE(kind, key))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_claimable ON tasks(state, priority, available_at)")
+        return self._connection
+
+    def enqueue(self, kind: str, items: list[tuple[str, object]], priority: int = 0) -> int:
+        """
+        Adds tasks, skipping any that are already queued.
+
+        Args:
+            kind (str): The kind of the tasks, e.g. "listing".
+            items (list[tuple[str, object]]): The key and JSON-serialisable payload of each task.
+            priority (int, optional): Tasks with a lower priority value are claimed first. Defaults to 0.
+
+        Returns:
+            int: The amount of tasks added.
+        """
+        connection: sqlite3.Connection = self.connection()
+        now: float = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            before: int = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO tasks (kind, key, payload, priority, state, attempts, available_at, updated_at) "
+                                   "VALUES (?,?,?,?,'pending',0,?,?)",
+                                   ((kind, key, json.dumps(payload), priority, now, now) for key, payload in items))
+            added: int = connection.total_changes-before
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, limit: int = 1) -> list[Task]:
+        """
+        Leases up to limit of the most urgent claimable tasks to this worker: pending tasks that are due, and leased tasks
+        whose lease has expired. Expired tasks that have used up their attempts are dead-lettered instead.
+
+        Args:
+            limit (int, optional): The most tasks to claim. Defaults to 1.
+
+        Returns:
+            list[Task]: The claimed tasks, which may be empty.
+        """
+        connection: sqlite3.Connection = self.connection()
+        now: float = time.time()
+        # the write lock is taken before reading, so two workers can never claim the same task
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("UPDATE tasks SET state='dead', error=COALESCE(error, 'lease expired'), updated_at=? "
+                               "WHERE state='leased' AND lease_expires<? AND attempts>=?", (now, now, self.max_attempts))
+            rows: list[tuple] = connection.execute(
+                "SELECT id, kind, key, payload, attempts FROM tasks "
+                "WHERE (state='pending' AND available_at<=?) OR (state='leased' AND lease_expires<?) "
+                "ORDER BY priority, id LIMIT ?", (now, now, limit)).fetchall()
+            connection.executemany("UPDATE tasks SET state='leased', lease_owner=?, lease_expires=?, attempts=attempts+1, updated_at=? "
+                                   "WHERE id=?", ((self.worker_id, now+self.lease_seconds, now, row[0]) for row in rows))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [Task(task_id, kind, key, json.loads(payload), attempts+1) for task_id, kind, key, payload, attempts in rows]
+
+    def ack(self, task: Task, result: object, follow_ups: dict[str, tuple[list[tuple[str, object]], int]] = None) -> bool:
+        """
+        Marks a task as done with its result, and enqueues the tasks it led to, in one transaction.
+        Nothing is changed if the lease has expired and the task has been claimed by another worker since.
+
+        Args:
+            task (Task): The claimed task.
+            result (object): The JSON-serialisable result of the task.
+            follow_ups (dict[str, tuple[list[tuple[str, object]], int]], optional): The (items, priority) of the tasks
+                to enqueue, keyed by kind. Defaults to None.
+
+        Returns:
+            bool: Whether the task was still leased to this worker.
+        """
+        connection: sqlite3.Connection = self.connection()
+        now: float = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            updated: int = connection.execute("UPDATE tasks SET state='done', result=?, error=NULL, lease_owner=NULL, updated_at=? "
+                                              "WHERE id=? AND state='leased' AND lease_owner=?",
+                                              (json.dumps(result), now, task.id, self.worker_id)).rowcount
+            if updated:
+                for kind, (items, priority) in (follow_ups or {}).items():
+                    connection.executemany("INSERT OR IGNORE INTO tasks (kind, key, payload, priority, state, attempts, available_at, updated_at) "
+                                           "VALUES (?,?,?,?,'pending',0,?,?)",
+                                           ((kind, key, json.dumps(payload), priority, now, now) for key, payload in items))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return bool(updated)
+
+    def fail(self, task: Task, error: str, dead: bool = False) -> str:
+        """
+        Returns a failed task to the queue after the back-off of its attempt, or dead-letters it if it has used up its
+        attempts.
+
+        Args:
+            task (Task): The claimed task.
+            error (str): A description of the failure.
+            dead (bool, optional): Dead-letter the task now, as retrying it cannot help. Defaults to False.
+
+        Returns:
+            str: The state the task was left in, or None if it was no longer leased to this worker.
+        """
+        connection: sqlite3.Connection = self.connection()
+        now: float = time.time()
+        state: str = "dead" if dead or task.attempts >= self.max_attempts else "pending"
+        updated: int = connection.execute("UPDATE tasks SET state=?, error=?, lease_owner=NULL, available_at=?, updated_at=? "
+                                          "WHERE id=? AND state='leased' AND lease_owner=?",
+                                          (state, error, now+self.retry_policy.delay(task.attempts), now, task.id, self.worker_id)).rowcount
+        return state if updated else None
+
+    def requeue_dead(self, kind: str = None) -> int:
+        """
+        Gives dead-lettered tasks a fresh set of attempts.
+
+        Args:
+            kind (str, optional): Only requeue tasks of this kind. Defaults to None, every kind.
+
+        Returns:
+            int: The amount of tasks requeued.
+        """
+        return self.connection().execute("UPDATE tasks SET state='pending', attempts=0, available_at=?, updated_at=? "
+                                         "WHERE state='dead' AND (? IS NULL OR kind=?)",
+                                         (time.time(), time.time(), kind, kind)).rowcount
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """
+        Counts the tasks in each state.
+
+        Returns:
+            dict[str, dict[str, int]]: The amount of tasks in each state, keyed by kind then state.
+        """
+        counts: dict[str, dict[str, int]] = {}
+        for kind, state, count in self.connection().execute("SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"):
+            counts.setdefault(kind, dict.fromkeys(STATES, 0))[state] = count
+        return counts
+
+    def is_drained(self) -> bool:
+        """
+        Returns whether every task is done or dead.
+        """
+        return self.connection().execute("SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')").fetchone()[0] == 0
+
+    def results(self, kind: str) -> list[tuple[str, object, object]]:
+        """
+        Returns the finished tasks of a kind.
+
+        Args:
+            kind (str): The kind of the tasks.
+
+        Returns:
+            list[tuple[str, object, object]]: The key, payload and result of each done task.
+        """
+        return [(key, json.loads(payload), json.loads(result)) for key, payload, result in
+                self.connection().execute("SELECT key, payload, result FROM tasks WHERE kind=? AND state='done' ORDER BY id", (kind,))]
+
+    def dead(self) -> list[tuple[str, str, int, str]]:
+        """
+        Returns the dead-lettered tasks.
+
+        Returns:
+            list[tuple[str, str, int, str]]: The kind, key, attempts and last error of each dead task.
+        """
+        return self.connection().execute("SELECT kind, key, attempts, error FROM tasks WHERE state='dead' ORDER BY id").fetchall()
+
+    def clear(self) -> None:
+        """
+        Removes every task.
+        """
+        self.connection().execute("DELETE FROM tasks")
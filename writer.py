@@ -0,0 +1,166 @@
+from models import *
+from database import Database, TABLES
+import queue
+import threading
+import time
+
+class StreamWriter(object):
+    """
+    Writes scraped results to the database from a dedicated thread while scraping continues.
+    Results are handed over through a bounded queue, so a slow database holds back the scrape rather than
+    letting results pile up in memory. Rows are buffered and flushed in batches with Database.bulk_load.
+    """
+    path: str
+    batch_size: int
+    flush_interval: float
+    queue: queue.Queue
+    thread: threading.Thread
+    error: BaseException
+    rows_written: int
+
+    def __init__(self, path: str = "storage.db", batch_size: int = 5000, queue_size: int = 1024, flush_interval: float = 1.0):
+        """
+        Initializes the queue and starts the writer thread.
+
+        Args:
+            path (str, optional): The sqlite3 database file to write to. Defaults to "storage.db".
+            batch_size (int, optional): The amount of buffered rows that triggers a flush. Defaults to 5000.
+            queue_size (int, optional): The most results waiting to be written before the scrape blocks. Defaults to 1024.
+            flush_interval (float, optional): The most seconds rows are buffered before a flush. Defaults to 1.0.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.rows_written = 0
+        # members and breeds are shared between breeders, so only their first sighting becomes a row
+        self.seen_members: set[str] = set()
+        self.seen_breeds: set[str] = set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put_areas(self, areas: list[Area]) -> None:
+        """
+        Queues areas to be written.
+        """
+        self.put(("areas", areas))
+
+    def put_breeders(self, breeders: list[Breeder]) -> None:
+        """
+        Queues breeders, along with the areas and breeds they belong to, to be written.
+        """
+        self.put(("breeders", breeders))
+
+    def put_breed_members(self, breeder: Breeder, breed_members: BreedMembers) -> None:
+        """
+        Queues the members and breeds of a breeder to be written.
+        """
+        self.put(("breed_members", (breeder, breed_members)))
+
+    def put(self, item: tuple) -> None:
+        """
+        Queues an item for the writer thread, blocking while the queue is full.
+
+        Raises:
+            BaseException: The error the writer thread failed with, if it has failed.
+        """
+        if self.error:
+            raise self.error
+        self.queue.put(item)
+
+    def close(self) -> None:
+        """
+        Writes every queued result and stops the writer thread.
+
+        Raises:
+            BaseException: The error the writer thread failed with, if it has failed.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_rows(self, rows: dict[str, list[tuple]], kind: str, payload: object) -> int:
+        """
+        Converts a queued item into rows, skipping members and breeds that have already been written.
+
+        Returns:
+            int: The amount of rows added.
+        """
+        added: int = 0
+        if kind == "areas":
+            rows["areas"].extend((area.title, area.region) for area in payload)
+            added += len(payload)
+        elif kind == "breeders":
+            for breeder in payload:
+                rows["breeders"].append((breeder.title, breeder.owner, breeder.id))
+                rows["areas_breeders"].append((breeder.area_region, breeder.id))
+                rows["breeders_breeds"].extend((breeder.id, breed_code) for breed_code in breeder.breeds)
+                added += 2+len(breeder.breeds)
+        elif kind == "breed_members":
+            breeder, breed_members = payload
+            for member in breed_members.members:
+                if member.id not in self.seen_members:
+                    self.seen_members.add(member.id)
+                    rows["members"].append((member.description, member.id, member.signatory, member.address, member.town))
+                    added += 1
+                rows["breeders_members"].extend((breeder_id, member.id) for breeder_id in member.breeder_ids)
+                added += len(member.breeder_ids)
+            for breed in breed_members.breeds:
+                if breed.code not in self.seen_breeds:
+                    self.seen_breeds.add(breed.code)
+                    rows["breeds"].append((breed.code, breed.id, breed.last_litter, breed.description,
+                                           breed.group_code, breed.group_description))
+                    added += 1
+        return added
+
+    def run(self) -> None:
+        """
+        The writer thread: buffers queued results and flushes them in batches until closed.
+        """
+        db: Database = None
+        closed: bool = False
+        try:
+            # sqlite3 connections belong to the thread that opened them
+            db = Database(self.path)
+            rows: dict[str, list[tuple]] = {table: [] for table in TABLES}
+            buffered: int = 0
+            last_flush: float = time.monotonic()
+            while True:
+                try:
+                    item: tuple = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    closed = True
+                    break
+                if item:
+                    buffered += self.add_rows(rows, *item)
+                if buffered >= self.batch_size or (buffered and time.monotonic()-last_flush >= self.flush_interval):
+                    self.flush(db, rows)
+                    buffered, last_flush = 0, time.monotonic()
+            self.flush(db, rows)
+        except BaseException as e:
+            self.error = e
+            # keep draining so that the scrape is not left blocked on a full queue
+            while not closed:
+                closed = self.queue.get() is None
+        finally:
+            if db:
+                db.connection.close()
+
+    def flush(self, db: Database, rows: dict[str, list[tuple]]) -> None:
+        """
+        Writes the buffered rows in one transaction and empties the buffers.
+        """
+        db.bulk_load({table: rows[table] for table in TABLES if rows[table]}, chunk_size=self.batch_size)
+        self.rows_written += sum(len(rows[table]) for table in TABLES)
+        for table in TABLES:
+            rows[table].clear()